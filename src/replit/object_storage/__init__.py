@@ -1,5 +1,107 @@
-"""Public interface for the replit.object_storage library."""
+"""Public interface for the replit.object_storage library.
 
-from replit.object_storage.client import Client
-from replit.object_storage.errors import DefaultBucketError
-from replit.object_storage.object import Object
+The public names are imported from their modules on first use rather than when
+the package is imported, so that importing the package does not pay to import
+the GCS library, google-auth, requests and aiohttp until they are needed.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:  # pragma: no cover
+  from replit.object_storage.async_client import AsyncClient
+  from replit.object_storage.backends import (
+    Backend,
+    FilesystemBackend,
+    MemoryBackend,
+    StoredObject,
+  )
+  from replit.object_storage.batch import BatchResult
+  from replit.object_storage.cache import CacheStats, ObjectCache
+  from replit.object_storage.client import Client, ClientHandle, ClientPool
+  from replit.object_storage.errors import DefaultBucketError
+  from replit.object_storage.files import ObjectReader, ObjectWriter
+  from replit.object_storage.instrumentation import (
+    Instrumentation,
+    OperationEvent,
+    PrometheusListener,
+    TracingListener,
+  )
+  from replit.object_storage.object import Object, ObjectListing, ObjectPage
+  from replit.object_storage.retry import RateLimiter, RetryPolicy
+  from replit.object_storage.sync import SyncResult
+  from replit.object_storage.transport import PoolStats, TransportOptions
+
+# The module defining each public name.
+_EXPORTS = {
+    "AsyncClient": "async_client",
+    "Backend": "backends",
+    "FilesystemBackend": "backends",
+    "MemoryBackend": "backends",
+    "StoredObject": "backends",
+    "BatchResult": "batch",
+    "CacheStats": "cache",
+    "ObjectCache": "cache",
+    "Client": "client",
+    "ClientHandle": "client",
+    "ClientPool": "client",
+    "DefaultBucketError": "errors",
+    "ObjectReader": "files",
+    "ObjectWriter": "files",
+    "Instrumentation": "instrumentation",
+    "OperationEvent": "instrumentation",
+    "PrometheusListener": "instrumentation",
+    "TracingListener": "instrumentation",
+    "Object": "object",
+    "ObjectListing": "object",
+    "ObjectPage": "object",
+    "RateLimiter": "retry",
+    "RetryPolicy": "retry",
+    "SyncResult": "sync",
+    "PoolStats": "transport",
+    "TransportOptions": "transport",
+}
+
+__all__ = [
+    "AsyncClient",
+    "Backend",
+    "FilesystemBackend",
+    "MemoryBackend",
+    "StoredObject",
+    "BatchResult",
+    "CacheStats",
+    "ObjectCache",
+    "Client",
+    "ClientHandle",
+    "ClientPool",
+    "DefaultBucketError",
+    "ObjectReader",
+    "ObjectWriter",
+    "Instrumentation",
+    "OperationEvent",
+    "PrometheusListener",
+    "TracingListener",
+    "Object",
+    "ObjectListing",
+    "ObjectPage",
+    "RateLimiter",
+    "RetryPolicy",
+    "SyncResult",
+    "PoolStats",
+    "TransportOptions",
+]
+
+
+def __getattr__(name: str) -> Any:
+  module_name = _EXPORTS.get(name)
+  if module_name is None:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+  module = importlib.import_module(f"{__name__}.{module_name}")
+  value = getattr(module, name)
+  # Later lookups find the name directly, without calling __getattr__.
+  globals()[name] = value
+  return value
+
+
+def __dir__() -> List[str]:
+  return sorted(set(globals()) | set(__all__))
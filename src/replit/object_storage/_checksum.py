@@ -0,0 +1,117 @@
+"""Helpers for computing and verifying object checksums."""
+
+import base64
+import hashlib
+from typing import List, Optional
+
+import google_crc32c
+
+CRC32C = "crc32c"
+MD5 = "md5"
+# The checksum modes, where None skips verification.
+CHECKSUMS = (CRC32C, MD5, None)
+
+# CRC32C is preferred, as it can be combined across slices and is checked for
+# every object, but MD5 is faster where google-crc32c has no native build.
+DEFAULT_CHECKSUM = CRC32C if google_crc32c.implementation == "c" else MD5
+
+# Reversed representation of the CRC32C (Castagnoli) polynomial.
+_CRC32C_POLYNOMIAL = 0x82F63B78
+
+
+def crc32c_combine(crc1: int, crc2: int, len2: int) -> int:
+  """Combines the CRC32C checksums of two adjacent blocks of data.
+
+  Given the checksum of a first block, and the checksum and length of a second
+  block, this returns the checksum of both blocks concatenated without reading
+  either of them again. This is a port of zlib's `crc32_combine`, which works by
+  applying the operator for appending len2 zero bytes to crc1.
+  """
+  if len2 <= 0:
+    return crc1
+
+  # Operator for a single zero bit.
+  odd = [_CRC32C_POLYNOMIAL] + [1 << n for n in range(31)]
+  # Operators for two, then four, zero bits.
+  even = _gf2_matrix_square(odd)
+  odd = _gf2_matrix_square(even)
+
+  # Apply operators for each set bit of len2, starting from one zero byte.
+  while True:
+    even = _gf2_matrix_square(odd)
+    if len2 & 1:
+      crc1 = _gf2_matrix_times(even, crc1)
+    len2 >>= 1
+    if len2 == 0:
+      break
+
+    odd = _gf2_matrix_square(even)
+    if len2 & 1:
+      crc1 = _gf2_matrix_times(odd, crc1)
+    len2 >>= 1
+    if len2 == 0:
+      break
+
+  return crc1 ^ crc2
+
+
+def crc32c_from_base64(value: str) -> int:
+  """Decodes a CRC32C checksum as reported in object metadata."""
+  return int.from_bytes(base64.b64decode(value), "big")
+
+
+def hash_from_header(value: Optional[str], algorithm: str) -> Optional[str]:
+  """Returns the base64-encoded digest of an algorithm from an X-Goog-Hash header.
+
+  The header lists digests as "crc32c=...,md5=...". Returns None if it has none
+  for the algorithm, as objects composed from others have no MD5 digest.
+  """
+  for item in (value or "").split(","):
+    name, _, encoded = item.strip().partition("=")
+    if name == algorithm:
+      return encoded
+  return None
+
+
+def check_checksum(checksum: Optional[str]) -> None:
+  """Raises ValueError if checksum is not a supported checksum mode."""
+  if checksum not in CHECKSUMS:
+    raise ValueError(f"unsupported checksum {checksum!r}, expected one of "
+                     f"{', '.join(map(repr, CHECKSUMS))}")
+
+
+class Hasher:
+  """Hasher computes a checksum incrementally, as data streams through it."""
+
+  algorithm: str
+
+  def __init__(self, algorithm: str):
+    self.algorithm = algorithm
+    if algorithm == CRC32C:
+      self.__hash = google_crc32c.Checksum()
+    elif algorithm == MD5:
+      self.__hash = hashlib.md5()
+    else:
+      raise ValueError(f"unsupported checksum {algorithm!r}")
+
+  def update(self, data: bytes) -> None:
+    self.__hash.update(data)
+
+  def digest(self) -> str:
+    """Returns the base64-encoded digest, as in object metadata."""
+    return base64.b64encode(self.__hash.digest()).decode("ascii")
+
+
+def _gf2_matrix_times(matrix: List[int], vector: int) -> int:
+  result = 0
+  row = 0
+  while vector:
+    if vector & 1:
+      result ^= matrix[row]
+    vector >>= 1
+    row += 1
+  return result
+
+
+def _gf2_matrix_square(matrix: List[int]) -> List[int]:
+  return [_gf2_matrix_times(matrix, matrix[row]) for row in range(32)]
@@ -17,3 +17,6 @@ REPLIT_ADC = {
         },
     },
 }
+
+GCS_API_ENDPOINT = "https://storage.googleapis.com"
+GCS_SCOPES = ("https://www.googleapis.com/auth/devstorage.full_control",)
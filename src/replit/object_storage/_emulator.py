@@ -0,0 +1,655 @@
+"""An emulator of the GCS JSON API, which serves requests from a Backend.
+
+The emulator implements the parts of the API which clients use: object
+metadata, media downloads, multipart, media and resumable uploads, listing,
+copies, rewrites, composes, patches and deletes. Requests reach it through an
+HTTP adapter mounted on a client's session, so the GCS library and the Client
+run unchanged, and nothing is sent over the network.
+"""
+
+import base64
+import fnmatch
+import hashlib
+import io
+import json
+import re
+import threading
+import uuid
+import weakref
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+
+import google_crc32c
+import requests
+from replit.object_storage.backends import Backend, StoredObject
+from replit.object_storage.retry import RateLimiter, RetryPolicy
+from replit.object_storage.transport import TransportOptions, _TransportAdapter
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+# The endpoint of the GCS clients of emulated sessions. Requests to it are
+# served by the emulator, and the reserved .invalid domain ensures that they
+# never reach the network otherwise.
+EMULATOR_ENDPOINT = "http://storage.emulator.invalid"
+
+MAX_COMPOSE_SOURCES = 32
+
+# The routes of the API, each with its method, path and name.
+ROUTES = [
+    ("GET", re.compile(r"/storage/v1/b/([^/]+)/o"), "list_objects"),
+    ("GET", re.compile(r"/storage/v1/b/([^/]+)/o/([^/]+)"), "get_object"),
+    ("GET", re.compile(r"/download/storage/v1/b/([^/]+)/o/([^/]+)"),
+     "download_object"),
+    ("DELETE", re.compile(r"/storage/v1/b/([^/]+)/o/([^/]+)"), "delete_object"),
+    ("PATCH", re.compile(r"/storage/v1/b/([^/]+)/o/([^/]+)"), "patch_object"),
+    ("POST",
+     re.compile(r"/storage/v1/b/([^/]+)/o/([^/]+)/copyTo/b/([^/]+)/o/([^/]+)"),
+     "copy_object"),
+    ("POST",
+     re.compile(
+         r"/storage/v1/b/([^/]+)/o/([^/]+)/rewriteTo/b/([^/]+)/o/([^/]+)"),
+     "rewrite_object"),
+    ("POST", re.compile(r"/storage/v1/b/([^/]+)/o/([^/]+)/compose"),
+     "compose_object"),
+    ("POST", re.compile(r"/upload/storage/v1/b/([^/]+)/o"), "upload_object"),
+    ("PUT", re.compile(r"/upload/storage/v1/b/([^/]+)/o"), "upload_chunk"),
+]
+
+
+class EmulatorError(Exception):
+  """An error which the emulator responds with, as GCS would."""
+
+  def __init__(self, status: int, message: str):
+    super().__init__(message)
+    self.status = status
+    self.message = message
+
+
+@dataclass
+class Response:
+  """A response of the emulator."""
+  status: int
+  body: bytes = b""
+  headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _UploadSession:
+  bucket_id: str
+  name: str
+  metadata: Dict[str, Any]
+  query: Dict[str, str]
+  data: bytearray = field(default_factory=bytearray)
+  result: Optional[Dict[str, Any]] = None
+
+
+class Emulator:
+  """Emulator serves requests to the GCS JSON API from a Backend.
+
+  Attributes:
+      backend: The backend holding the emulated buckets.
+      rewrite_chunk_size: The maximum number of bytes copied by each rewrite
+          request, or None to copy objects in a single request.
+  """
+
+  backend: Backend
+  rewrite_chunk_size: Optional[int] = None
+
+  def __init__(self, backend: Backend):
+    self.backend = backend
+    self.__lock = threading.Lock()
+    self.__sessions: Dict[str, _UploadSession] = {}
+
+  def match(self, method: str, path: str) -> Optional[Tuple[str, List[str]]]:
+    """Returns the name and arguments of the route of a request, if any."""
+    for route_method, pattern, name in ROUTES:
+      match = pattern.fullmatch(path)
+      if route_method == method and match is not None:
+        return name, [unquote(arg) for arg in match.groups()]
+    return None
+
+  def handle(self, method: str, url: str, headers: Mapping[str, str],
+             body: bytes) -> Response:
+    """Serves a request, responding with errors as GCS would."""
+    parts = urlsplit(url)
+    route = self.match(method, parts.path)
+    if route is None:
+      return error_response(404, f"No route for {method} {parts.path}")
+    try:
+      return self.dispatch(route[0], route[1], url, headers, body)
+    except EmulatorError as err:
+      return error_response(err.status, err.message)
+
+  def dispatch(self, route: str, args: List[str], url: str,
+               headers: Mapping[str, str], body: bytes) -> Response:
+    """Serves a request to a route, raising EmulatorError if it fails."""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    base_url = f"{parts.scheme}://{parts.netloc}"
+    return getattr(self, f"_{route}")(query, headers, body, base_url, *args)
+
+  def store(self, bucket_id: str, name: str, data: bytes,
+            **kwargs: Any) -> StoredObject:
+    """Stores an object directly, as a new generation."""
+    with self.__lock:
+      return self.__store(bucket_id, name, data, **kwargs)
+
+  def _list_objects(self, query: Dict[str, str], _headers: Mapping[str, str],
+                    _body: bytes, _base_url: str, bucket_id: str) -> Response:
+    prefix = query.get("prefix", "")
+    delimiter = query.get("delimiter")
+    # Page tokens are the name at which the next page starts.
+    start = max(query.get("startOffset", ""), query.get("pageToken", ""))
+    end = query.get("endOffset")
+    glob = query.get("matchGlob")
+    max_results = int(query.get("maxResults", 1000))
+
+    items: List[Dict[str, Any]] = []
+    prefixes: List[str] = []
+    next_page_token = None
+    with self.__lock:
+      names = sorted(self.__names(bucket_id))
+      for name in names:
+        if not name.startswith(prefix) or name < start:
+          continue
+        if end is not None and name >= end:
+          break
+        if glob is not None and not fnmatch.fnmatchcase(name, glob):
+          continue
+        if delimiter:
+          index = name.find(delimiter, len(prefix))
+          if index >= 0:
+            common_prefix = name[:index + len(delimiter)]
+            if not prefixes or prefixes[-1] != common_prefix:
+              if len(items) + len(prefixes) >= max_results:
+                next_page_token = name
+                break
+              prefixes.append(common_prefix)
+            continue
+        if len(items) + len(prefixes) >= max_results:
+          next_page_token = name
+          break
+        obj = self.backend.get(bucket_id, name)
+        if obj is None:
+          # The object was deleted after the names were listed.
+          continue
+        items.append(_resource(bucket_id, name, obj))
+
+    page: Dict[str, Any] = {"kind": "storage#objects", "items": items}
+    if prefixes:
+      page["prefixes"] = prefixes
+    if next_page_token is not None:
+      page["nextPageToken"] = next_page_token
+    return _json_response(page)
+
+  def _get_object(self, query: Dict[str, str], headers: Mapping[str, str],
+                  body: bytes, base_url: str, bucket_id: str,
+                  name: str) -> Response:
+    if query.get("alt") == "media":
+      return self._download_object(query, headers, body, base_url, bucket_id,
+                                   name)
+    with self.__lock:
+      obj = self.__get(bucket_id, name, query)
+    return _json_response(_resource(bucket_id, name, obj))
+
+  def _download_object(self, query: Dict[str, str], headers: Mapping[str, str],
+                       _body: bytes, _base_url: str, bucket_id: str,
+                       name: str) -> Response:
+    with self.__lock:
+      obj = self.__get(bucket_id, name, query)
+      data = self.backend.read(bucket_id, name)
+    response = Response(
+        200, data, {
+            "Content-Type": obj.content_type,
+            "ETag": _etag(obj),
+            "X-Goog-Generation": str(obj.generation),
+            "X-Goog-Metageneration": str(obj.metageneration),
+            "X-Goog-Hash": f"crc32c={obj.crc32c},md5={obj.md5}",
+            "X-Goog-Stored-Content-Length": str(obj.size),
+        })
+    if obj.content_encoding is not None:
+      response.headers["Content-Encoding"] = obj.content_encoding
+      response.headers["X-Goog-Stored-Content-Encoding"] = obj.content_encoding
+    byte_range = _parse_range(headers.get("Range"), len(data))
+    if byte_range is not None:
+      start, end = byte_range
+      response.status = 206
+      response.headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+      response.body = data[start:end + 1]
+    return response
+
+  def _delete_object(self, query: Dict[str, str], _headers: Mapping[str, str],
+                     _body: bytes, _base_url: str, bucket_id: str,
+                     name: str) -> Response:
+    with self.__lock:
+      self.__get(bucket_id, name, query, read=False)
+      self.backend.delete(bucket_id, name)
+    return Response(204)
+
+  def _patch_object(self, query: Dict[str, str], _headers: Mapping[str, str],
+                    body: bytes, _base_url: str, bucket_id: str,
+                    name: str) -> Response:
+    patch = _json(body)
+    with self.__lock:
+      obj = self.__get(bucket_id, name, query, read=False)
+      metadata = dict(obj.metadata)
+      for key, value in (patch.get("metadata") or {}).items():
+        if value is None:
+          metadata.pop(key, None)
+        else:
+          metadata[key] = value
+      obj = replace(obj,
+                    content_type=patch.get("contentType", obj.content_type),
+                    content_encoding=patch.get("contentEncoding",
+                                               obj.content_encoding),
+                    metadata=metadata,
+                    metageneration=obj.metageneration + 1,
+                    updated=datetime.now(timezone.utc))
+      self.backend.write(bucket_id, name, obj, None)
+    return _json_response(_resource(bucket_id, name, obj))
+
+  def _copy_object(self, query: Dict[str, str], _headers: Mapping[str, str],
+                   _body: bytes, _base_url: str, bucket_id: str, name: str,
+                   dest_bucket_id: str, dest_name: str) -> Response:
+    return _json_response(
+        self.__copy(bucket_id, name, dest_bucket_id, dest_name, query))
+
+  def _rewrite_object(self, query: Dict[str, str], _headers: Mapping[str, str],
+                      _body: bytes, _base_url: str, bucket_id: str, name: str,
+                      dest_bucket_id: str, dest_name: str) -> Response:
+    source_query = {"generation": query["sourceGeneration"]
+                   } if "sourceGeneration" in query else {}
+    with self.__lock:
+      size = self.__get(bucket_id, name, source_query, read=False).size
+    # Tokens are the number of bytes rewritten so far.
+    rewritten = size
+    if self.rewrite_chunk_size is not None:
+      rewritten = min(size,
+                      int(query.get("rewriteToken", 0)) + self.rewrite_chunk_size)
+    if rewritten < size:
+      return _json_response({
+          "kind": "storage#rewriteResponse",
+          "totalBytesRewritten": str(rewritten),
+          "objectSize": str(size),
+          "done": False,
+          "rewriteToken": str(rewritten),
+      })
+    return _json_response({
+        "kind": "storage#rewriteResponse",
+        "totalBytesRewritten": str(size),
+        "objectSize": str(size),
+        "done": True,
+        "resource": self.__copy(bucket_id, name, dest_bucket_id, dest_name,
+                                query),
+    })
+
+  def _compose_object(self, query: Dict[str, str], _headers: Mapping[str, str],
+                      body: bytes, _base_url: str, bucket_id: str,
+                      name: str) -> Response:
+    request = _json(body)
+    sources = request.get("sourceObjects", [])
+    if not sources or len(sources) > MAX_COMPOSE_SOURCES:
+      raise EmulatorError(400, "The number of source objects is invalid.")
+    data = bytearray()
+    with self.__lock:
+      for source in sources:
+        source_query = {}
+        if source.get("generation") is not None:
+          source_query["generation"] = str(source["generation"])
+        self.__get(bucket_id, source["name"], source_query, read=False)
+        data += self.backend.read(bucket_id, source["name"])
+      return _json_response(
+          self.__write(bucket_id, name, bytes(data), query,
+                       request.get("destination") or {}))
+
+  def _upload_object(self, query: Dict[str, str], headers: Mapping[str, str],
+                     body: bytes, base_url: str, bucket_id: str) -> Response:
+    upload_type = query.get("uploadType", "media")
+    if upload_type == "multipart":
+      metadata, data = _parse_multipart(headers["Content-Type"], body)
+    elif upload_type == "resumable":
+      metadata = _json(body)
+      if "X-Upload-Content-Type" in headers:
+        metadata.setdefault("contentType", headers["X-Upload-Content-Type"])
+      session_id = uuid.uuid4().hex
+      with self.__lock:
+        self.__names(bucket_id)
+        self.__sessions[session_id] = _UploadSession(
+            bucket_id,
+            _object_name(metadata.get("name") or query.get("name")),
+            metadata, query)
+      location = (f"{base_url}/upload/storage/v1/b/{quote(bucket_id)}/o"
+                  f"?uploadType=resumable&upload_id={session_id}")
+      return Response(200, headers={"Location": location})
+    else:
+      metadata = {"contentType": headers.get("Content-Type")}
+      data = body
+    name = _object_name(metadata.get("name") or query.get("name"))
+    with self.__lock:
+      return _json_response(
+          self.__write(bucket_id, name, data, query, metadata))
+
+  def _upload_chunk(self, query: Dict[str, str], headers: Mapping[str, str],
+                    body: bytes, _base_url: str, _bucket_id: str) -> Response:
+    with self.__lock:
+      session = self.__sessions.get(query.get("upload_id", ""))
+      if session is None:
+        raise EmulatorError(404, "No such upload session.")
+      if session.result is not None:
+        return _json_response(session.result)
+      start, total = _parse_content_range(headers.get("Content-Range", ""))
+      if start is not None and body:
+        if start > len(session.data):
+          raise EmulatorError(400, "Chunks must be sent in order.")
+        # Bytes which were already committed are sent again after a failure.
+        session.data[start:] = body
+      if total is not None and len(session.data) >= total:
+        session.result = self.__write(session.bucket_id, session.name,
+                                      bytes(session.data[:total]),
+                                      session.query, session.metadata)
+        return _json_response(session.result)
+      response = Response(308)
+      if session.data:
+        response.headers["Range"] = f"bytes=0-{len(session.data) - 1}"
+      return response
+
+  def __names(self, bucket_id: str) -> List[str]:
+    if not self.backend.has_bucket(bucket_id):
+      raise EmulatorError(404, "The specified bucket does not exist.")
+    return self.backend.names(bucket_id)
+
+  def __get(self,
+            bucket_id: str,
+            name: str,
+            query: Dict[str, str],
+            read: bool = True) -> StoredObject:
+    if not self.backend.has_bucket(bucket_id):
+      raise EmulatorError(404, "The specified bucket does not exist.")
+    obj = self.backend.get(bucket_id, name)
+    if obj is not None and "generation" in query and (int(query["generation"])
+                                                      != obj.generation):
+      obj = None
+    _check_preconditions(obj, query, read=read)
+    if obj is None:
+      raise EmulatorError(404, f"No such object: {bucket_id}/{name}")
+    return obj
+
+  def __copy(self, bucket_id: str, name: str, dest_bucket_id: str,
+             dest_name: str, query: Dict[str, str]) -> Dict[str, Any]:
+    # Source preconditions, such as ifSourceGenerationMatch, apply to the source
+    # as the equivalent preconditions would to the destination.
+    source_query = {
+        "if" + key[len("ifSource"):]: value
+        for key, value in query.items()
+        if key.startswith("ifSource")
+    }
+    if "sourceGeneration" in query:
+      source_query["generation"] = query["sourceGeneration"]
+    with self.__lock:
+      source = self.__get(bucket_id, name, source_query, read=False)
+      return self.__write(
+          dest_bucket_id, dest_name, self.backend.read(bucket_id, name), query,
+          {
+              "contentType": source.content_type,
+              "contentEncoding": source.content_encoding,
+              "metadata": source.metadata,
+          })
+
+  def __write(self, bucket_id: str, name: str, data: bytes,
+              query: Dict[str, str], metadata: Dict[str, Any]) -> Dict[str, Any]:
+    if not self.backend.has_bucket(bucket_id):
+      raise EmulatorError(404, "The specified bucket does not exist.")
+    _check_preconditions(self.backend.get(bucket_id, name), query, read=False)
+    obj = self.__store(
+        bucket_id,
+        name,
+        data,
+        content_type=metadata.get("contentType") or "application/octet-stream",
+        content_encoding=metadata.get("contentEncoding"),
+        metadata=dict(metadata.get("metadata") or {}),
+    )
+    return _resource(bucket_id, name, obj)
+
+  def __store(self, bucket_id: str, name: str, data: bytes,
+              **kwargs: Any) -> StoredObject:
+    obj = StoredObject(
+        size=len(data),
+        generation=self.backend.next_generation(),
+        crc32c=_crc32c(data),
+        md5=_md5(data),
+        **kwargs,
+    )
+    self.backend.write(bucket_id, name, obj, data)
+    return obj
+
+
+class _EmulatedHTTPAdapter(HTTPAdapter):
+  """An HTTP adapter which sends requests to an Emulator, not the network."""
+
+  emulator: Emulator
+
+  def send(
+      self,
+      request: requests.PreparedRequest,
+      stream: bool = False,
+      timeout: Any = None,
+      verify: Any = True,
+      cert: Any = None,
+      proxies: Optional[Dict[str, str]] = None,
+  ) -> requests.Response:
+    # Requests are handled in memory, so no connection options apply.
+    del stream, timeout, verify, cert, proxies
+    # The GCS library sets some headers as bytes.
+    headers = CaseInsensitiveDict({
+        name: value.decode("latin-1") if isinstance(value, bytes) else value
+        for name, value in request.headers.items()
+    })
+    response = self.emulator.handle(request.method or "GET", request.url or "",
+                                    headers, _read_body(request.body))
+    headers = dict(response.headers,
+                   **{"Content-Length": str(len(response.body))})
+    raw = HTTPResponse(body=io.BytesIO(response.body),
+                       headers=headers,
+                       status=response.status,
+                       preload_content=False,
+                       decode_content=False,
+                       request_method=request.method)
+    return self.build_response(request, raw)
+
+
+class EmulatorAdapter(_TransportAdapter, _EmulatedHTTPAdapter):
+  """A transport adapter whose requests are served by a Backend's emulator.
+
+  Retry policies, rate limiters and instrumentation apply to its requests as
+  they would to those sent to GCS.
+  """
+
+  def __init__(
+      self,
+      backend: Backend,
+      options: Optional[TransportOptions] = None,
+      retry: Optional[RetryPolicy] = None,
+      rate_limiter: Optional[RateLimiter] = None,
+  ):
+    self.emulator = emulator_for(backend)
+    super().__init__(options, retry, rate_limiter)
+
+
+def emulator_for(backend: Backend) -> Emulator:
+  """Returns the Emulator of a backend, which is shared by all its clients."""
+  with _emulators_lock:
+    emulator = _emulators.get(backend)
+    if emulator is None:
+      emulator = _emulators[backend] = Emulator(backend)
+    return emulator
+
+
+_emulators_lock = threading.Lock()
+_emulators: "weakref.WeakKeyDictionary[Backend, Emulator]" = (
+    weakref.WeakKeyDictionary())
+
+
+def error_response(status: int, message: str) -> Response:
+  """Returns the response GCS sends for an error."""
+  if status == 304:
+    return Response(304)
+  return _json_response(
+      {
+          "error": {
+              "code": status,
+              "message": message,
+              "errors": [{
+                  "message": message,
+                  "reason": "emulator"
+              }],
+          }
+      },
+      status=status)
+
+
+def _json_response(value: Dict[str, Any], status: int = 200) -> Response:
+  return Response(status,
+                  json.dumps(value).encode("utf-8"),
+                  {"Content-Type": "application/json; charset=UTF-8"})
+
+
+def _resource(bucket_id: str, name: str, obj: StoredObject) -> Dict[str, Any]:
+  """Returns an object's JSON API resource."""
+  resource: Dict[str, Any] = {
+      "kind": "storage#object",
+      "id": f"{bucket_id}/{name}/{obj.generation}",
+      "name": name,
+      "bucket": bucket_id,
+      "generation": str(obj.generation),
+      "metageneration": str(obj.metageneration),
+      "contentType": obj.content_type,
+      "size": str(obj.size),
+      "crc32c": obj.crc32c,
+      "md5Hash": obj.md5,
+      "etag": _etag(obj),
+      "timeCreated": _timestamp(obj.updated),
+      "updated": _timestamp(obj.updated),
+  }
+  if obj.content_encoding is not None:
+    resource["contentEncoding"] = obj.content_encoding
+  if obj.metadata:
+    resource["metadata"] = dict(obj.metadata)
+  return resource
+
+
+def _object_name(name: Optional[str]) -> str:
+  """Returns an object name, raising the error GCS does if it is invalid."""
+  if not name:
+    raise EmulatorError(400, "An object name is required.")
+  if name in (".", "..") or "\r" in name or "\n" in name:
+    raise EmulatorError(400, f"Invalid object name: {name!r}")
+  return name
+
+
+def _check_preconditions(obj: Optional[StoredObject], query: Dict[str, str],
+                         read: bool) -> None:
+  """Raises the error GCS responds with if a request's preconditions fail.
+
+  Failed "not match" preconditions of reads are reported as 304 Not Modified,
+  and all other failures as 412 Precondition Failed.
+  """
+  generation = 0 if obj is None else obj.generation
+  if "ifGenerationMatch" in query and (int(query["ifGenerationMatch"]) !=
+                                       generation):
+    raise EmulatorError(412, "At least one of the pre-conditions did not hold.")
+  if "ifMetagenerationMatch" in query and (
+      obj is None or int(query["ifMetagenerationMatch"]) != obj.metageneration):
+    raise EmulatorError(412, "At least one of the pre-conditions did not hold.")
+  not_modified = 304 if read else 412
+  if "ifGenerationNotMatch" in query and (int(query["ifGenerationNotMatch"]) ==
+                                          generation):
+    raise EmulatorError(not_modified, "Not modified.")
+  if "ifMetagenerationNotMatch" in query and obj is not None and (int(
+      query["ifMetagenerationNotMatch"]) == obj.metageneration):
+    raise EmulatorError(not_modified, "Not modified.")
+
+
+def _parse_range(header: Optional[str],
+                 size: int) -> Optional[Tuple[int, int]]:
+  """Returns the inclusive byte range requested by a Range header, if any."""
+  if not header or not header.startswith("bytes="):
+    return None
+  start_str, _, end_str = header[len("bytes="):].partition("-")
+  if not start_str:
+    start, end = max(size - int(end_str), 0), size - 1
+  else:
+    start = int(start_str)
+    end = min(int(end_str), size - 1) if end_str else size - 1
+  if start >= size and size > 0:
+    raise EmulatorError(416, "The requested range cannot be satisfied.")
+  if size == 0:
+    return None
+  return start, end
+
+
+def _parse_content_range(header: str) -> Tuple[Optional[int], Optional[int]]:
+  """Returns the start offset and total size given by a Content-Range header."""
+  match = re.fullmatch(r"bytes (\*|(\d+)-(\d+))/(\*|\d+)", header.strip())
+  if match is None:
+    raise EmulatorError(400, f"Invalid Content-Range: {header}")
+  start = None if match.group(2) is None else int(match.group(2))
+  total = None if match.group(4) == "*" else int(match.group(4))
+  return start, total
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Tuple[Dict[str, Any],
+                                                               bytes]:
+  """Returns the metadata and media of a multipart/related upload."""
+  boundary = content_type.partition("boundary=")[2].strip('"')
+  delimiter = b"--" + boundary.encode("ascii")
+  parts = body.split(delimiter)[1:-1]
+  if len(parts) != 2:
+    raise EmulatorError(400, "A multipart upload must have two parts.")
+  contents = []
+  for part in parts:
+    _, _, content = part.partition(b"\r\n\r\n")
+    contents.append(content[:-2] if content.endswith(b"\r\n") else content)
+  metadata = _json(contents[0])
+  for line in parts[1].partition(b"\r\n\r\n")[0].decode("latin-1").splitlines():
+    name, _, value = line.partition(":")
+    if name.strip().lower() == "content-type":
+      metadata.setdefault("contentType", value.strip())
+  return metadata, contents[1]
+
+
+def _read_body(body: Any) -> bytes:
+  """Returns the body of a prepared request, which may be a stream."""
+  if body is None:
+    return b""
+  if isinstance(body, str):
+    return body.encode("utf-8")
+  if isinstance(body, (bytes, bytearray, memoryview)):
+    return bytes(body)
+  if hasattr(body, "read"):
+    return body.read()
+  return b"".join(
+      chunk.encode("utf-8") if isinstance(chunk, str) else bytes(chunk)
+      for chunk in body)
+
+
+def _json(body: bytes) -> Dict[str, Any]:
+  return json.loads(body) if body else {}
+
+
+def _etag(obj: StoredObject) -> str:
+  return f"{obj.generation}-{obj.metageneration}"
+
+
+def _crc32c(data: bytes) -> str:
+  return base64.b64encode(google_crc32c.value(data).to_bytes(4, "big")).decode()
+
+
+def _md5(data: bytes) -> str:
+  return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+
+def _timestamp(value: datetime) -> str:
+  return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
@@ -0,0 +1,157 @@
+"""Helpers for listing ranges of object names concurrently.
+
+A listing is split into shards, which are lexicographic ranges of object names
+listed with startOffset and endOffset. Listing starts with a single shard. Each
+time a shard's page is not its last and another worker is idle, the rest of
+the shard is split in two at a name roughly halfway through it, and the idle
+worker takes the upper half. The names in a bucket are rarely spread evenly, so
+shards are split as names are found rather than up front.
+"""
+
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Optional, Tuple
+
+from replit.object_storage.instrumentation import _in_current_context
+from replit.object_storage.object import Object
+
+# Lists a page of the objects named from start (inclusive) to end (exclusive),
+# from a page token, returning them and the token of the next page.
+ListPage = Callable[[Optional[str], Optional[str], Optional[str]],
+                    Tuple[List[Object], Optional[str]]]
+
+# The characters of ASCII names, which most names are, are split between as if
+# no other characters existed, so that shards are split within them.
+_ASCII_END = "\x7f"
+_UNICODE_BASE = 0x110000
+_SURROGATES = range(0xD800, 0xE000)
+
+
+@dataclass
+class _Shard:
+  start: Optional[str]
+  end: Optional[str]
+  # The name of an object already listed at start, which is skipped.
+  after: Optional[str] = None
+
+
+def list_sharded(list_page: ListPage, prefix: Optional[str],
+                 start_offset: Optional[str], end_offset: Optional[str],
+                 parallelism: int) -> List[Object]:
+  """Lists the objects from start_offset to end_offset in concurrent shards.
+
+  Args:
+      list_page: Lists a page of a shard.
+      prefix: The prefix of the names listed, which bounds shards with no end.
+      start_offset: The first name to list, inclusive.
+      end_offset: The last name to list, exclusive.
+      parallelism: The maximum number of shards to list at once.
+
+  Returns:
+      The objects listed, sorted by name.
+  """
+  condition = threading.Condition()
+  pending: Deque[_Shard] = collections.deque([_Shard(start_offset, end_offset)])
+  objects: List[Object] = []
+  active = 0
+  errors: List[BaseException] = []
+
+  def list_shard(shard: _Shard) -> None:
+    page_token = None
+    while True:
+      page, page_token = list_page(shard.start, shard.end, page_token)
+      if shard.after is not None:
+        page = [obj for obj in page if obj.name > shard.after]
+      with condition:
+        objects.extend(page)
+        idle = not pending and active < parallelism
+      if page_token is None:
+        return
+      if not idle or not page:
+        continue
+      last = page[-1].name
+      upper_bound = shard.end
+      if upper_bound is None:
+        upper_bound = (prefix or "") + _ASCII_END
+      split = split_point(last, upper_bound)
+      if split is None:
+        continue
+      # The rest of the shard is listed again from its last name, as page
+      # tokens are only valid for the range they were returned for.
+      with condition:
+        pending.append(_Shard(split, shard.end))
+        condition.notify()
+      shard = _Shard(last, split, after=last)
+      page_token = None
+
+  def work() -> None:
+    nonlocal active
+    while True:
+      with condition:
+        while not pending and active > 0 and not errors:
+          condition.wait()
+        if not pending or errors:
+          return
+        shard = pending.popleft()
+        active += 1
+      try:
+        list_shard(shard)
+      except BaseException as err:
+        with condition:
+          errors.append(err)
+      finally:
+        with condition:
+          active -= 1
+          condition.notify_all()
+
+  with ThreadPoolExecutor(parallelism) as executor:
+    for future in [
+        executor.submit(_in_current_context(work)) for _ in range(parallelism)
+    ]:
+      future.result()
+  if errors:
+    raise errors[0]
+  objects.sort(key=lambda obj: obj.name)
+  return objects
+
+
+def split_point(low: str, high: str) -> Optional[str]:
+  """Returns a name roughly halfway between low and high, lexicographically.
+
+  Names are compared by their code points, as GCS compares the UTF-8 encoding
+  of names. Returns None if no name was found strictly between them.
+  """
+  low_points = [ord(char) for char in low]
+  high_points = [ord(char) for char in high]
+  base = _UNICODE_BASE
+  if max(low_points + high_points, default=0) <= ord(_ASCII_END):
+    base = ord(_ASCII_END) + 1
+  length = max(len(low_points), len(high_points)) + 1
+  low_points += [0] * (length - len(low_points))
+  high_points += [0] * (length - len(high_points))
+
+  # The names are treated as fractions in the base, and averaged.
+  total = [0] * length
+  carry = 0
+  for i in reversed(range(length)):
+    carry, total[i] = divmod(low_points[i] + high_points[i] + carry, base)
+  middle = []
+  remainder = carry
+  for digit in total:
+    point, remainder = divmod(remainder * base + digit, 2)
+    middle.append(point)
+
+  while middle and middle[-1] == 0:
+    middle.pop()
+  # Control characters and surrogates cannot appear in names.
+  name = "".join(
+      chr(0x20 if point < 0x20 else 0xE000 if point in _SURROGATES else point)
+      for point in middle)
+  # The shortest name between them is used, as its digits beyond the point
+  # where low and high differ split the range no better.
+  for length in range(1, len(name) + 1):
+    if low < name[:length] < high:
+      return name[:length]
+  return None
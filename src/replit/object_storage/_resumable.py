@@ -0,0 +1,178 @@
+"""Helpers for uploading objects in chunks through resumable upload sessions.
+
+See https://cloud.google.com/storage/docs/performing-resumable-uploads for the
+protocol implemented here.
+"""
+
+import time
+from typing import BinaryIO, Optional, Union
+
+import requests
+from google.api_core.exceptions import from_http_response
+
+# Every chunk except the last must be a multiple of this size.
+CHUNK_ALIGNMENT = 256 * 1024
+
+_MAX_RECOVERY_ATTEMPTS = 5
+_RECOVERY_BACKOFF = 1.0
+_RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+def upload_resumable(
+    transport: requests.Session,
+    session_url: str,
+    stream: BinaryIO,
+    chunk_size: int,
+) -> None:
+  """Uploads the contents of a stream through a resumable upload session.
+
+  The session is queried for the offset it has already committed, so sessions
+  which were interrupted may be resumed by passing the same stream again. Bytes
+  before the committed offset are skipped in the stream, rather than uploaded
+  again. If a chunk fails to upload due to a transient error, the upload
+  recovers from the last committed offset, so at most one chunk is held in
+  memory and no more than one chunk is sent again.
+  """
+  if chunk_size <= 0 or chunk_size % CHUNK_ALIGNMENT != 0:
+    raise ValueError(f"chunk_size must be a multiple of {CHUNK_ALIGNMENT} bytes")
+
+  offset = _query_committed_offset(transport, session_url)
+  if offset is None:
+    return
+  _skip(stream, offset)
+
+  while True:
+    chunk = read_exact(stream, chunk_size)
+    total = offset + len(chunk) if len(chunk) < chunk_size else None
+    offset = send_chunk(transport, session_url, chunk, offset, total)
+    if offset is None:
+      return
+
+
+def upload_buffer_resumable(
+    transport: requests.Session,
+    session_url: str,
+    buffer: memoryview,
+    chunk_size: int,
+) -> None:
+  """Uploads the contents of a buffer through a resumable upload session.
+
+  Chunks are sent as slices of the buffer, so its contents are never copied.
+  Sessions resume as they do in `upload_resumable`.
+  """
+  if chunk_size <= 0 or chunk_size % CHUNK_ALIGNMENT != 0:
+    raise ValueError(f"chunk_size must be a multiple of {CHUNK_ALIGNMENT} bytes")
+
+  offset = _query_committed_offset(transport, session_url)
+  while offset is not None:
+    chunk = buffer[offset:offset + chunk_size]
+    total = len(buffer) if offset + len(chunk) == len(buffer) else None
+    offset = send_chunk(transport, session_url, chunk, offset, total)
+
+
+def send_chunk(
+    transport: requests.Session,
+    session_url: str,
+    chunk: Union[bytes, memoryview],
+    offset: int,
+    total: Optional[int],
+) -> Optional[int]:
+  """Sends a chunk, returning the new committed offset or None once complete."""
+  view = memoryview(chunk)
+  sent = 0
+  attempt = 0
+  while True:
+    data = view[sent:]
+    try:
+      response = transport.put(
+          session_url,
+          data=data,
+          headers={"Content-Range": _content_range(offset + sent, len(data),
+                                                   total)},
+      )
+    except (requests.ConnectionError, requests.Timeout):
+      response = None
+
+    if response is not None and response.status_code in (200, 201):
+      return None
+    if response is not None and response.status_code == 308:
+      committed = _committed_offset(response)
+      attempt = 0
+    elif response is None or response.status_code in _RETRYABLE_STATUS_CODES:
+      attempt += 1
+      if attempt > _MAX_RECOVERY_ATTEMPTS:
+        if response is None:
+          raise requests.ConnectionError("resumable upload could not recover")
+        raise from_http_response(response)
+      time.sleep(_RECOVERY_BACKOFF * 2**(attempt - 1))
+      committed = _query_committed_offset(transport, session_url)
+      if committed is None:
+        return None
+    else:
+      raise from_http_response(response)
+
+    sent = committed - offset
+    if sent >= len(chunk) and total is None:
+      return committed
+
+
+def _query_committed_offset(transport: requests.Session,
+                            session_url: str) -> Optional[int]:
+  """Returns the offset committed by a session, or None if it is complete."""
+  response = transport.put(session_url,
+                           data=b"",
+                           headers={"Content-Range": "bytes */*"})
+  if response.status_code in (200, 201):
+    return None
+  if response.status_code != 308:
+    raise from_http_response(response)
+  return _committed_offset(response)
+
+
+def _committed_offset(response: requests.Response) -> int:
+  # The Range header is of the form "bytes=0-N", and is absent if no bytes have
+  # been committed yet.
+  committed_range = response.headers.get("Range")
+  if not committed_range:
+    return 0
+  return int(committed_range.rpartition("-")[2]) + 1
+
+
+def _content_range(start: int, length: int, total: Optional[int]) -> str:
+  total_str = "*" if total is None else str(total)
+  if length == 0:
+    return f"bytes */{total_str}"
+  return f"bytes {start}-{start + length - 1}/{total_str}"
+
+
+def read_exact(stream: BinaryIO, size: int) -> bytes:
+  """Reads size bytes from a stream, unless it ends first.
+
+  Streams such as pipes and sockets may return fewer bytes than requested from a
+  single read, even though more are to come.
+  """
+  data = stream.read(size)
+  if len(data) == size or not data:
+    return data
+  parts = [data]
+  remaining = size - len(data)
+  while remaining > 0:
+    data = stream.read(remaining)
+    if not data:
+      break
+    parts.append(data)
+    remaining -= len(data)
+  return b"".join(parts)
+
+
+def _skip(stream: BinaryIO, size: int) -> None:
+  if size == 0:
+    return
+  if stream.seekable():
+    stream.seek(size, 1)
+    return
+  while size > 0:
+    data = stream.read(min(size, CHUNK_ALIGNMENT))
+    if not data:
+      raise ValueError("stream ended before the offset committed by the session")
+    size -= len(data)
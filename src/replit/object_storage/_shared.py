@@ -0,0 +1,290 @@
+"""State shared by every client within a process.
+
+Resolving credentials and the default bucket each take round trips to the Replit
+sidecar, so they are resolved once per process rather than once per client, and
+short-lived clients are cheap to create. Credentials are refreshed by a
+background thread shortly before they expire, so that requests do not wait for
+the sidecar when a token runs out.
+
+After a fork, the child discards the parent's credentials and session, which it
+cannot safely share, and rebuilds them on first use. The default bucket ID is
+kept. Sessions opened for clients with their own transport behaviour are also
+rebuilt in the child.
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Tuple, cast
+
+import requests
+from google.auth import credentials as google_credentials
+from google.auth import identity_pool
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import Request
+from google.cloud import storage
+from replit.object_storage._config import (
+  GCS_SCOPES,
+  REPLIT_ADC,
+  REPLIT_DEFAULT_BUCKET_URL,
+)
+from replit.object_storage._emulator import EMULATOR_ENDPOINT, EmulatorAdapter
+from replit.object_storage.backends import Backend
+from replit.object_storage.errors import DefaultBucketError
+from replit.object_storage.retry import RateLimiter, RetryPolicy
+from replit.object_storage.transport import TransportOptions, _TransportAdapter
+
+# Credentials are refreshed this many seconds before they expire.
+REFRESH_MARGIN = 300.0
+
+_MIN_REFRESH_INTERVAL = 1.0
+_MAX_REFRESH_INTERVAL = 3600.0
+_RETRY_INTERVAL = 10.0
+
+_lock = threading.Lock()
+_credentials: Optional[google_credentials.Credentials] = None
+_refresher: Optional["_CredentialRefresher"] = None
+_storage_client: Optional[storage.Client] = None
+_adapter: Optional[_TransportAdapter] = None
+
+_bucket_lock = threading.Lock()
+_default_bucket_id: Optional[str] = None
+
+_fork_lock = threading.Lock()
+_session_lock = threading.Lock()
+
+
+def shared_credentials() -> google_credentials.Credentials:
+  """Returns the process's credentials, refreshed in the background."""
+  global _credentials, _refresher
+  with _lock:
+    credentials = _credentials
+    if credentials is None:
+      creds = identity_pool.Credentials(**REPLIT_ADC)
+      # Scoping the credentials here stops the GCS library from scoping a copy,
+      # which the background refresh would not reach.
+      credentials = cast(
+          google_credentials.Credentials,
+          google_credentials.with_scopes_if_required(creds, GCS_SCOPES))
+      _credentials = credentials
+      _refresher = _CredentialRefresher(credentials)
+      _refresher.start()
+    return credentials
+
+
+def shared_transport() -> Tuple[storage.Client, _TransportAdapter]:
+  """Returns the GCS client and HTTP adapter shared by the process."""
+  global _storage_client, _adapter
+  credentials = shared_credentials()
+  with _lock:
+    if _storage_client is None or _adapter is None:
+      _adapter = _TransportAdapter()
+      _storage_client = _new_storage_client(credentials, _adapter)
+    return _storage_client, _adapter
+
+
+def new_storage_client(adapter: _TransportAdapter) -> storage.Client:
+  """Returns a GCS client using the shared credentials, and its own session."""
+  return _new_storage_client(shared_credentials(), adapter)
+
+
+class Session:
+  """Session holds the GCS client and HTTP adapter used by one or more clients.
+
+  A session without a retry policy, rate limiter, transport options or backend
+  uses the process's shared GCS client and adapter. Otherwise, it opens its own
+  on first use, and again in a child process after a fork. The requests of a
+  session with a backend are served by the backend's emulator.
+  """
+
+  retry: Optional[RetryPolicy]
+  rate_limiter: Optional[RateLimiter]
+  transport: Optional[TransportOptions]
+  backend: Optional[Backend]
+
+  __pid: Optional[int] = None
+  __connection: Optional[Tuple[storage.Client, _TransportAdapter]] = None
+
+  def __init__(
+      self,
+      retry: Optional[RetryPolicy] = None,
+      rate_limiter: Optional[RateLimiter] = None,
+      transport: Optional[TransportOptions] = None,
+      backend: Optional[Backend] = None,
+  ):
+    self.retry = retry
+    self.rate_limiter = rate_limiter
+    self.transport = transport
+    self.backend = backend
+
+  def connect(self) -> Tuple[storage.Client, _TransportAdapter]:
+    """Returns the session's GCS client and HTTP adapter in this process."""
+    if (self.retry is None and self.rate_limiter is None and
+        self.transport is None and self.backend is None):
+      return shared_transport()
+    with _session_lock:
+      if self.__connection is None or self.__pid != os.getpid():
+        if self.backend is None:
+          adapter = _TransportAdapter(self.transport, self.retry,
+                                      self.rate_limiter)
+          gcs_client = new_storage_client(adapter)
+        else:
+          adapter = EmulatorAdapter(self.backend, self.transport, self.retry,
+                                    self.rate_limiter)
+          gcs_client = _new_emulated_storage_client(adapter)
+        self.__connection = (gcs_client, adapter)
+        self.__pid = os.getpid()
+      return self.__connection
+
+  def resolve_bucket_id(self) -> str:
+    """Returns the ID of the bucket of clients created without one."""
+    if self.backend is not None:
+      return self.backend.default_bucket_id
+    return default_bucket_id()
+
+
+def default_bucket_id() -> str:
+  """Returns the ID of the Repl / Deployment's default bucket.
+
+  The ID is requested from the sidecar on first use. Errors are not cached, so
+  resolution is attempted again on the next call.
+  """
+  global _default_bucket_id
+  with _bucket_lock:
+    if _default_bucket_id is None:
+      _default_bucket_id = _fetch_default_bucket_id()
+    return _default_bucket_id
+
+
+def reset() -> None:
+  """Discards all shared state, stopping the background refresh."""
+  global _credentials, _refresher, _storage_client, _adapter, _default_bucket_id
+  with _lock:
+    if _refresher is not None:
+      _refresher.stop()
+    _credentials = None
+    _refresher = None
+    _storage_client = None
+    _adapter = None
+  with _bucket_lock:
+    _default_bucket_id = None
+
+
+def fork_lock() -> threading.Lock:
+  """Returns a lock for state which must be rebuilt after a fork.
+
+  Locks held by other threads when the process forks are never released in the
+  child, so this lock is replaced in the child rather than inherited.
+  """
+  return _fork_lock
+
+
+def _after_fork_in_child() -> None:
+  global _lock, _bucket_lock, _fork_lock, _session_lock
+  global _credentials, _refresher, _storage_client, _adapter
+  # Only the forking thread survives, so the refresher is gone and the locks may
+  # be held by threads which no longer exist.
+  _lock = threading.Lock()
+  _bucket_lock = threading.Lock()
+  _fork_lock = threading.Lock()
+  _session_lock = threading.Lock()
+  _credentials = None
+  _refresher = None
+  _storage_client = None
+  _adapter = None
+
+
+if hasattr(os, "register_at_fork"):
+  os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _new_storage_client(
+    credentials: google_credentials.Credentials,
+    adapter: _TransportAdapter,
+) -> storage.Client:
+  gcs_client = storage.Client(credentials=credentials, project="")
+  gcs_client._http.mount("https://", adapter)
+  gcs_client._http.mount("http://", adapter)
+  return gcs_client
+
+
+def _new_emulated_storage_client(adapter: _TransportAdapter) -> storage.Client:
+  # Requests served by an emulator need no credentials.
+  gcs_client = storage.Client(
+      credentials=AnonymousCredentials(),
+      project="",
+      client_options={"api_endpoint": EMULATOR_ENDPOINT})
+  gcs_client._http.mount("https://", adapter)
+  gcs_client._http.mount("http://", adapter)
+  return gcs_client
+
+
+def _fetch_default_bucket_id() -> str:
+  response = requests.get(REPLIT_DEFAULT_BUCKET_URL)
+  try:
+    response.raise_for_status()
+  except requests.HTTPError as exc:
+    raise DefaultBucketError("failed to request default bucket") from exc
+
+  bucket_id = response.json().get("bucketId", "")
+  if bucket_id == "":
+    raise DefaultBucketError("no default bucket was specified, it may need "
+                             "to be configured in .replit")
+
+  return bucket_id
+
+
+class _CredentialRefresher(threading.Thread):
+  """A daemon thread which refreshes credentials before they expire."""
+
+  __credentials: google_credentials.Credentials
+  __stopped: threading.Event
+
+  def __init__(self, credentials: google_credentials.Credentials):
+    super().__init__(name="replit-object-storage-refresh", daemon=True)
+    self.__credentials = credentials
+    self.__stopped = threading.Event()
+
+  def run(self) -> None:
+    while True:
+      delay = self.refresh_if_needed()
+      if self.__stopped.wait(delay):
+        return
+
+  def stop(self) -> None:
+    self.__stopped.set()
+
+  def refresh_if_needed(self) -> float:
+    """Refreshes the credentials if they are close to expiry.
+
+    Returns:
+        The number of seconds until the credentials should next be checked.
+    """
+    try:
+      remaining = _seconds_until_expiry(self.__credentials)
+      if remaining is None or remaining <= REFRESH_MARGIN:
+        self.__credentials.refresh(Request())
+        remaining = _seconds_until_expiry(self.__credentials)
+    # The thread must outlive any failure, which requests will then surface
+    # when they refresh the credentials themselves.
+    except Exception:
+      return _RETRY_INTERVAL
+    if remaining is None:
+      return _MAX_REFRESH_INTERVAL
+    return min(max(remaining - REFRESH_MARGIN, _MIN_REFRESH_INTERVAL),
+               _MAX_REFRESH_INTERVAL)
+
+
+def _seconds_until_expiry(
+    credentials: google_credentials.Credentials) -> Optional[float]:
+  """Returns the lifetime left on credentials' token, or None if there is none.
+
+  Tokens without an expiry are given an infinite lifetime.
+  """
+  if credentials.token is None:
+    return None
+  if credentials.expiry is None:
+    return float("inf")
+  # Credentials' expiry times are naive datetimes in UTC.
+  now = datetime.now(timezone.utc).replace(tzinfo=None)
+  return (credentials.expiry - now).total_seconds()
@@ -0,0 +1,470 @@
+"""Asyncio client for interacting with Object Storage.
+
+AsyncClient mirrors the interface of `Client`, but talks to the GCS JSON API over
+a non-blocking aiohttp session so that many requests may be in flight on a single
+event loop. It requires the optional `aiohttp` dependency, which can be installed
+with `pip install replit.object_storage[aio]`.
+"""
+
+import asyncio
+import json
+import mimetypes
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import (
+  TYPE_CHECKING,
+  Any,
+  AsyncIterator,
+  Dict,
+  List,
+  Optional,
+  Union,
+)
+from urllib.parse import quote
+
+from google.api_core.exceptions import NotFound, from_http_status
+from google.auth import credentials as google_credentials
+from google.auth.transport.requests import Request
+from replit.object_storage._config import GCS_API_ENDPOINT
+from replit.object_storage._shared import default_bucket_id, shared_credentials
+from replit.object_storage.client import _LIST_FIELDS, _OBJECT_FIELDS, _drop_none
+from replit.object_storage.errors import (
+  ObjectNotFoundError,
+  _async_google_error_handler,
+)
+from replit.object_storage.object import Object
+from replit.object_storage.retry import RateLimiter, RetryPolicy, _retry_after
+
+if TYPE_CHECKING:  # pragma: no cover
+  import aiohttp
+else:
+  try:
+    import aiohttp
+  except ImportError:  # pragma: no cover
+    aiohttp = None
+
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class AsyncClient:
+  """AsyncClient manages asynchronous interactions with Replit Object Storage.
+
+  AsyncClient must be used from within a running event loop. It holds an HTTP
+  session which should be released with `close` once the client is no longer
+  needed, or by using the client as an async context manager:
+
+  ```python
+  async with AsyncClient() as client:
+    contents = await client.download_as_text("file.json")
+  ```
+
+  Any method may return the same errors as the equivalent method on `Client`.
+  """
+
+  __bucket_id: Optional[str] = None
+  __credentials: google_credentials.Credentials
+  __session: Optional["aiohttp.ClientSession"]
+  __owns_session: bool
+  __retry: Optional[RetryPolicy]
+  __rate_limiter: Optional[RateLimiter]
+
+  __bucket_lock: Optional[asyncio.Lock] = None
+  __credentials_lock: Optional[asyncio.Lock] = None
+
+  def __init__(
+      self,
+      bucket_id: Optional[str] = None,
+      session: Optional["aiohttp.ClientSession"] = None,
+      retry: Optional[RetryPolicy] = None,
+      rate_limiter: Optional[RateLimiter] = None,
+  ):
+    """Creates a new AsyncClient.
+
+    Args:
+        bucket_id: The ID of the bucket this AsyncClient should interface with.
+            If no ID is defined, the Repl / Deployment's default bucket will be
+            used.
+        session: An aiohttp session to issue requests with. If no session is
+            provided, one will be created on first use and closed by `close`.
+            Providing a session allows connection limits and timeouts to be
+            tuned, and connections to be shared with the rest of the
+            application.
+        retry: A policy for retrying requests which fail with transient errors.
+        rate_limiter: A limiter for the rate at which this AsyncClient sends
+            requests. Waiting for the limiter does not block the event loop.
+    """
+    if aiohttp is None:
+      raise ImportError("AsyncClient requires aiohttp, which can be installed "
+                        "with `pip install replit.object_storage[aio]`")
+    self.__credentials = shared_credentials()
+    if bucket_id:
+      self.__bucket_id = bucket_id
+    self.__session = session
+    self.__owns_session = session is None
+    self.__retry = retry
+    self.__rate_limiter = rate_limiter
+
+  async def __aenter__(self) -> "AsyncClient":
+    """Returns the AsyncClient for use as an async context manager."""
+    return self
+
+  async def __aexit__(self, *exc_info: Any) -> None:
+    """Closes the AsyncClient when exiting an async context manager."""
+    await self.close()
+
+  async def close(self) -> None:
+    """Closes the HTTP session held by the AsyncClient, if it owns one."""
+    if self.__owns_session and self.__session is not None:
+      await self.__session.close()
+      self.__session = None
+
+  @_async_google_error_handler
+  async def copy(self, object_name: str, dest_object_name: str) -> None:
+    """Copies the specified object within the same bucket.
+
+    If an object exists in the same location, it will be overwritten.
+
+    Args:
+        object_name: The full path of the object to be copied.
+        dest_object_name: The full path to copy the object to.
+
+    Raises:
+        ObjectNotFoundError: If the source object could not be found.
+    """
+    bucket_id = await self.__bucket()
+    url = (self.__object_url(bucket_id, object_name) +
+           f"/copyTo/b/{_quote(bucket_id)}/o/{_quote(dest_object_name)}")
+    await self.__request("POST", url)
+
+  @_async_google_error_handler
+  async def delete(self, object_name: str, ignore_not_found: bool = False) -> None:
+    """Deletes an object from Object Storage.
+
+    Args:
+        object_name: The name of the object to be deleted.
+        ignore_not_found: Whether an error should be raised if the object does not
+          exist.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    url = self.__object_url(await self.__bucket(), object_name)
+    try:
+      await self.__request("DELETE", url)
+    except NotFound as err:
+      if ignore_not_found:
+        return
+      raise ObjectNotFoundError("The requested object could not be found.") from err
+
+  @_async_google_error_handler
+  async def download_as_bytes(self, object_name: str) -> bytes:
+    """Download the contents an object as a bytes object.
+
+    Args:
+        object_name: The name of the object to be downloaded.
+
+    Returns:
+        The raw byte representation of the object's contents.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    url = self.__object_url(await self.__bucket(), object_name)
+    return await self.__request("GET", url, params={"alt": "media"})
+
+  @_async_google_error_handler
+  async def download_as_text(self, object_name: str) -> str:
+    """Download the contents an object as a string.
+
+    Args:
+        object_name: The name of the object to be downloaded.
+
+    Returns:
+        The object's contents as a UTF-8 encoded string.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    return (await self.download_as_bytes(object_name)).decode("utf-8")
+
+  @_async_google_error_handler
+  async def download_to_filename(self, object_name: str, dest_filename: str) -> None:
+    """Download the contents an object into a file on the local disk.
+
+    Args:
+        object_name: The name of the object to be downloaded.
+        dest_filename: The filename of the file on the local disk to be written.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    url = self.__object_url(await self.__bucket(), object_name)
+    loop = asyncio.get_running_loop()
+    async with self.__open("GET", url, params={"alt": "media"}) as response:
+      # Opening a file may block, so it is done off the event loop, as are the
+      # writes.
+      file = await loop.run_in_executor(None, open, dest_filename, "wb")
+      try:
+        async for chunk in response.content.iter_chunked(_DOWNLOAD_CHUNK_SIZE):
+          await loop.run_in_executor(None, file.write, chunk)
+      except BaseException:
+        await loop.run_in_executor(None, file.close)
+        await loop.run_in_executor(None, os.remove, dest_filename)
+        raise
+      await loop.run_in_executor(None, file.close)
+
+  @_async_google_error_handler
+  async def exists(self, object_name: str) -> bool:
+    """Checks if an object exist.
+
+    Args:
+        object_name: The name of the object to be checked.
+
+    Returns:
+        Whether or not the object exists.
+    """
+    url = self.__object_url(await self.__bucket(), object_name)
+    try:
+      await self.__request("GET", url, params={"fields": "name"})
+    except NotFound:
+      return False
+    return True
+
+  @_async_google_error_handler
+  async def list(
+      self,
+      end_offset: Optional[str] = None,
+      match_glob: Optional[str] = None,
+      max_results: Optional[int] = None,
+      prefix: Optional[str] = None,
+      start_offset: Optional[str] = None,
+  ) -> List[Object]:
+    """Lists objects in the bucket.
+
+    Args:
+        end_offset: Filter results to objects whose names are lexicographically
+            before end_offset. If start_offset is also set, the objects listed
+            have names between start_offset (inclusive) and end_offset
+            (exclusive).
+        match_glob: Glob pattern used to filter results, for example foo*bar.
+        max_results: The maximum number of results that can be returned in the
+            response.
+        prefix: Filter results to objects who names have the specified prefix.
+        start_offset: Filter results to objects whose names are
+            lexicographically equal to or after start_offset. If endOffset is
+            also set, the objects listed have names between start_offset
+            (inclusive) and end_offset (exclusive).
+
+    Returns:
+        A list of objects matching the given query parameters.
+    """
+    url = f"{GCS_API_ENDPOINT}/storage/v1/b/{_quote(await self.__bucket())}/o"
+    params = _drop_none({
+        "endOffset": end_offset,
+        "fields": _LIST_FIELDS,
+        "matchGlob": match_glob,
+        "prefix": prefix,
+        "startOffset": start_offset,
+    })
+    objects: List[Object] = []
+    while max_results is None or len(objects) < max_results:
+      if max_results is not None:
+        params["maxResults"] = max_results - len(objects)
+      page = json.loads(await self.__request("GET", url, params=params))
+      objects.extend(
+          _object_from_resource(item) for item in page.get("items", []))
+      if "nextPageToken" not in page:
+        break
+      params["pageToken"] = page["nextPageToken"]
+    return objects
+
+  @_async_google_error_handler
+  async def stat(self, object_name: str) -> Object:
+    """Returns the metadata of an object, without downloading its contents.
+
+    Args:
+        object_name: The name of the object.
+
+    Returns:
+        The object's metadata.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    url = self.__object_url(await self.__bucket(), object_name)
+    resource = json.loads(await self.__request("GET",
+                                               url,
+                                               params={"fields": _OBJECT_FIELDS}))
+    return _object_from_resource(resource)
+
+  @_async_google_error_handler
+  async def upload_from_filename(self, dest_object_name: str,
+                                 src_filename: str) -> None:
+    """Upload an object from a file on the local disk.
+
+    Args:
+        dest_object_name: The name of the object to be uploaded.
+        src_filename: The filename of a file on the local disk
+    """
+    content_type, _ = mimetypes.guess_type(src_filename)
+    loop = asyncio.get_running_loop()
+    # aiohttp reads the file in the executor, so it is opened and closed there
+    # too, rather than blocking the event loop.
+    file = await loop.run_in_executor(None, open, src_filename, "rb")
+    try:
+      await self.__upload(dest_object_name, file,
+                          content_type or "application/octet-stream")
+    finally:
+      await loop.run_in_executor(None, file.close)
+
+  @_async_google_error_handler
+  async def upload_from_bytes(self, dest_object_name: str, src_data: bytes) -> None:
+    """Upload an object from bytes.
+
+    Args:
+        dest_object_name: The name of the object to be uploaded.
+        src_data: The bytes to be uploaded.
+    """
+    await self.upload_from_text(dest_object_name, src_data)
+
+  @_async_google_error_handler
+  async def upload_from_text(
+    self,
+    dest_object_name: str,
+    src_data: Union[bytes, str]
+  ) -> None:
+    """Upload an object from a string.
+
+    Args:
+        dest_object_name: The name of the object to be uploaded.
+        src_data: The text to be uploaded.
+    """
+    if isinstance(src_data, str):
+      await self.__upload(dest_object_name, src_data.encode("utf-8"), "text/plain")
+    else:
+      await self.__upload(dest_object_name, src_data, "application/octet-stream")
+
+  async def __upload(self, dest_object_name: str, data: Any,
+                     content_type: str) -> None:
+    bucket_id = await self.__bucket()
+    url = f"{GCS_API_ENDPOINT}/upload/storage/v1/b/{_quote(bucket_id)}/o"
+    await self.__request(
+        "POST",
+        url,
+        params={"uploadType": "media", "name": dest_object_name},
+        headers={"Content-Type": content_type},
+        data=data,
+    )
+
+  async def __bucket(self) -> str:
+    bucket_id = self.__bucket_id
+    if bucket_id is None:
+      if self.__bucket_lock is None:
+        self.__bucket_lock = asyncio.Lock()
+      async with self.__bucket_lock:
+        bucket_id = self.__bucket_id
+        if bucket_id is None:
+          loop = asyncio.get_running_loop()
+          bucket_id = await loop.run_in_executor(None, default_bucket_id)
+          self.__bucket_id = bucket_id
+    return bucket_id
+
+  async def __request(self, method: str, url: str, **kwargs: Any) -> bytes:
+    async with self.__open(method, url, **kwargs) as response:
+      return await response.read()
+
+  @asynccontextmanager
+  async def __open(
+      self,
+      method: str,
+      url: str,
+      headers: Optional[Dict[str, str]] = None,
+      **kwargs: Any,
+  ) -> AsyncIterator["aiohttp.ClientResponse"]:
+    headers = dict(headers or {})
+    await self.__authorize(headers)
+    if self.__session is None:
+      self.__session = aiohttp.ClientSession()
+    attempt = 1
+    while True:
+      if self.__rate_limiter is not None:
+        await asyncio.sleep(self.__rate_limiter._reserve())
+      try:
+        response = await self.__session.request(method, url, headers=headers,
+                                                **kwargs)
+      except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+        delay = self.__retry_delay(method, kwargs, None, attempt)
+        if delay is None:
+          raise
+      else:
+        delay = self.__retry_delay(method, kwargs, response.status, attempt,
+                                   _retry_after(response.headers))
+        if delay is None:
+          break
+        response.release()
+      await asyncio.sleep(delay)
+      attempt += 1
+
+    async with response:
+      if response.status >= 400:
+        raise from_http_status(response.status,
+                               _error_message(await response.read()))
+      yield response
+
+  def __retry_delay(
+      self,
+      method: str,
+      request_kwargs: Dict[str, Any],
+      status: Optional[int],
+      attempt: int,
+      retry_after: Optional[float] = None,
+  ) -> Optional[float]:
+    if self.__retry is None:
+      return None
+    return self.__retry._retry_delay(method, request_kwargs.get("params") or {},
+                                     status, attempt, retry_after)
+
+  async def __authorize(self, headers: Dict[str, str]) -> None:
+    if not self.__credentials.valid:
+      if self.__credentials_lock is None:
+        self.__credentials_lock = asyncio.Lock()
+      async with self.__credentials_lock:
+        if not self.__credentials.valid:
+          loop = asyncio.get_running_loop()
+          await loop.run_in_executor(None, self.__credentials.refresh, Request())
+    self.__credentials.apply(headers)
+
+  @staticmethod
+  def __object_url(bucket_id: str, object_name: str) -> str:
+    return (f"{GCS_API_ENDPOINT}/storage/v1/b/{_quote(bucket_id)}"
+            f"/o/{_quote(object_name)}")
+
+
+def _quote(path_segment: str) -> str:
+  return quote(path_segment, safe="")
+
+
+def _object_from_resource(resource: Dict[str, Any]) -> Object:
+  return Object(
+      name=resource["name"],
+      size=int(resource["size"]) if "size" in resource else None,
+      generation=int(resource["generation"]) if "generation" in resource else None,
+      etag=resource.get("etag"),
+      content_type=resource.get("contentType"),
+      updated=_rfc3339_to_datetime(resource.get("updated")),
+      crc32c=resource.get("crc32c"),
+  )
+
+
+def _rfc3339_to_datetime(value: Optional[str]) -> Optional[datetime]:
+  if value is None:
+    return None
+  return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _error_message(body: bytes) -> str:
+  try:
+    return json.loads(body)["error"]["message"]
+  except (ValueError, KeyError, TypeError):
+    return body.decode("utf-8", errors="replace")
@@ -0,0 +1,300 @@
+"""Backends which store objects locally, in place of Replit Object Storage.
+
+A Client created with a backend sends its requests to an emulator of the GCS
+JSON API running in the same process, rather than to GCS. The emulator gives
+the backend's objects the semantics they would have in a bucket: each write
+creates a new generation, preconditions are checked, listings are ordered by
+name and paginated, and offsets, globs and delimiters apply. Every method of the
+Client works as it would against GCS, without any network round trips, so tests
+and local development run at the speed of memory or disk.
+
+    client = Client(backend=MemoryBackend())
+    client.upload_from_text("greeting.txt", "Hello!")
+
+A backend only stores objects and their metadata. Its methods are called with
+the emulator's lock held, so a backend need not be thread-safe itself.
+"""
+
+import abc
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+DEFAULT_BUCKET_ID = "default"
+
+# Bucket IDs which FilesystemBackend accepts, so that they are safe as paths.
+_BUCKET_ID = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]*")
+# Percent-encoded names longer than this are stored under a hash of the name,
+# as most filesystems limit file names to 255 bytes.
+_MAX_ENCODED_NAME = 200
+# Encoded names never contain "#", which quote always escapes.
+_HASHED_NAME_PREFIX = "#"
+
+
+def _now() -> datetime:
+  return datetime.now(timezone.utc)
+
+
+@dataclass
+class StoredObject:
+  """StoredObject is the metadata of an object held by a Backend.
+
+  Attributes:
+      size: The size of the object's contents, in bytes.
+      generation: The generation of the object's contents, which changes each
+          time the object is written.
+      crc32c: The base64-encoded, big-endian CRC32C checksum of the contents.
+      md5: The base64-encoded MD5 digest of the contents.
+      metageneration: The generation of the object's metadata, which changes
+          each time the metadata is updated.
+      content_type: The content type of the object's contents.
+      content_encoding: The content encoding of the object's contents, if any.
+      metadata: The object's custom metadata.
+      updated: The time at which the object was last updated.
+  """
+  size: int
+  generation: int
+  crc32c: str
+  md5: str
+  metageneration: int = 1
+  content_type: str = "application/octet-stream"
+  content_encoding: Optional[str] = None
+  metadata: Dict[str, str] = field(default_factory=dict)
+  updated: datetime = field(default_factory=_now)
+
+
+class Backend(abc.ABC):
+  """Backend stores the objects of buckets for Clients created with it.
+
+  Subclasses implement the methods below. Objects are passed to and returned
+  from them as StoredObjects, which the backend may hold on to, along with
+  their contents.
+
+  Attributes:
+      default_bucket_id: The ID of the bucket used by Clients created without
+          one.
+  """
+
+  default_bucket_id: str
+
+  def __init__(self, default_bucket_id: str = DEFAULT_BUCKET_ID):
+    """Creates a new Backend, with the ID of its default bucket."""
+    self.default_bucket_id = default_bucket_id
+
+  @abc.abstractmethod
+  def create_bucket(self, bucket_id: str) -> None:
+    """Creates a bucket, if it does not exist."""
+
+  @abc.abstractmethod
+  def has_bucket(self, bucket_id: str) -> bool:
+    """Returns whether a bucket exists."""
+
+  @abc.abstractmethod
+  def names(self, bucket_id: str) -> List[str]:
+    """Returns the names of the objects in a bucket, in any order."""
+
+  @abc.abstractmethod
+  def get(self, bucket_id: str, name: str) -> Optional[StoredObject]:
+    """Returns the metadata of an object, or None if it does not exist."""
+
+  @abc.abstractmethod
+  def read(self, bucket_id: str, name: str) -> bytes:
+    """Returns the contents of an object, which exists."""
+
+  @abc.abstractmethod
+  def write(self, bucket_id: str, name: str, obj: StoredObject,
+            data: Optional[bytes]) -> None:
+    """Stores an object, replacing any object with the same name.
+
+    If data is None, only the metadata of the existing object is replaced.
+    """
+
+  @abc.abstractmethod
+  def delete(self, bucket_id: str, name: str) -> None:
+    """Deletes an object, which exists."""
+
+  @abc.abstractmethod
+  def next_generation(self) -> int:
+    """Returns a generation greater than that of any object stored."""
+
+
+class MemoryBackend(Backend):
+  """MemoryBackend holds objects in memory, for as long as it is referenced.
+
+  Each backend is a separate set of buckets, so tests may create one each. The
+  default bucket exists from the start, and others are created with
+  `create_bucket`.
+  """
+
+  __buckets: Dict[str, Dict[str, Tuple[StoredObject, bytes]]]
+  __generations: Iterator[int]
+
+  def __init__(self, default_bucket_id: str = DEFAULT_BUCKET_ID):
+    """Creates a new MemoryBackend.
+
+    Args:
+        default_bucket_id: The ID of the bucket used by Clients created without
+            one.
+    """
+    super().__init__(default_bucket_id)
+    self.__buckets = {default_bucket_id: {}}
+    self.__generations = itertools.count(1)
+
+  def create_bucket(self, bucket_id: str) -> None:
+    """Creates an empty bucket, if it does not exist."""
+    self.__buckets.setdefault(bucket_id, {})
+
+  def has_bucket(self, bucket_id: str) -> bool:
+    """Returns whether a bucket has been created."""
+    return bucket_id in self.__buckets
+
+  def names(self, bucket_id: str) -> List[str]:
+    """Returns the names of the objects in a bucket."""
+    return list(self.__buckets[bucket_id])
+
+  def get(self, bucket_id: str, name: str) -> Optional[StoredObject]:
+    """Returns the metadata of an object, or None if it does not exist."""
+    entry = self.__buckets[bucket_id].get(name)
+    return None if entry is None else entry[0]
+
+  def read(self, bucket_id: str, name: str) -> bytes:
+    """Returns the contents of an object."""
+    return self.__buckets[bucket_id][name][1]
+
+  def write(self, bucket_id: str, name: str, obj: StoredObject,
+            data: Optional[bytes]) -> None:
+    """Stores an object, keeping its contents if data is None."""
+    bucket = self.__buckets[bucket_id]
+    if data is None:
+      data = bucket[name][1]
+    bucket[name] = (obj, data)
+
+  def delete(self, bucket_id: str, name: str) -> None:
+    """Deletes an object."""
+    del self.__buckets[bucket_id][name]
+
+  def next_generation(self) -> int:
+    """Returns the next of a sequence of generations, from 1."""
+    return next(self.__generations)
+
+
+class FilesystemBackend(Backend):
+  """FilesystemBackend stores objects as files under a root directory.
+
+  Each bucket is a directory under the root. Its objects' contents are stored
+  in its `objects` directory, and their metadata as JSON in its `metadata`
+  directory, both named by the percent-encoded object name. Objects with very
+  long names are stored under a hash of the name instead.
+
+  Objects persist between processes. Files are replaced atomically, but an
+  object's contents and metadata are replaced separately, so a directory should
+  not be written to by more than one process at a time.
+  """
+
+  root: str
+  __last_generation: int
+
+  def __init__(self, root: str, default_bucket_id: str = DEFAULT_BUCKET_ID):
+    """Creates a new FilesystemBackend, creating its default bucket if needed.
+
+    Args:
+        root: The directory holding the buckets.
+        default_bucket_id: The ID of the bucket used by Clients created without
+            one.
+    """
+    super().__init__(default_bucket_id)
+    self.root = os.path.abspath(root)
+    self.__last_generation = 0
+    self.create_bucket(default_bucket_id)
+
+  def create_bucket(self, bucket_id: str) -> None:
+    """Creates a bucket's directories, raising ValueError if its ID is unsafe."""
+    if not _is_bucket_id(bucket_id):
+      raise ValueError(f"invalid bucket ID {bucket_id!r}")
+    for directory in ("objects", "metadata", "tmp"):
+      os.makedirs(os.path.join(self.root, bucket_id, directory), exist_ok=True)
+
+  def has_bucket(self, bucket_id: str) -> bool:
+    """Returns whether a bucket's directories exist."""
+    return _is_bucket_id(bucket_id) and os.path.isdir(
+        os.path.join(self.root, bucket_id, "metadata"))
+
+  def names(self, bucket_id: str) -> List[str]:
+    """Returns the names of the objects in a bucket, from their metadata files."""
+    directory = os.path.join(self.root, bucket_id, "metadata")
+    names = []
+    for file_name in os.listdir(directory):
+      if not file_name.endswith(".json"):
+        continue
+      encoded = file_name[:-len(".json")]
+      if encoded.startswith(_HASHED_NAME_PREFIX):
+        with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+          names.append(json.load(f)["name"])
+      else:
+        names.append(unquote(encoded))
+    return names
+
+  def get(self, bucket_id: str, name: str) -> Optional[StoredObject]:
+    """Reads the metadata of an object, or returns None if it does not exist."""
+    try:
+      with open(self.__path(bucket_id, "metadata", name) + ".json",
+                encoding="utf-8") as f:
+        fields = json.load(f)
+    except FileNotFoundError:
+      return None
+    del fields["name"]
+    fields["updated"] = datetime.fromisoformat(fields["updated"])
+    return StoredObject(**fields)
+
+  def read(self, bucket_id: str, name: str) -> bytes:
+    """Reads the contents of an object."""
+    with open(self.__path(bucket_id, "objects", name), "rb") as f:
+      return f.read()
+
+  def write(self, bucket_id: str, name: str, obj: StoredObject,
+            data: Optional[bytes]) -> None:
+    """Replaces an object's files, keeping its contents if data is None."""
+    if data is not None:
+      self.__replace(bucket_id, self.__path(bucket_id, "objects", name), data)
+    fields = dict(asdict(obj), name=name, updated=obj.updated.isoformat())
+    self.__replace(bucket_id,
+                   self.__path(bucket_id, "metadata", name) + ".json",
+                   json.dumps(fields).encode("utf-8"))
+
+  def delete(self, bucket_id: str, name: str) -> None:
+    """Deletes an object's files."""
+    os.remove(self.__path(bucket_id, "metadata", name) + ".json")
+    os.remove(self.__path(bucket_id, "objects", name))
+
+  def next_generation(self) -> int:
+    """Returns the current time in microseconds, or a later generation."""
+    # Generations are timestamps in microseconds, as in GCS, so that they keep
+    # increasing across processes.
+    self.__last_generation = max(time.time_ns() // 1000,
+                                 self.__last_generation + 1)
+    return self.__last_generation
+
+  def __path(self, bucket_id: str, directory: str, name: str) -> str:
+    encoded = quote(name, safe="")
+    if len(encoded) > _MAX_ENCODED_NAME:
+      encoded = _HASHED_NAME_PREFIX + hashlib.sha256(
+          name.encode("utf-8")).hexdigest()
+    return os.path.join(self.root, bucket_id, directory, encoded)
+
+  def __replace(self, bucket_id: str, path: str, data: bytes) -> None:
+    temp_path = os.path.join(self.root, bucket_id, "tmp", uuid.uuid4().hex)
+    with open(temp_path, "wb") as f:
+      f.write(data)
+    os.replace(temp_path, path)
+
+
+def _is_bucket_id(bucket_id: str) -> bool:
+  return _BUCKET_ID.fullmatch(bucket_id) is not None
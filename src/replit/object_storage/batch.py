@@ -0,0 +1,54 @@
+"""Pythonic representation of the outcome of batch operations."""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
+
+from replit.object_storage.instrumentation import _in_current_context
+
+T = TypeVar("T")
+
+DEFAULT_BATCH_CONCURRENCY = 10
+
+
+@dataclass
+class BatchResult:
+  """BatchResult contains the outcome of a single operation within a batch.
+
+  Attributes:
+      name: The name of the object the operation was performed on.
+      result: The value returned by the operation, if it succeeded.
+      error: The error raised by the operation, if it failed.
+  """
+  name: str
+  result: Any = None
+  error: Optional[Exception] = None
+
+  @property
+  def ok(self) -> bool:
+    """Whether the operation succeeded."""
+    return self.error is None
+
+
+def _run_batch(
+    operation: Callable[[T], Any],
+    items: Iterable[T],
+    name: Callable[[T], str],
+    concurrency: int,
+) -> List[BatchResult]:
+  """Runs an operation over many items with a bounded pool of workers.
+
+  Errors raised by the operation are captured in the corresponding result rather
+  than interrupting the batch. Results are returned in the order of the items.
+  """
+  if concurrency < 1:
+    raise ValueError("concurrency must be at least 1")
+
+  def run(item: T) -> BatchResult:
+    try:
+      return BatchResult(name=name(item), result=operation(item))
+    except Exception as err:
+      return BatchResult(name=name(item), error=err)
+
+  with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    return list(executor.map(_in_current_context(run), items))
@@ -0,0 +1,294 @@
+"""Read-through caching of object contents."""
+
+import contextlib
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, cast
+
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+
+@dataclass
+class CacheStats:
+  """CacheStats contains counters describing the effectiveness of a cache.
+
+  Attributes:
+      hits: The number of downloads served from the cache.
+      misses: The number of downloads which had to fetch contents.
+      evictions: The number of entries evicted to stay within the size limits.
+      memory_bytes: The size of the entries currently held in memory.
+      disk_bytes: The size of the entries currently held on disk.
+  """
+  hits: int = 0
+  misses: int = 0
+  evictions: int = 0
+  memory_bytes: int = 0
+  disk_bytes: int = 0
+
+
+class ObjectCache:
+  """ObjectCache is a read-through cache of object contents.
+
+  An ObjectCache may be passed to a `Client`, which will then serve downloads of
+  whole objects from the cache where possible. Entries are held in memory and,
+  if a directory is configured, on disk. Each tier is bounded in size, and the
+  least recently used entries are evicted from it first.
+
+  Entries are keyed by object name and generation. Before a cached entry is
+  used, the Client revalidates it with a conditional request which only
+  transfers the object's contents if its generation has changed. Writes and
+  deletes made through a Client invalidate that Client's cached entries.
+
+  An ObjectCache is safe to share between threads and between Clients.
+  """
+
+  __lock: threading.Lock
+  __memory: "OrderedDict[str, Tuple[int, bytes, float]]"
+  __memory_bytes: int
+  __max_memory_bytes: int
+
+  __directory: Optional[str]
+  __disk: "OrderedDict[str, Tuple[int, int]]"
+  __disk_bytes: int
+  __max_disk_bytes: int
+  __pending_writes: Dict[str, object]
+
+  __revalidate_after: float
+  __stats: CacheStats
+
+  def __init__(
+      self,
+      max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+      directory: Optional[str] = None,
+      max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+      revalidate_after: float = 0.0,
+  ):
+    """Creates a new ObjectCache.
+
+    Args:
+        max_memory_bytes: The maximum total size of the entries held in memory.
+        directory: A directory in which to hold entries on disk. Entries already
+            in the directory are reused, so a cache may outlive the process.
+            If no directory is defined, entries are only held in memory.
+        max_disk_bytes: The maximum total size of the entries held on disk.
+        revalidate_after: The number of seconds for which an entry is used
+            without being revalidated. By default, entries are revalidated
+            every time they are used.
+    """
+    self.__lock = threading.Lock()
+    self.__memory = OrderedDict()
+    self.__memory_bytes = 0
+    self.__max_memory_bytes = max_memory_bytes
+    self.__directory = directory
+    self.__disk = OrderedDict()
+    self.__disk_bytes = 0
+    self.__max_disk_bytes = max_disk_bytes
+    self.__pending_writes = {}
+    self.__revalidate_after = revalidate_after
+    self.__stats = CacheStats()
+    if directory is not None:
+      os.makedirs(directory, exist_ok=True)
+      self.__load_disk_index()
+
+  def stats(self) -> CacheStats:
+    """Returns a snapshot of the cache's counters."""
+    with self.__lock:
+      return CacheStats(
+          hits=self.__stats.hits,
+          misses=self.__stats.misses,
+          evictions=self.__stats.evictions,
+          memory_bytes=self.__memory_bytes,
+          disk_bytes=self.__disk_bytes,
+      )
+
+  def clear(self) -> None:
+    """Removes every entry from the cache."""
+    with self.__lock:
+      self.__memory.clear()
+      self.__memory_bytes = 0
+      self.__pending_writes.clear()
+      paths = [self.__unindex(hashed) for hashed in list(self.__disk)]
+    _remove_files(paths)
+
+  def _lookup(self, key: str) -> Optional[Tuple[int, bytes, bool]]:
+    """Returns the cached generation and contents for a key, if any.
+
+    The final element is whether the entry was validated recently enough that it
+    does not need to be revalidated.
+    """
+    hashed = _hash_key(key)
+    with self.__lock:
+      entry = self.__memory.get(key)
+      if entry is not None:
+        self.__memory.move_to_end(key)
+        generation, data, validated_at = entry
+        fresh = time.monotonic() - validated_at < self.__revalidate_after
+        return generation, data, fresh
+      if hashed not in self.__disk:
+        return None
+      generation, _ = self.__disk[hashed]
+
+    # The file is read without holding the lock, so that lookups of other keys
+    # are not held up by the disk. It may be evicted or replaced meanwhile, in
+    # which case the index is checked again below.
+    try:
+      with open(self.__disk_path(hashed, generation), "rb") as file:
+        data = file.read()
+    except OSError:
+      data = None
+
+    with self.__lock:
+      if self.__disk.get(hashed, (None, 0))[0] != generation:
+        return None
+      if data is None:
+        self.__unindex(hashed)
+        return None
+      self.__disk.move_to_end(hashed)
+      if key not in self.__memory:
+        self.__put_in_memory(key, generation, data, validated_at=0.0)
+      return generation, data, False
+
+  def _record_hit(self, key: str) -> None:
+    """Records that a cached entry was used, after revalidating it."""
+    with self.__lock:
+      self.__stats.hits += 1
+      entry = self.__memory.get(key)
+      if entry is not None:
+        self.__memory[key] = (entry[0], entry[1], time.monotonic())
+
+  def _store(self, key: str, generation: int, data: bytes) -> None:
+    """Records a miss, and caches the contents fetched for it."""
+    hashed = _hash_key(key)
+    write = object()
+    with self.__lock:
+      self.__stats.misses += 1
+      paths = self.__remove(key)
+      self.__put_in_memory(key, generation, data, validated_at=time.monotonic())
+      on_disk = (self.__directory is not None and
+                 len(data) <= self.__max_disk_bytes)
+      if on_disk:
+        self.__pending_writes[hashed] = write
+    _remove_files(paths)
+    if on_disk:
+      self.__put_on_disk(hashed, generation, data, write)
+
+  def _invalidate(self, key: str) -> None:
+    """Removes any cached entries for a key."""
+    with self.__lock:
+      paths = self.__remove(key)
+    _remove_files(paths)
+
+  def __put_in_memory(self, key: str, generation: int, data: bytes,
+                      validated_at: float) -> None:
+    if len(data) > self.__max_memory_bytes:
+      return
+    self.__memory[key] = (generation, data, validated_at)
+    self.__memory_bytes += len(data)
+    while self.__memory_bytes > self.__max_memory_bytes:
+      _, (_, evicted, _) = self.__memory.popitem(last=False)
+      self.__memory_bytes -= len(evicted)
+      self.__stats.evictions += 1
+
+  def __put_on_disk(self, hashed: str, generation: int, data: bytes,
+                    write: object) -> None:
+    """Writes an entry to disk without holding the lock, then indexes it.
+
+    The entry is only indexed if no invalidation or newer write for the same key
+    happened while it was being written. Otherwise, it is discarded.
+    """
+    path = self.__disk_path(hashed, generation)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+      with open(temp_path, "wb") as file:
+        file.write(data)
+      os.replace(temp_path, path)
+    except OSError:
+      _remove_files([temp_path])
+      written = False
+    else:
+      written = True
+
+    with self.__lock:
+      if self.__pending_writes.get(hashed) is not write:
+        # The key was invalidated or written again meanwhile. The file is
+        # deleted, unless a newer write of the same generation replaced it.
+        superseded = self.__disk.get(hashed, (None, 0))[0] == generation
+        paths = [] if superseded or not written else [path]
+      else:
+        del self.__pending_writes[hashed]
+        paths = []
+        if written:
+          self.__disk[hashed] = (generation, len(data))
+          self.__disk_bytes += len(data)
+          paths = self.__evict_from_disk()
+    _remove_files(paths)
+
+  def __evict_from_disk(self) -> List[Optional[str]]:
+    paths = []
+    while self.__disk_bytes > self.__max_disk_bytes:
+      paths.append(self.__unindex(next(iter(self.__disk))))
+      self.__stats.evictions += 1
+    return paths
+
+  def __remove(self, key: str) -> List[Optional[str]]:
+    """Removes a key's entries, returning the files to be deleted."""
+    entry = self.__memory.pop(key, None)
+    if entry is not None:
+      self.__memory_bytes -= len(entry[1])
+    if self.__directory is None:
+      return []
+    hashed = _hash_key(key)
+    self.__pending_writes.pop(hashed, None)
+    return [self.__unindex(hashed)]
+
+  def __unindex(self, hashed: str) -> Optional[str]:
+    """Removes an entry from the disk index, returning the file to be deleted.
+
+    The file itself is deleted by the caller, once the lock is released.
+    """
+    generation, size = self.__disk.pop(hashed, (None, 0))
+    if generation is None:
+      return None
+    self.__disk_bytes -= size
+    return self.__disk_path(hashed, generation)
+
+  def __disk_path(self, hashed: str, generation: int) -> str:
+    # Entries are only held on disk if a directory is configured.
+    return os.path.join(cast(str, self.__directory), f"{hashed}.{generation}")
+
+  def __load_disk_index(self) -> None:
+    entries = []
+    for entry in os.scandir(self.__directory):
+      hashed, _, generation = entry.name.partition(".")
+      if entry.is_file() and generation.isdigit():
+        stat = entry.stat()
+        entries.append((stat.st_mtime, hashed, int(generation), stat.st_size))
+    # Entries are loaded from least to most recently written, so that the index is
+    # in LRU order. Only the latest generation of each object is kept.
+    paths = []
+    for _, hashed, generation, size in sorted(entries):
+      if self.__disk.get(hashed, (-1, 0))[0] > generation:
+        paths.append(self.__disk_path(hashed, generation))
+        continue
+      paths.append(self.__unindex(hashed))
+      self.__disk[hashed] = (generation, size)
+      self.__disk_bytes += size
+    # The directory may have been filled with a larger limit.
+    paths.extend(self.__evict_from_disk())
+    _remove_files(paths)
+
+
+def _hash_key(key: str) -> str:
+  return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _remove_files(paths: Iterable[Optional[str]]) -> None:
+  for path in paths:
+    if path is not None:
+      with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
@@ -4,26 +4,137 @@ Note: this Client is a thin wrapper over the GCS Python Library. As a result,
 many docstrings are borrowed from the underlying library.
 """
 
-from typing import List, Optional, Union
+import base64
+import io
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import astuple, dataclass
+from typing import (
+  Any,
+  BinaryIO,
+  Callable,
+  Dict,
+  Generator,
+  Iterable,
+  Iterator,
+  List,
+  Optional,
+  Sequence,
+  Tuple,
+  Union,
+  cast,
+)
+from uuid import uuid4
 
+import google_crc32c
 import requests
-from google.auth import identity_pool
+import urllib3
+from google.api_core.exceptions import NotModified, from_http_response
 from google.cloud import storage
 from google.cloud.exceptions import NotFound
-from replit.object_storage._config import REPLIT_ADC, REPLIT_DEFAULT_BUCKET_URL
+from google.cloud.storage.retry import DEFAULT_RETRY
+from replit.object_storage._checksum import (
+  CRC32C,
+  DEFAULT_CHECKSUM,
+  Hasher,
+  check_checksum,
+  crc32c_combine,
+  crc32c_from_base64,
+  hash_from_header,
+)
+from replit.object_storage._listing import list_sharded
+from replit.object_storage._resumable import (
+  CHUNK_ALIGNMENT,
+  read_exact,
+  send_chunk,
+  upload_buffer_resumable,
+  upload_resumable,
+)
+from replit.object_storage._shared import Session, fork_lock
+from replit.object_storage.backends import Backend
+from replit.object_storage.batch import (
+  DEFAULT_BATCH_CONCURRENCY,
+  BatchResult,
+  _run_batch,
+)
+from replit.object_storage.cache import ObjectCache
+from replit.object_storage.compression import (
+  _CODECS,
+  _Codec,
+  _compress,
+  _CompressingReader,
+  _decompress,
+  _get_codec,
+)
 from replit.object_storage.errors import (
-  DefaultBucketError,
+  ChecksumMismatchError,
   ObjectNotFoundError,
   _google_error_handler,
 )
-from replit.object_storage.object import Object
+from replit.object_storage.files import ObjectReader, ObjectWriter, _ChunkReader
+from replit.object_storage.instrumentation import (
+  Instrumentation,
+  _in_current_context,
+  _instrumented,
+)
+from replit.object_storage.object import Object, ObjectListing, ObjectPage
+from replit.object_storage.retry import RateLimiter, RetryPolicy
+from replit.object_storage.sync import (
+  MANIFEST_FILENAME,
+  SyncResult,
+  _directory_prefix,
+  _local_files,
+  _local_path,
+  _Manifest,
+)
+from replit.object_storage.transport import (
+  PoolStats,
+  TransportOptions,
+  _TransportAdapter,
+)
+
+DEFAULT_STREAM_CHUNK_SIZE = 1024 * 1024
+MIN_SLICE_SIZE = 8 * 1024 * 1024
+DEFAULT_UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+# The size of the ranged requests of objects opened for reading, and how far
+# ahead of sequential reads they are prefetched.
+DEFAULT_READ_BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_READ_AHEAD = 16 * 1024 * 1024
+
+# Objects which support the buffer protocol, such as bytearray, memoryview, mmap
+# and NumPy arrays, which typing cannot express before Python 3.12.
+_Buffer = Any
+MAX_COMPOSE_SOURCES = 32
+# The default number of buckets whose Clients a ClientPool keeps.
+DEFAULT_MAX_BUCKETS = 64
+
+# Requests the rest of a media download from an offset, after the error which
+# ended the previous response.
+_Resume = Callable[[int, Exception], requests.Response]
+# Errors raised when a response's connection drops while its body is read.
+_DROPPED_CONNECTION_ERRORS = (
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+    requests.ConnectionError,
+    requests.Timeout,
+)
+
+# The metadata of an Object, as requested from GCS.
+_OBJECT_FIELDS = "name,size,generation,etag,contentType,updated,crc32c"
+_LIST_FIELDS = f"items({_OBJECT_FIELDS}),prefixes,nextPageToken"
 
 
 class Client:
   """Client manages interactions with Replit Object Storage.
     
   If multiple buckets are used within an application, one Client should be used
-  per bucket
+  per bucket. Applications using many buckets may get their Clients from a
+  `ClientPool`, so that they share one HTTP session whatever their options.
 
   Any method may return one of the following errors:
   - `BucketNotFoundError`: If the bucket configured for the client could not be found.
@@ -32,110 +143,753 @@ class Client:
   - `ForbiddenError`: If access to the requested resource is not allowed.
   - `TooManyRequestsError`: If rate limiting occurs.
   - `UnauthorizedError`: If the requested operation is not allowed.
+
+  Errors from the individual operations of batch methods, such as `delete_many`,
+  are captured in the returned `BatchResult`s rather than raised.
+
+  Methods which read or write a single object accept preconditions. If a
+  precondition does not hold, the method raises `PreconditionFailedError`, or
+  `NotModifiedError` when reading an object that has not changed:
+  - `if_generation_match`: The object's generation must match the given value.
+      A value of 0 requires that the object does not exist yet.
+  - `if_generation_not_match`: The object's generation must not match the given
+      value.
+  - `if_metageneration_match`: The object's metageneration, which changes each
+      time its metadata is updated, must match the given value.
+  - `if_metageneration_not_match`: The object's metageneration must not match
+      the given value.
+  When copying or uploading, preconditions apply to the destination object.
+
+  Credentials and the default bucket ID are resolved once and shared by every
+  Client in the process, as is the underlying HTTP session unless a `retry`
+  policy, `rate_limiter` or `transport` options are given. Credentials are
+  refreshed in the background before they expire, so creating many short-lived
+  Clients is cheap.
+
+  A Client is safe to share between threads. Concurrent requests are limited by
+  the size of its connection pool, which may be raised with `transport`.
+
+  A Client may also be used on both sides of a fork, as by prefork servers and
+  `multiprocessing`. A child process detects that it was forked on its first
+  request and opens its own connections, keeping the resolved bucket ID. To pass
+  a bucket to the workers of a process pool, pass them a `ClientHandle` from
+  `handle`.
   """
 
   __gcs_client: storage.Client
+  __adapter: _TransportAdapter
+  __lock: threading.Lock
+  __pid: int
+
+  __session: Session
 
   __bucket_id: Optional[str] = None
   __gcs_bucket_handle: Optional[storage.Bucket] = None
 
-  def __init__(self, bucket_id: Optional[str] = None):
+  __cache: Optional[ObjectCache] = None
+  __codec: Optional[_Codec] = None
+  __checksum: Optional[str] = DEFAULT_CHECKSUM
+  __library_options: Dict[str, Any]
+
+  # Read by the _instrumented decorator of each operation.
+  _instrumentation: Optional[Instrumentation] = None
+
+  def __init__(
+      self,
+      bucket_id: Optional[str] = None,
+      cache: Optional[ObjectCache] = None,
+      retry: Optional[RetryPolicy] = None,
+      rate_limiter: Optional[RateLimiter] = None,
+      transport: Optional[TransportOptions] = None,
+      instrumentation: Optional[Instrumentation] = None,
+      compression: Optional[str] = None,
+      checksum: Optional[str] = DEFAULT_CHECKSUM,
+      backend: Optional[Backend] = None,
+      _session: Optional[Session] = None,
+  ):
     """Creates a new Client.
 
     Args:
         bucket_id: The ID of the bucket this Client should interface with.
             If no ID is defined, the Repl / Deployment's default bucket will be
             used.
+        cache: A cache to serve downloads of whole objects from, with
+            `download_as_bytes` and `download_as_text`. Writes and deletes made
+            through this Client invalidate the affected entries.
+        retry: A policy for retrying requests which fail with transient errors.
+            If a policy is defined, it replaces the retries of the underlying
+            GCS library, so that attempts are not multiplied between the two.
+        rate_limiter: A limiter for the rate at which this Client sends
+            requests. It may be shared between Clients, to limit their combined
+            rate.
+        transport: Options for the HTTP connections of this Client, such as
+            the size of its connection pool.
+        instrumentation: An instrumentation to deliver an event to after each
+            call of a method of this Client, describing its duration, requests
+            and outcome.
+        compression: The codec to compress the contents of uploads with,
+            either "gzip" or "zstd". Compressed contents are decompressed as
+            they are downloaded, whichever codec they were compressed with,
+            by every Client, whether or not it compresses uploads itself.
+            Ranges, as read by `download_range`, are ranges of the stored,
+            compressed contents, and `sync_down` and `sync_up` compare files
+            with the stored contents, so transfer every compressed object.
+        checksum: The checksum to verify downloads of whole objects with, as
+            they stream in: "crc32c", "md5", or None not to verify them. Methods
+            which download objects may override it. Defaults to "crc32c" when
+            google-crc32c has a native build, and to "md5" otherwise.
+        backend: A backend to store objects in, in place of Replit Object
+            Storage, such as a `MemoryBackend` for tests. Requests are served
+            in-process, by an emulator of GCS. If no bucket ID is defined, the
+            backend's default bucket is used.
     """
-    creds = identity_pool.Credentials(**REPLIT_ADC)
     if bucket_id:
       self.__bucket_id = bucket_id
-    self.__gcs_client = storage.Client(credentials=creds, project="")
+    self.__lock = threading.Lock()
     self.__gcs_bucket_handle = None
+    self.__cache = cache
+    # The Clients of a ClientPool are given its session, in place of their own.
+    if _session is None:
+      _session = Session(retry, rate_limiter, transport, backend)
+    self.__session = _session
+    self.__library_options = {} if _session.retry is None else {"retry": None}
+    self._instrumentation = instrumentation
+    if compression is not None:
+      self.__codec = _get_codec(compression)
+    check_checksum(checksum)
+    self.__checksum = checksum
+    self.__connect()
+
+  @_instrumented
+  @_google_error_handler
+  def compose(
+      self,
+      source_names: Sequence[str],
+      dest_object_name: str,
+      content_type: Optional[str] = None,
+      if_generation_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+  ) -> None:
+    """Concatenates objects into a destination object, without transferring them.
+
+    Only MAX_COMPOSE_SOURCES objects may be composed by a single request, so
+    more are composed in a tree of intermediate objects, which are deleted
+    afterwards. An object may be given as a source more than once. The
+    destination has no content encoding, whatever those of the sources.
+
+    Args:
+        source_names: The names of the objects to concatenate, in order.
+        dest_object_name: The name of the object to write the concatenation to,
+            which may be one of the sources.
+        content_type: The content type of the destination object.
+        if_generation_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+
+    Raises:
+        ObjectNotFoundError: If a source object could not be found.
+    """
+    source_names = list(source_names)
+    if not source_names:
+      raise ValueError("at least one source object is required")
+    temp_prefix = f"{dest_object_name}.compose-{uuid4().hex}/"
+    temp_names: List[str] = []
+    try:
+      self.__compose(
+          source_names,
+          dest_object_name,
+          temp_prefix,
+          content_type,
+          temp_names,
+          if_generation_match=if_generation_match,
+          if_metageneration_match=if_metageneration_match,
+      )
+    finally:
+      self.delete_many(temp_names, ignore_not_found=True)
+    self.__invalidate(dest_object_name)
 
+  @_instrumented
   @_google_error_handler
-  def copy(self, object_name: str, dest_object_name: str) -> None:
+  def copy(
+      self,
+      object_name: str,
+      dest_object_name: str,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+      progress: Optional[Callable[[int, int], None]] = None,
+  ) -> None:
     """Copies the specified object within the same bucket.
 
     If an object exists in the same location, it will be overwritten.
 
+    Objects are copied by rewrite requests, each of which copies as much as GCS
+    allows before returning a token to continue from, so that large objects do
+    not need to be copied by a single request which may time out. Small objects
+    are copied by a single request.
+
     Args:
         object_name: The full path of the object to be copied.
         dest_object_name: The full path to copy the object to.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+        progress: A callable which is called after each rewrite request with the
+            number of bytes copied so far and the size of the object.
 
     Raises:
         ObjectNotFoundError: If the source object could not be found.
     """
-    source_object = self.__object(object_name)
-    bucket = self.__bucket()
-    bucket.copy_blob(
-      source_object,
-      bucket,
-      dest_object_name,
+    source = self.__object(object_name)
+    destination = self.__object(dest_object_name)
+    token = None
+    while True:
+      token, rewritten, size = destination.rewrite(
+          source,
+          token=token,
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+          **self.__library_options,
+      )
+      if progress is not None:
+        progress(rewritten, size)
+      if token is None:
+        break
+    self.__invalidate(dest_object_name)
+
+  def copy_many(
+      self,
+      objects: Iterable[Tuple[str, str]],
+      concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+  ) -> List[BatchResult]:
+    """Copies many objects within the same bucket concurrently.
+
+    Args:
+        objects: Pairs of the full path of an object to be copied, and the full
+            path to copy it to.
+        concurrency: The maximum number of copies to perform at once.
+
+    Returns:
+        A result per pair, named after the object copied, in the order given.
+    """
+    return self.__run_batch(
+        lambda pair: self.copy(*pair),
+        objects,
+        name=lambda pair: pair[0],
+        concurrency=concurrency,
+    )
+
+  @_instrumented
+  @_google_error_handler
+  def create_upload_session(
+      self,
+      dest_object_name: str,
+      content_type: Optional[str] = None,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> str:
+    """Creates a resumable upload session for an object.
+
+    The session's URL may be persisted and passed to `upload_from_file` to
+    resume an upload which was interrupted, for example by a process restart.
+    Sessions expire after a week.
+
+    Args:
+        dest_object_name: The name of the object to be uploaded.
+        content_type: The content type of the object.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+
+    Returns:
+        The URL of the upload session.
+    """
+    blob = self.__object(dest_object_name)
+    if self.__codec is not None:
+      blob.content_encoding = self.__codec.name
+    session_url = blob.create_resumable_upload_session(
+        content_type=content_type,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+        **self.__library_options,
     )
+    return cast(str, session_url)
 
+  @_instrumented
   @_google_error_handler
-  def delete(self, object_name: str, ignore_not_found: bool = False) -> None:
+  def delete(
+      self,
+      object_name: str,
+      ignore_not_found: bool = False,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> None:
     """Deletes an object from Object Storage.
 
     Args:
         object_name: The name of the object to be deleted.
         ignore_not_found: Whether an error should be raised if the object does not
           exist.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
 
     Raises:
         ObjectNotFoundError: If the object could not be found.
     """
+    self.__invalidate(object_name)
     try:
-      return self.__object(object_name).delete()
+      return self.__object(object_name).delete(
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+          **self.__library_options,
+      )
     except NotFound as err:
       if ignore_not_found:
         return
       raise ObjectNotFoundError("The requested object could not be found.") from err
 
+  def delete_many(
+      self,
+      object_names: Iterable[str],
+      ignore_not_found: bool = False,
+      concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+  ) -> List[BatchResult]:
+    """Deletes many objects from Object Storage concurrently.
+
+    Args:
+        object_names: The names of the objects to be deleted.
+        ignore_not_found: Whether an error should be recorded if an object does
+          not exist.
+        concurrency: The maximum number of deletions to perform at once.
+
+    Returns:
+        A result per object, in the order given.
+    """
+    return self.__run_batch(
+        lambda name: self.delete(name, ignore_not_found=ignore_not_found),
+        object_names,
+        name=str,
+        concurrency=concurrency,
+    )
+
+  @_instrumented
   @_google_error_handler
-  def download_as_bytes(self, object_name: str) -> bytes:
+  def download_as_bytes(
+      self,
+      object_name: str,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+      checksum: Optional[str] = "default",
+  ) -> bytes:
     """Download the contents an object as a bytes object.
 
     Args:
         object_name: The name of the object to be downloaded.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+        checksum: The checksum to verify the contents with, "crc32c", "md5",
+            or None not to verify them. Defaults to the Client's.
 
     Returns:
         The raw byte representation of the object's contents.
 
     Raises:
         ObjectNotFoundError: If the object could not be found.
+        ChecksumMismatchError: If the contents did not match their checksum.
     """
-    return self.__object(object_name).download_as_bytes()
+    checksum = self.__resolve_checksum(checksum)
+    if self.__cache is not None and not _has_preconditions(
+        if_generation_match, if_generation_not_match, if_metageneration_match,
+        if_metageneration_not_match):
+      return self.__download_cached(object_name, checksum)
+    data, _ = self.__fetch(
+        object_name,
+        checksum,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+    )
+    return data
 
+  @_instrumented
   @_google_error_handler
-  def download_as_text(self, object_name: str) -> str:
+  def download_as_text(
+      self,
+      object_name: str,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+      checksum: Optional[str] = "default",
+  ) -> str:
     """Download the contents an object as a string.
 
     Args:
         object_name: The name of the object to be downloaded.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+        checksum: The checksum to verify the contents with, "crc32c", "md5",
+            or None not to verify them. Defaults to the Client's.
 
     Returns:
         The object's contents as a UTF-8 encoded string.
 
     Raises:
         ObjectNotFoundError: If the object could not be found.
+        ChecksumMismatchError: If the contents did not match their checksum.
+    """
+    checksum = self.__resolve_checksum(checksum)
+    if self.__cache is not None and not _has_preconditions(
+        if_generation_match, if_generation_not_match, if_metageneration_match,
+        if_metageneration_not_match):
+      return self.__download_cached(object_name, checksum).decode("utf-8")
+    data, _ = self.__fetch(
+        object_name,
+        checksum,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+    )
+    return data.decode("utf-8")
+
+  @_instrumented
+  @_google_error_handler
+  def download_if_changed(
+      self,
+      object_name: str,
+      known_generation: Optional[int],
+  ) -> Optional[Tuple[bytes, int]]:
+    """Download the contents of an object, unless it has not changed.
+
+    Args:
+        object_name: The name of the object to be downloaded.
+        known_generation: The generation of the object's contents which the
+            caller already has, or None to always download them.
+
+    Returns:
+        The object's contents and their generation, or None if the object's
+        generation is still known_generation.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    try:
+      return self.__fetch(object_name,
+                          self.__checksum,
+                          if_generation_not_match=known_generation)
+    except NotModified:
+      return None
+
+  @_instrumented
+  @_google_error_handler
+  def download_into(
+      self,
+      object_name: str,
+      buffer: _Buffer,
+      offset: int = 0,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+      checksum: Optional[str] = "default",
+  ) -> int:
+    """Download the contents of an object into a preallocated buffer.
+
+    The contents are written chunk by chunk as they are received, so reusing a
+    buffer avoids allocating the object's contents on every download.
+
+    Args:
+        object_name: The name of the object to be downloaded.
+        buffer: A writable, contiguous object which supports the buffer
+            protocol, such as a bytearray, a memoryview, a NumPy array or an mmap
+            of a file. It is written to as bytes, whatever its item type.
+        offset: The offset within buffer, in bytes, to write the contents at.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+        checksum: The checksum to verify the contents with, "crc32c", "md5",
+            or None not to verify them. Defaults to the Client's.
+
+    Returns:
+        The number of bytes written to buffer.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+        ChecksumMismatchError: If the contents did not match their checksum.
+        ValueError: If the object's contents do not fit in buffer after offset.
+            Bytes before the end of buffer may have been written.
+    """
+    checksum = self.__resolve_checksum(checksum)
+    view = memoryview(buffer).cast("B")
+    if view.readonly:
+      raise TypeError("buffer must be writable")
+    if not 0 <= offset <= len(view):
+      raise ValueError("offset must be within buffer")
+    view = view[offset:]
+    if self.__cache is not None and not _has_preconditions(
+        if_generation_match, if_generation_not_match, if_metageneration_match,
+        if_metageneration_not_match):
+      data = self.__download_cached(object_name, checksum)
+      if len(data) > len(view):
+        raise ValueError(_too_large_for_buffer(object_name))
+      view[:len(data)] = data
+      return len(data)
+    response = self.__open_media(
+        object_name,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+    )
+    length = response.headers.get("Content-Length")
+    if ("Content-Encoding" not in response.headers and length is not None and
+        int(length) > len(view)):
+      response.close()
+      raise ValueError(_too_large_for_buffer(object_name))
+    chunks = _iter_decoded(response, DEFAULT_STREAM_CHUNK_SIZE, checksum,
+                           resume=self.__resumer(object_name, response))
+    size = 0
+    with closing(chunks):
+      for chunk in chunks:
+        if size + len(chunk) > len(view):
+          raise ValueError(_too_large_for_buffer(object_name))
+        view[size:size + len(chunk)] = chunk
+        size += len(chunk)
+    return size
+
+  def download_many(
+      self,
+      object_names: Iterable[str],
+      concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+  ) -> List[BatchResult]:
+    """Download the contents of many objects as bytes objects concurrently.
+
+    Args:
+        object_names: The names of the objects to be downloaded.
+        concurrency: The maximum number of downloads to perform at once.
+
+    Returns:
+        A result per object, in the order given, holding the raw byte
+        representation of the object's contents.
+    """
+    return self.__run_batch(
+        self.download_as_bytes,
+        object_names,
+        name=str,
+        concurrency=concurrency,
+    )
+
+  @_instrumented
+  @_google_error_handler
+  def download_range(
+      self,
+      object_name: str,
+      start: int,
+      end: Optional[int] = None,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> bytes:
+    """Download a range of bytes from the contents of an object.
+
+    Args:
+        object_name: The name of the object to be downloaded.
+        start: The offset of the first byte to be downloaded. A negative offset
+            selects that many bytes from the end of the object, in which case
+            end must not be set.
+        end: The offset of the last byte to be downloaded, inclusive. If not set,
+            the object will be read until its end.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+
+    Returns:
+        The raw byte representation of the requested range of the object's
+        contents.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    if start < 0 and end is not None:
+      raise ValueError("end must not be set when start is negative")
+    return self.__object(object_name).download_as_bytes(
+        start=start,
+        end=end,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+        **self.__library_options,
+    )
+
+  @_instrumented
+  @_google_error_handler
+  def download_stream(
+      self,
+      object_name: str,
+      chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+      start: Optional[int] = None,
+      end: Optional[int] = None,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+      checksum: Optional[str] = "default",
+  ) -> Iterator[bytes]:
+    """Download the contents of an object as a stream of chunks.
+
+    The request is made when this method is called, so errors such as a missing
+    object are raised immediately. Chunks are then read from the connection as
+    they are iterated over, so memory usage is bounded by chunk_size regardless
+    of the size of the object. The connection is released once the iterator is
+    exhausted or closed. If the connection drops partway through a whole
+    object, the rest of the object is requested from where it left off.
+
+    Args:
+        object_name: The name of the object to be downloaded.
+        chunk_size: The maximum size of each chunk, in bytes. The contents of
+            objects decompressed by a Client with `compression` are read in
+            chunks of this size, which may each decompress to more.
+        start: The offset of the first byte to be downloaded. See
+            `download_range`.
+        end: The offset of the last byte to be downloaded, inclusive. See
+            `download_range`.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+        checksum: The checksum to verify the contents with as they stream in,
+            "crc32c", "md5", or None not to verify them. Defaults to the
+            Client's. Ranges are never verified, as only the checksums of whole
+            objects are known.
+
+    Returns:
+        An iterator over chunks of the object's contents.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+        ChecksumMismatchError: If the contents did not match their checksum,
+            which is raised once the last chunk has been read.
     """
-    return self.__object(object_name).download_as_text()
+    checksum = self.__resolve_checksum(checksum)
+    response = self.__open_media(
+        object_name,
+        start=start,
+        end=end,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+    )
+    if start is None and end is None:
+      return _iter_decoded(response,
+                           chunk_size,
+                           checksum,
+                           resume=self.__resumer(object_name, response))
+    return _iter_response(response, chunk_size)
 
+  @_instrumented
   @_google_error_handler
-  def download_to_filename(self, object_name: str, dest_filename: str) -> None:
+  def download_to_filename(
+      self,
+      object_name: str,
+      dest_filename: str,
+      slices: int = 1,
+      slice_size: Optional[int] = None,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+      checksum: Optional[str] = "default",
+  ) -> Dict[str, str]:
     """Download the contents an object into a file on the local disk.
 
+    The checksum of the contents is computed as they are written, so the file
+    never needs to be read again to verify it, and is returned so that it can
+    be reused, for example in a manifest of files.
+
+    Large objects may be downloaded in slices: byte ranges of the object which
+    are fetched concurrently over separate connections, and written in place at
+    their offsets in the file. Once every slice has been written, the checksum
+    of the whole object is verified. Sliced downloads are verified with CRC32C
+    whatever the checksum, unless it is None, as the MD5 digests of slices
+    cannot be combined.
+
     Args:
         object_name: The name of the object to be downloaded.
         dest_filename: The filename of the file on the local disk to be written.
+        slices: The maximum number of slices to download concurrently. Slicing
+            is only used if this is greater than 1.
+        slice_size: The size of each slice in bytes. If not set, the object is
+            divided evenly between slices. Objects with a Content-Encoding,
+            such as gzip, are never sliced.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+        checksum: The checksum to verify the contents with, "crc32c", "md5",
+            or None not to verify them. Defaults to the Client's.
+
+    Returns:
+        The base64-encoded digests of the object's stored contents, as in its
+        metadata, by algorithm, such as {"crc32c": "ZOcVfg=="}. Empty if the
+        contents were not verified.
 
     Raises:
+        ChecksumMismatchError: If the contents did not match their checksum.
         ObjectNotFoundError: If the object could not be found.
     """
-    return self.__object(object_name).download_to_filename(dest_filename)
+    checksum = self.__resolve_checksum(checksum)
+    if slice_size is not None and slice_size <= 0:
+      raise ValueError("slice_size must be positive")
+    if slices > 1:
+      return self.__download_sliced(
+          object_name,
+          dest_filename,
+          slices,
+          slice_size,
+          checksum,
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+      )
+    return self.__download_decoded(
+        object_name,
+        dest_filename,
+        checksum,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+    )
 
+  @_instrumented
   @_google_error_handler
   def exists(self, object_name: str) -> bool:
     """Checks if an object exist.
@@ -146,8 +900,126 @@ class Client:
     Returns:
         Whether or not the object exists.
     """
-    return self.__object(object_name).exists()
+    return self.__object(object_name).exists(**self.__library_options)
+
+  def exists_many(
+      self,
+      object_names: Iterable[str],
+      concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+  ) -> List[BatchResult]:
+    """Checks if many objects exist concurrently.
+
+    Args:
+        object_names: The names of the objects to be checked.
+        concurrency: The maximum number of checks to perform at once.
+
+    Returns:
+        A result per object, in the order given, holding whether or not the
+        object exists.
+    """
+    return self.__run_batch(
+        self.exists,
+        object_names,
+        name=str,
+        concurrency=concurrency,
+    )
+
+  @_instrumented
+  @_google_error_handler
+  def iter_object_pages(
+      self,
+      end_offset: Optional[str] = None,
+      match_glob: Optional[str] = None,
+      max_results: Optional[int] = None,
+      page_size: Optional[int] = None,
+      page_token: Optional[str] = None,
+      prefix: Optional[str] = None,
+      start_offset: Optional[str] = None,
+      delimiter: Optional[str] = None,
+  ) -> Iterator[ObjectPage]:
+    """Lazily lists objects in the bucket, a page at a time.
+
+    Each page is requested as the previous one is consumed. The token of each
+    page may be passed as page_token to resume listing after it, for example
+    from another process.
+
+    Args:
+        end_offset: See `list`.
+        match_glob: See `list`.
+        max_results: See `list`.
+        page_size: The maximum number of objects in each page.
+        page_token: A token returned with a previous page, from which to resume
+            listing.
+        prefix: See `list`.
+        start_offset: See `list`.
+        delimiter: See `list`. The prefixes of the names of objects beyond the
+            delimiter are returned in each page's prefixes.
+
+    Returns:
+        An iterator over pages of objects matching the given query parameters.
+    """
+    iterator = self.__bucket().list_blobs(
+        delimiter=delimiter,
+        end_offset=end_offset,
+        fields=_LIST_FIELDS,
+        match_glob=match_glob,
+        max_results=max_results,
+        page_size=page_size,
+        page_token=page_token,
+        prefix=prefix,
+        start_offset=start_offset,
+        **self.__library_options,
+    )
+    for page in iterator.pages:
+      objects = [_object_from_blob(blob) for blob in page]
+      yield ObjectPage(objects=objects,
+                       next_page_token=iterator.next_page_token,
+                       prefixes=list(page.prefixes))
+
+  @_instrumented
+  @_google_error_handler
+  def iter_objects(
+      self,
+      end_offset: Optional[str] = None,
+      match_glob: Optional[str] = None,
+      max_results: Optional[int] = None,
+      page_size: Optional[int] = None,
+      page_token: Optional[str] = None,
+      prefix: Optional[str] = None,
+      start_offset: Optional[str] = None,
+      delimiter: Optional[str] = None,
+  ) -> Iterator[Object]:
+    """Lazily lists objects in the bucket.
+
+    Unlike `list`, objects are yielded as each page of results arrives, so only
+    a page of objects is held in memory at once.
+
+    Args:
+        end_offset: See `list`.
+        match_glob: See `list`.
+        max_results: See `list`.
+        page_size: The maximum number of objects requested in each page.
+        page_token: See `iter_object_pages`.
+        prefix: See `list`.
+        start_offset: See `list`.
+        delimiter: See `list`.
+
+    Returns:
+        An iterator over objects matching the given query parameters.
+    """
+    for page in self.iter_object_pages(
+        delimiter=delimiter,
+        end_offset=end_offset,
+        match_glob=match_glob,
+        max_results=max_results,
+        page_size=page_size,
+        page_token=page_token,
+        prefix=prefix,
+        start_offset=start_offset,
+    ):
+      yield from page.objects
 
+  @_instrumented
   @_google_error_handler
   def list(
       self,
@@ -156,9 +1028,16 @@ class Client:
       max_results: Optional[int] = None,
       prefix: Optional[str] = None,
       start_offset: Optional[str] = None,
+      delimiter: Optional[str] = None,
+      parallelism: int = 1,
   ) -> List[Object]:
     """Lists objects in the bucket.
 
+    Large listings may be sped up by setting parallelism, which lists disjoint
+    ranges of names concurrently. Listing starts with one range, and whenever a
+    range has more pages and a worker is idle, the rest of the range is split in
+    two at a name roughly halfway through it, for the idle worker to list.
+
     Args:
         end_offset: Filter results to objects whose names are lexicographically
             before end_offset. If start_offset is also set, the objects listed
@@ -172,57 +1051,1078 @@ class Client:
             lexicographically equal to or after start_offset. If endOffset is
             also set, the objects listed have names between start_offset
             (inclusive) and end_offset (exclusive).
+        delimiter: Filter results to objects whose names contain no delimiter
+            after the prefix, such as "/" to list the objects directly within
+            a "directory". See `list_directory` to also list the prefixes of the
+            other objects.
+        parallelism: The maximum number of ranges of names to list at once.
+            Objects are returned sorted by name either way.
 
     Returns:
         A list of objects matching the given query parameters. 
     """
+    if parallelism < 1:
+      raise ValueError("parallelism must be at least 1")
+    if parallelism > 1:
+      if max_results is not None:
+        raise ValueError("max_results cannot be used with parallel listing")
+
+      def list_page(
+          start: Optional[str], end: Optional[str],
+          page_token: Optional[str]) -> Tuple[List[Object], Optional[str]]:
+        page = next(
+            self.iter_object_pages(
+                delimiter=delimiter,
+                end_offset=end,
+                match_glob=match_glob,
+                page_token=page_token,
+                prefix=prefix,
+                start_offset=start,
+            ))
+        return page.objects, page.next_page_token
+
+      return list_sharded(list_page, prefix, start_offset, end_offset,
+                          parallelism)
     iter = self.__bucket().list_blobs(
+        delimiter=delimiter,
         end_offset=end_offset,
+        fields=_LIST_FIELDS,
         match_glob=match_glob,
         max_results=max_results,
         prefix=prefix,
         start_offset=start_offset,
+        **self.__library_options,
     )
-    return [Object(name=object.name) for object in iter]
+    return [_object_from_blob(object) for object in iter]
 
+  @_instrumented
   @_google_error_handler
-  def upload_from_filename(self, dest_object_name: str,
-                           src_filename: str) -> None:
+  def list_directory(
+      self,
+      prefix: Optional[str] = None,
+      delimiter: str = "/",
+      end_offset: Optional[str] = None,
+      match_glob: Optional[str] = None,
+      start_offset: Optional[str] = None,
+  ) -> ObjectListing:
+    """Lists the objects and "subdirectories" directly within a prefix.
+
+    Args:
+        prefix: The prefix to list within, such as "photos/", or None to list
+            the root of the bucket.
+        delimiter: The delimiter which separates "directories" in names.
+        end_offset: See `list`.
+        match_glob: See `list`.
+        start_offset: See `list`.
+
+    Returns:
+        The objects whose names contain no delimiter after the prefix, and the
+        prefixes of the other objects' names up to and including the delimiter
+        after the prefix.
+    """
+    iterator = self.__bucket().list_blobs(
+        delimiter=delimiter,
+        end_offset=end_offset,
+        fields=_LIST_FIELDS,
+        match_glob=match_glob,
+        prefix=prefix,
+        start_offset=start_offset,
+        **self.__library_options,
+    )
+    objects = [_object_from_blob(blob) for blob in iterator]
+    return ObjectListing(objects=objects, prefixes=sorted(iterator.prefixes))
+
+  @_instrumented
+  @_google_error_handler
+  def open(
+      self,
+      object_name: str,
+      mode: str = "rb",
+      block_size: int = DEFAULT_READ_BLOCK_SIZE,
+      read_ahead: int = DEFAULT_READ_AHEAD,
+      chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+      content_type: Optional[str] = None,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> Union[io.BufferedReader, ObjectWriter]:
+    """Opens an object as a binary file object, for reading or writing.
+
+    In "rb" mode, the object's contents are read through an `ObjectReader`,
+    which fetches them in blocks of ranged requests, prefetching ahead of
+    sequential reads, and is wrapped in an io.BufferedReader. It may be seeked,
+    so it may be passed to libraries such as zipfile and tarfile. Objects
+    stored compressed, with a Content-Encoding, are instead streamed and
+    decompressed from start to end, and cannot be seeked.
+
+    In "wb" mode, the returned `ObjectWriter` uploads chunks of the contents
+    through a resumable upload session as they are written, and creates the
+    object when it is closed. Used as a context manager, it abandons the upload
+    if the block raises.
+
+        with client.open("archive.zip") as f:
+          names = zipfile.ZipFile(f).namelist()
+
+    To read or write text, wrap the file object in an io.TextIOWrapper.
+
+    Args:
+        object_name: The name of the object.
+        mode: "rb" to read the object, or "wb" to write it.
+        block_size: When reading, the size of each ranged request, in bytes.
+        read_ahead: When reading, the number of bytes to prefetch beyond the
+            block being read. Zero disables prefetching.
+        chunk_size: When writing, the size of each chunk uploaded, in bytes,
+            which must be a multiple of 256 KiB. At most two chunks are held in
+            memory.
+        content_type: When writing, the content type of the object.
+        if_generation_match: See preconditions in `Client`. When reading, they
+            are checked when the object is opened.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+
+    Returns:
+        A readable file object in "rb" mode, or an `ObjectWriter` in "wb" mode.
+
+    Raises:
+        ObjectNotFoundError: If the object to be read could not be found.
+        ValueError: If mode is neither "rb" nor "wb".
+    """
+    if mode == "rb":
+      blob = self.__object(object_name)
+      blob.reload(
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+          **self.__library_options,
+      )
+      generation = cast(int, blob.generation)
+      if blob.content_encoding:
+        # Ranges of encoded objects are ranges of their stored contents, which
+        # cannot be decompressed on their own.
+        chunks = self.download_stream(object_name,
+                                      if_generation_match=generation)
+        return io.BufferedReader(_ChunkReader(object_name, chunks))
+      reader = ObjectReader(
+          object_name,
+          blob.size or 0,
+          generation,
+          lambda start, end: self.download_range(
+              object_name, start, end, if_generation_match=generation),
+          block_size,
+          read_ahead,
+      )
+      return io.BufferedReader(reader)
+    if mode == "wb":
+      if chunk_size <= 0 or chunk_size % CHUNK_ALIGNMENT != 0:
+        raise ValueError(
+            f"chunk_size must be a multiple of {CHUNK_ALIGNMENT} bytes")
+      session_url = self.create_upload_session(
+          object_name,
+          content_type,
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+      )
+      transport = self.__gcs_client._http
+      return ObjectWriter(
+          object_name,
+          _google_error_handler(lambda chunk, offset, total: send_chunk(
+              transport, session_url, chunk, offset, total)),
+          chunk_size,
+          compressor=None if self.__codec is None else self.__codec.compressor(),
+          on_close=lambda: self.__invalidate(object_name),
+      )
+    raise ValueError(f"mode must be 'rb' or 'wb', not {mode!r}")
+
+  def handle(self) -> "ClientHandle":
+    """Returns a picklable handle to this Client's bucket.
+
+    The default bucket ID is resolved first, if it has not been already, so that
+    processes using the handle do not need to resolve it again.
+    """
+    self.__bucket()
+    return ClientHandle(cast(str, self.__bucket_id), self.__session.transport,
+                        self.__session.backend)
+
+  def pool_stats(self) -> PoolStats:
+    """Returns a snapshot of the use of this Client's connection pool.
+
+    Clients without their own transport options share a pool, and so report the
+    same statistics.
+    """
+    self.__check_fork()
+    return self.__adapter.pool_stats()
+
+  @_instrumented
+  @_google_error_handler
+  def stat(
+      self,
+      object_name: str,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> Object:
+    """Returns the metadata of an object, without downloading its contents.
+
+    The metadata is fetched with a single request, so `stat` may be used in
+    place of `exists` to also learn an object's size, content type, generation
+    and update time.
+
+    Args:
+        object_name: The name of the object.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+
+    Returns:
+        The object's metadata.
+
+    Raises:
+        ObjectNotFoundError: If the object could not be found.
+    """
+    blob = self.__object(object_name)
+    blob.reload(
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+        **self.__library_options,
+    )
+    return _object_from_blob(blob)
+
+  def stat_many(
+      self,
+      object_names: Iterable[str],
+      concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+  ) -> List[BatchResult]:
+    """Returns the metadata of many objects concurrently.
+
+    Args:
+        object_names: The names of the objects.
+        concurrency: The maximum number of lookups to perform at once.
+
+    Returns:
+        A result per object, in the order given, holding its Object. Objects
+        which do not exist have an `ObjectNotFoundError` as their error.
+    """
+    return self.__run_batch(
+        self.stat,
+        object_names,
+        name=str,
+        concurrency=concurrency,
+    )
+
+  def sync_down(
+      self,
+      prefix: str,
+      local_dir: str,
+      delete: bool = False,
+      concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+      manifest_path: Optional[str] = None,
+  ) -> SyncResult:
+    """Downloads the objects under a prefix which differ from a local directory.
+
+    The objects are listed once, and each is compared with the file at its path
+    relative to the prefix. Objects whose size and CRC32C checksum match their
+    file are skipped, and the rest are downloaded concurrently. Each file is
+    written to a temporary file first, which replaces it once complete.
+
+    The checksums of local files are cached in a manifest, and are only
+    computed again once a file's size or modification time changes, so that
+    directories which are already in sync are checked without reading them.
+
+    Args:
+        prefix: The prefix of the objects to download. A slash is appended if it
+            does not end with one.
+        local_dir: The directory to download the objects into, which is created
+            if it does not exist.
+        delete: Whether to delete files in local_dir which have no object.
+        concurrency: The maximum number of downloads or deletions to perform at
+            once.
+        manifest_path: The path of the manifest. If not set, the manifest is kept
+            within local_dir, as `MANIFEST_FILENAME`.
+
+    Returns:
+        The outcome of each download and deletion. Objects whose names are not
+        paths within local_dir, such as those containing "..", fail to download.
+    """
+    os.makedirs(local_dir, exist_ok=True)
+    prefix = _directory_prefix(prefix)
+    manifest = _Manifest(manifest_path or
+                         os.path.join(local_dir, MANIFEST_FILENAME))
+    remote = {
+        obj.name[len(prefix):]: obj
+        for obj in self.iter_objects(prefix=prefix)
+        # Objects named like directories, with a trailing slash, have no file.
+        if not obj.name.endswith("/")
+    }
+    local = _local_files(local_dir, manifest.path)
+    result = SyncResult()
+    changed = []
+    for relative_path, obj in remote.items():
+      path = local.get(relative_path)
+      if (path is not None and os.path.getsize(path) == obj.size and
+          manifest.crc32c(relative_path, path) == obj.crc32c):
+        result.unchanged.append(obj.name)
+      else:
+        changed.append(relative_path)
+
+    def download(relative_path: str) -> None:
+      path = _local_path(local_dir, relative_path)
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      temp_path = f"{path}.part-{uuid4().hex}"
+      try:
+        self.download_to_filename(prefix + relative_path, temp_path)
+        os.replace(temp_path, path)
+      finally:
+        if os.path.exists(temp_path):
+          os.remove(temp_path)
+      crc32c = remote[relative_path].crc32c
+      if crc32c is not None:
+        manifest.record(relative_path, path, crc32c)
+
+    result.transferred = self.__run_batch(
+        download,
+        changed,
+        name=lambda relative_path: prefix + relative_path,
+        concurrency=concurrency,
+    )
+    present = set(local) | {
+        relative_path
+        for relative_path, transfer in zip(changed, result.transferred)
+        if transfer.ok
+    }
+    if delete:
+      extra = sorted(set(local) - set(remote))
+      result.deleted = _run_batch(
+          lambda relative_path: os.remove(local[relative_path]),
+          extra,
+          name=str,
+          concurrency=concurrency,
+      )
+      present -= {
+          relative_path
+          for relative_path, deletion in zip(extra, result.deleted)
+          if deletion.ok
+      }
+    manifest.save(present)
+    return result
+
+  def sync_up(
+      self,
+      local_dir: str,
+      prefix: str,
+      delete: bool = False,
+      concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+      manifest_path: Optional[str] = None,
+  ) -> SyncResult:
+    """Uploads the files in a local directory which differ from their objects.
+
+    The objects under the prefix are listed once, and each file is compared with
+    the object named after its path relative to local_dir. Files whose size and
+    CRC32C checksum match their object are skipped, and the rest are uploaded
+    concurrently. CRC32C is compared rather than MD5, as objects which were
+    composed, such as by parallel uploads, have no MD5 hash.
+
+    The checksums of local files are cached in a manifest, as in `sync_down`.
+
+    Args:
+        local_dir: The directory to upload the files of.
+        prefix: The prefix to upload the files under. A slash is appended if it
+            does not end with one.
+        delete: Whether to delete objects under the prefix which have no file.
+        concurrency: The maximum number of uploads or deletions to perform at
+            once.
+        manifest_path: See `sync_down`.
+
+    Returns:
+        The outcome of each upload and deletion.
+    """
+    prefix = _directory_prefix(prefix)
+    manifest = _Manifest(manifest_path or
+                         os.path.join(local_dir, MANIFEST_FILENAME))
+    remote = {
+        obj.name[len(prefix):]: obj
+        for obj in self.iter_objects(prefix=prefix)
+    }
+    local = _local_files(local_dir, manifest.path)
+    result = SyncResult()
+    changed = []
+    for relative_path, path in sorted(local.items()):
+      obj = remote.get(relative_path)
+      # Checksums are only needed, and so computed, for files of the same size.
+      if (obj is not None and os.path.getsize(path) == obj.size and
+          manifest.crc32c(relative_path, path) == obj.crc32c):
+        result.unchanged.append(obj.name)
+      else:
+        changed.append(relative_path)
+
+    result.transferred = self.__run_batch(
+        lambda relative_path: self.upload_from_filename(
+            prefix + relative_path, local[relative_path]),
+        changed,
+        name=lambda relative_path: prefix + relative_path,
+        concurrency=concurrency,
+    )
+    if delete:
+      extra = sorted(
+          prefix + relative_path
+          for relative_path in set(remote) - set(local)
+          if not relative_path.endswith("/"))
+      result.deleted = self.delete_many(extra,
+                                        ignore_not_found=True,
+                                        concurrency=concurrency)
+    manifest.save(local)
+    return result
+
+  @_instrumented
+  @_google_error_handler
+  def upload_from_filename(
+      self,
+      dest_object_name: str,
+      src_filename: str,
+      chunk_size: Optional[int] = None,
+      parallelism: int = 1,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> None:
     """Upload an object from a file on the local disk.
 
     Args:
         dest_object_name: The name of the object to be uploaded.
         src_filename: The filename of a file on the local disk
+        chunk_size: See `upload_from_file`.
+        parallelism: See `upload_from_file`.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
+    """
+    if chunk_size is None and parallelism == 1 and self.__codec is None:
+      self.__object(dest_object_name).upload_from_filename(
+          src_filename,
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+          **self.__library_options,
+      )
+      self.__invalidate(dest_object_name)
+      return
+
+    content_type, _ = mimetypes.guess_type(src_filename)
+    with open(src_filename, "rb") as file:
+      self.upload_from_file(
+          dest_object_name,
+          file,
+          chunk_size=chunk_size,
+          parallelism=parallelism,
+          content_type=content_type,
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+      )
+
+  @_instrumented
+  @_google_error_handler
+  def upload_from_file(
+      self,
+      dest_object_name: str,
+      src_file: BinaryIO,
+      chunk_size: Optional[int] = None,
+      parallelism: int = 1,
+      content_type: Optional[str] = None,
+      session_url: Optional[str] = None,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> None:
+    """Upload an object from a readable binary stream.
+
+    Large objects may be uploaded in chunks of chunk_size bytes, which allows
+    the stream to be uploaded without holding it in memory, in one of two ways:
+    - If parallelism is 1, chunks are uploaded in order through a resumable
+      upload session. If a chunk fails to upload, the upload continues from the
+      last offset committed by the session rather than starting over.
+    - If parallelism is greater than 1, up to that many chunks are uploaded
+      concurrently as temporary objects, which are then composed into the
+      destination object and deleted.
+
+    Args:
+        dest_object_name: The name of the object to be uploaded.
+        src_file: A binary stream to read the object's contents from, such as a
+            file opened in "rb" mode.
+        chunk_size: The size of each chunk in bytes, which must be a multiple of
+            256 KiB. If neither chunk_size nor parallelism are set, the stream is
+            uploaded by the underlying library as it sees fit. Streams
+            compressed by a Client with `compression` are chunked after
+            compression.
+        parallelism: The maximum number of chunks to upload concurrently.
+        content_type: The content type of the object.
+        session_url: The URL of a session returned by `create_upload_session` to
+            resume. The session's committed bytes are skipped in src_file, which
+            should be positioned where it was when the session was first used.
+            The preconditions of the session are those it was created with.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
     """
-    self.__object(dest_object_name).upload_from_filename(src_filename)
+    if parallelism < 1:
+      raise ValueError("parallelism must be at least 1")
+    if self.__codec is not None:
+      if chunk_size is None and parallelism == 1 and session_url is None:
+        # The compressed size is unknown, so small streams are compressed in
+        # memory and uploaded at once, and larger ones are uploaded in chunks.
+        head = read_exact(src_file, DEFAULT_UPLOAD_CHUNK_SIZE)
+        if len(head) < DEFAULT_UPLOAD_CHUNK_SIZE:
+          self.__upload_string(
+              dest_object_name,
+              head,
+              content_type=content_type,
+              if_generation_match=if_generation_match,
+              if_generation_not_match=if_generation_not_match,
+              if_metageneration_match=if_metageneration_match,
+              if_metageneration_not_match=if_metageneration_not_match,
+          )
+          return
+        chunk_size = DEFAULT_UPLOAD_CHUNK_SIZE
+        src_file = cast(BinaryIO,
+                        _CompressingReader(src_file, self.__codec, head))
+      else:
+        src_file = cast(BinaryIO, _CompressingReader(src_file, self.__codec))
+    if parallelism > 1:
+      if session_url is not None:
+        raise ValueError("session_url cannot be used with parallel uploads")
+      self.__upload_composite(
+          dest_object_name,
+          src_file,
+          chunk_size or DEFAULT_UPLOAD_CHUNK_SIZE,
+          parallelism,
+          content_type,
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+      )
+    elif chunk_size is not None or session_url is not None:
+      if session_url is None:
+        session_url = self.create_upload_session(
+            dest_object_name,
+            content_type,
+            if_generation_match=if_generation_match,
+            if_generation_not_match=if_generation_not_match,
+            if_metageneration_match=if_metageneration_match,
+            if_metageneration_not_match=if_metageneration_not_match,
+        )
+      upload_resumable(self.__gcs_client._http, session_url, src_file,
+                       chunk_size or DEFAULT_UPLOAD_CHUNK_SIZE)
+    else:
+      self.__object(dest_object_name).upload_from_file(
+          src_file,
+          content_type=content_type,
+          if_generation_match=if_generation_match,
+          if_generation_not_match=if_generation_not_match,
+          if_metageneration_match=if_metageneration_match,
+          if_metageneration_not_match=if_metageneration_not_match,
+          **self.__library_options,
+      )
+    self.__invalidate(dest_object_name)
 
+  @_instrumented
   @_google_error_handler
-  def upload_from_bytes(self, dest_object_name: str, src_data: bytes) -> None:
-    """Upload an object from bytes.
+  def upload_from_bytes(
+      self,
+      dest_object_name: str,
+      src_data: _Buffer,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> None:
+    """Upload an object from bytes, or any other contiguous buffer.
+
+    Buffers other than bytes, such as a bytearray, a memoryview, a NumPy array
+    or an mmap of a file, are uploaded as bytes. Those larger than
+    DEFAULT_UPLOAD_CHUNK_SIZE are uploaded in chunks through a resumable upload
+    session, without copying their contents.
 
     Args:
         dest_object_name: The name of the object to be uploaded.
         src_data: The bytes to be uploaded.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
     """
-    self.__object(dest_object_name).upload_from_string(src_data)
+    if self.__codec is None and not isinstance(src_data, bytes):
+      view = memoryview(src_data).cast("B")
+      if len(view) > DEFAULT_UPLOAD_CHUNK_SIZE:
+        session_url = self.create_upload_session(
+            dest_object_name,
+            if_generation_match=if_generation_match,
+            if_generation_not_match=if_generation_not_match,
+            if_metageneration_match=if_metageneration_match,
+            if_metageneration_not_match=if_metageneration_not_match,
+        )
+        upload_buffer_resumable(self.__gcs_client._http, session_url, view,
+                                DEFAULT_UPLOAD_CHUNK_SIZE)
+        self.__invalidate(dest_object_name)
+        return
+      # Smaller buffers are copied, at most once, into a single request.
+      src_data = view.tobytes()
+    self.__upload_string(
+        dest_object_name,
+        src_data,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+    )
 
+  @_instrumented
   @_google_error_handler
   def upload_from_text(
     self,
     dest_object_name: str,
-    src_data: Union[bytes, str]
+    src_data: Union[bytes, str],
+    if_generation_match: Optional[int] = None,
+    if_generation_not_match: Optional[int] = None,
+    if_metageneration_match: Optional[int] = None,
+    if_metageneration_not_match: Optional[int] = None,
   ) -> None:
     """Upload an object from a string.
 
     Args:
         dest_object_name: The name of the object to be uploaded.
         src_data: The text to be uploaded.
+        if_generation_match: See preconditions in `Client`.
+        if_generation_not_match: See preconditions in `Client`.
+        if_metageneration_match: See preconditions in `Client`.
+        if_metageneration_not_match: See preconditions in `Client`.
     """
-    self.__object(dest_object_name).upload_from_string(src_data)
+    self.__upload_string(
+        dest_object_name,
+        src_data,
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+    )
+
+  def __run_batch(
+      self,
+      operation: Callable[[Any], Any],
+      items: Iterable[Any],
+      name: Callable[[Any], str],
+      concurrency: int,
+  ) -> List[BatchResult]:
+    # Resolve the bucket up front rather than racing to do so in each worker.
+    self.__bucket()
+    return _run_batch(operation, items, name=name, concurrency=concurrency)
+
+  def __download_cached(self, object_name: str,
+                        checksum: Optional[str]) -> bytes:
+    # Only called when the Client has a cache.
+    cache = cast(ObjectCache, self.__cache)
+    key = self.__cache_key(object_name)
+    cached = cache._lookup(key)
+    if cached is None:
+      data, generation = self.__fetch(object_name, checksum)
+    else:
+      generation, cached_data, fresh = cached
+      if fresh:
+        cache._record_hit(key)
+        return cached_data
+      try:
+        data, generation = self.__fetch(object_name,
+                                        checksum,
+                                        if_generation_not_match=generation)
+      except NotModified:
+        cache._record_hit(key)
+        return cached_data
+    cache._store(key, generation, data)
+    return data
+
+  def __resolve_checksum(self, checksum: Optional[str]) -> Optional[str]:
+    if checksum == "default":
+      return self.__checksum
+    check_checksum(checksum)
+    return checksum
+
+  def __fetch(self, object_name: str, checksum: Optional[str],
+              **kwargs: Any) -> Tuple[bytes, int]:
+    """Downloads the contents of an object and their generation.
+
+    Contents are decompressed with the codec named by their Content-Encoding,
+    whether or not this Client has a codec. Keyword arguments are
+    preconditions.
+    """
+    response = self.__open_media(object_name, **kwargs)
+    generation = int(response.headers["X-Goog-Generation"])
+    chunks = _iter_decoded(response,
+                           DEFAULT_STREAM_CHUNK_SIZE,
+                           checksum,
+                           resume=self.__resumer(object_name, response))
+    return b"".join(chunks), generation
+
+  def __download_decoded(self, object_name: str, dest_filename: str,
+                         checksum: Optional[str], **kwargs: Any) -> Dict[str, str]:
+    """Downloads and decompresses the contents of an object into a file.
+
+    Keyword arguments are those of `__open_media`. Returns the digests computed.
+    """
+    response = self.__open_media(object_name, **kwargs)
+    digests: Dict[str, str] = {}
+    try:
+      with open(dest_filename, "wb") as file:
+        for chunk in _iter_decoded(response,
+                                   DEFAULT_STREAM_CHUNK_SIZE,
+                                   checksum,
+                                   digests,
+                                   resume=self.__resumer(object_name, response)):
+          file.write(chunk)
+    except BaseException:
+      if os.path.exists(dest_filename):
+        os.remove(dest_filename)
+      raise
+    return digests
+
+  def __upload_string(
+      self,
+      dest_object_name: str,
+      data: Union[bytes, str],
+      **kwargs: Any,
+  ) -> None:
+    """Uploads an object from bytes or a string, compressed if this Client has a codec.
+
+    Keyword arguments are those of `Blob.upload_from_string`.
+    """
+    blob = self.__object(dest_object_name)
+    if self.__codec is not None:
+      if isinstance(data, str):
+        data = data.encode("utf-8")
+      data = _compress(self.__codec, data)
+      blob.content_encoding = self.__codec.name
+    blob.upload_from_string(data, **kwargs, **self.__library_options)
+    self.__invalidate(dest_object_name)
+
+  def __invalidate(self, object_name: str) -> None:
+    if self.__cache is not None:
+      self.__cache._invalidate(self.__cache_key(object_name))
+
+  def __cache_key(self, object_name: str) -> str:
+    self.__bucket()
+    return f"{self.__bucket_id}/{object_name}"
+
+  def __download_sliced(
+      self,
+      object_name: str,
+      dest_filename: str,
+      slices: int,
+      slice_size: Optional[int],
+      checksum: Optional[str],
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> Dict[str, str]:
+    blob = self.__object(object_name)
+    # The preconditions are checked once, against the object's metadata. Every
+    # slice then reads the same generation, so later writes cannot be mixed in.
+    blob.reload(
+        if_generation_match=if_generation_match,
+        if_generation_not_match=if_generation_not_match,
+        if_metageneration_match=if_metageneration_match,
+        if_metageneration_not_match=if_metageneration_not_match,
+        **self.__library_options,
+    )
+    size = blob.size or 0
+    if slice_size is None:
+      slice_size = max(-(-size // slices), MIN_SLICE_SIZE)
+    # Ranges of encoded objects are ranges of their stored, encoded bytes, which
+    # could not be decoded independently, so these are downloaded whole.
+    if size <= slice_size or blob.content_encoding:
+      return self.__download_decoded(object_name,
+                                     dest_filename,
+                                     checksum,
+                                     generation=blob.generation)
+
+    def download_slice(start: int) -> Tuple[int, int, int]:
+      end = min(start + slice_size, size) - 1
+      response = self.__open_media(object_name, start=start, end=end,
+                                   generation=blob.generation)
+      crc = 0
+      with response, open(dest_filename, "r+b") as file:
+        file.seek(start)
+        for chunk in response.iter_content(DEFAULT_STREAM_CHUNK_SIZE):
+          if checksum is not None:
+            crc = google_crc32c.extend(crc, chunk)
+          file.write(chunk)
+      return start, end - start + 1, crc
+
+    with open(dest_filename, "wb") as file:
+      file.truncate(size)
+    try:
+      with ThreadPoolExecutor(max_workers=slices) as executor:
+        results = list(
+            executor.map(_in_current_context(download_slice),
+                         range(0, size, slice_size)))
+
+      if checksum is None:
+        return {}
+      crc = 0
+      for _, length, slice_crc in results:
+        crc = crc32c_combine(crc, slice_crc, length)
+      if blob.crc32c is not None and crc != crc32c_from_base64(blob.crc32c):
+        raise ChecksumMismatchError(
+            "The downloaded contents did not match the object's crc32c checksum.")
+    except BaseException:
+      os.remove(dest_filename)
+      raise
+    return {CRC32C: base64.b64encode(crc.to_bytes(4, "big")).decode("ascii")}
+
+  def __open_media(
+      self,
+      object_name: str,
+      start: Optional[int] = None,
+      end: Optional[int] = None,
+      generation: Optional[int] = None,
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> requests.Response:
+    blob = self.__object(object_name)
+    params = _drop_none({
+        "alt": "media",
+        "generation": generation,
+        "ifGenerationMatch": if_generation_match,
+        "ifGenerationNotMatch": if_generation_not_match,
+        "ifMetagenerationMatch": if_metageneration_match,
+        "ifMetagenerationNotMatch": if_metageneration_not_match,
+    })
+    headers = {}
+    if start is not None or end is not None:
+      if start is not None and start < 0:
+        if end is not None:
+          raise ValueError("end must not be set when start is negative")
+        headers["Range"] = f"bytes={start}"
+      else:
+        headers["Range"] = f"bytes={start or 0}-{'' if end is None else end}"
+    url = f"{self.__gcs_client.api_endpoint}/download/storage/v1{blob.path}"
+
+    def open_media() -> requests.Response:
+      response = self.__gcs_client._http.get(url,
+                                             params=params,
+                                             headers=headers,
+                                             stream=True)
+      if response.status_code >= 300:
+        with response:
+          raise from_http_response(response)
+      return response
+
+    # Media is requested directly rather than through the GCS library, so its
+    # default retries are applied here unless a RetryPolicy replaces them.
+    retry = self.__library_options.get("retry", DEFAULT_RETRY)
+    if retry is not None:
+      open_media = retry(open_media)
+    return open_media()
+
+  def __resumer(self, object_name: str,
+                response: requests.Response) -> _Resume:
+    """Returns a function which requests the rest of a download.
+
+    It is called once the connection of a media download drops partway through
+    its contents, with the number of stored bytes already read. The rest is
+    requested from that offset with a Range header, and from the generation
+    which was first read, as google-resumable-media does, so that it cannot be
+    mixed with the contents of a newer generation. Attempts are spaced and
+    limited by this Client's RetryPolicy, or by a default one, and are counted
+    afresh once any bytes have been read since the last.
+    """
+    generation = response.headers.get("X-Goog-Generation")
+    policy = self.__session.retry or RetryPolicy()
+    attempt = 0
+    last_offset = -1
+
+    def resume(offset: int, err: Exception) -> requests.Response:
+      nonlocal attempt, last_offset
+      attempt = attempt + 1 if offset == last_offset else 1
+      last_offset = offset
+      delay = policy._retry_delay("GET", {}, None, attempt)
+      if delay is None:
+        raise requests.ConnectionError(
+            "The connection was lost partway through the download.") from err
+      time.sleep(delay)
+      rest = self.__open_media(
+          object_name,
+          start=offset,
+          generation=None if generation is None else int(generation),
+      )
+      if rest.status_code != 206:
+        rest.close()
+        raise requests.ConnectionError(
+            "The rest of the download could not be requested.") from err
+      return rest
+
+    return resume
+
+  def __upload_composite(
+      self,
+      dest_object_name: str,
+      stream: BinaryIO,
+      chunk_size: int,
+      parallelism: int,
+      content_type: Optional[str],
+      if_generation_match: Optional[int] = None,
+      if_generation_not_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+      if_metageneration_not_match: Optional[int] = None,
+  ) -> None:
+    if (if_generation_not_match is not None
+        or if_metageneration_not_match is not None):
+      raise ValueError("if_generation_not_match and if_metageneration_not_match "
+                       "are not supported when parallelism is greater than 1")
+    temp_prefix = f"{dest_object_name}.parts-{uuid4().hex}/"
+    temp_names: List[str] = []
+    in_flight = threading.BoundedSemaphore(parallelism)
+    failed = threading.Event()
+
+    def upload_part(part_name: str, data: bytes) -> None:
+      try:
+        self.__object(part_name).upload_from_string(data,
+                                                    **self.__library_options)
+      except BaseException:
+        failed.set()
+        raise
+      finally:
+        in_flight.release()
+
+    try:
+      with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        futures = []
+        while not failed.is_set():
+          # Wait for a free worker before reading, so that at most parallelism
+          # chunks are held in memory at once.
+          in_flight.acquire()
+          data = read_exact(stream, chunk_size)
+          if not data and futures:
+            in_flight.release()
+            break
+          temp_names.append(f"{temp_prefix}{len(temp_names):06d}")
+          futures.append(
+              executor.submit(_in_current_context(upload_part), temp_names[-1],
+                              data))
+          if len(data) < chunk_size:
+            break
+        for future in futures:
+          future.result()
+
+      self.__compose(
+          list(temp_names),
+          dest_object_name,
+          temp_prefix,
+          content_type,
+          temp_names,
+          content_encoding=None if self.__codec is None else self.__codec.name,
+          if_generation_match=if_generation_match,
+          if_metageneration_match=if_metageneration_match,
+      )
+    finally:
+      self.delete_many(temp_names, ignore_not_found=True,
+                       concurrency=parallelism)
+
+  def __compose(
+      self,
+      source_names: List[str],
+      dest_object_name: str,
+      temp_prefix: str,
+      content_type: Optional[str],
+      temp_names: List[str],
+      content_encoding: Optional[str] = None,
+      if_generation_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+  ) -> None:
+    """Composes objects into a destination.
+
+    Only MAX_COMPOSE_SOURCES objects may be composed by a single request, so
+    larger numbers are composed into intermediate objects under temp_prefix, in
+    a tree, until few enough remain. Preconditions apply to the final request.
+    Intermediate objects are appended to temp_names before they are requested,
+    so that they can be deleted even if composition fails part way.
+    """
+    level = 0
+    while len(source_names) > MAX_COMPOSE_SOURCES:
+      groups = [
+          source_names[i:i + MAX_COMPOSE_SOURCES]
+          for i in range(0, len(source_names), MAX_COMPOSE_SOURCES)
+      ]
+      source_names = [
+          f"{temp_prefix}compose-{level}-{i:06d}" for i in range(len(groups))
+      ]
+      temp_names.extend(source_names)
+      with ThreadPoolExecutor(max_workers=DEFAULT_BATCH_CONCURRENCY) as executor:
+        list(
+            executor.map(_in_current_context(self.__compose_one), groups,
+                         source_names))
+      level += 1
+
+    self.__compose_one(source_names,
+                       dest_object_name,
+                       content_type,
+                       content_encoding,
+                       if_generation_match=if_generation_match,
+                       if_metageneration_match=if_metageneration_match)
+
+  def __compose_one(
+      self,
+      source_names: List[str],
+      dest_object_name: str,
+      content_type: Optional[str] = None,
+      content_encoding: Optional[str] = None,
+      if_generation_match: Optional[int] = None,
+      if_metageneration_match: Optional[int] = None,
+  ) -> None:
+    destination = self.__object(dest_object_name)
+    destination.content_type = content_type
+    destination.content_encoding = content_encoding
+    destination.compose([self.__object(name) for name in source_names],
+                        if_generation_match=if_generation_match,
+                        if_metageneration_match=if_metageneration_match,
+                        **self.__library_options)
+
+  def __connect(self) -> None:
+    self.__pid = os.getpid()
+    self.__gcs_client, self.__adapter = self.__session.connect()
+
+  def __check_fork(self) -> None:
+    """Reconnects if the process has forked since this Client connected."""
+    if self.__pid == os.getpid():
+      return
+    with fork_lock():
+      if self.__pid != os.getpid():
+        # The lock may have been held by a thread which did not survive the fork.
+        self.__lock = threading.Lock()
+        self.__gcs_bucket_handle = None
+        self.__connect()
 
   def __bucket(self) -> storage.Bucket:
+    self.__check_fork()
     if self.__gcs_bucket_handle is None:
-      self.__gcs_bucket_handle = self.__get_bucket_handle()
+      with self.__lock:
+        if self.__gcs_bucket_handle is None:
+          self.__gcs_bucket_handle = self.__get_bucket_handle()
     return self.__gcs_bucket_handle
 
   def __object(self, object_name: str) -> storage.Blob:
@@ -230,20 +2130,232 @@ class Client:
 
   def __get_bucket_handle(self) -> storage.Bucket:
     if self.__bucket_id is None:
-      self.__bucket_id = self.__get_default_bucket_id()
+      self.__bucket_id = self.__session.resolve_bucket_id()
     return self.__gcs_client.bucket(self.__bucket_id)
 
-  @staticmethod
-  def __get_default_bucket_id() -> str:
-    response = requests.get(REPLIT_DEFAULT_BUCKET_URL)
-    try:
-      response.raise_for_status()
-    except requests.HTTPError as exc:
-      raise DefaultBucketError("failed to request default bucket") from exc
 
-    bucket_id = response.json().get("bucketId", "")
-    if bucket_id == "":
-      raise DefaultBucketError("no default bucket was specified, it may need "
-                               "to be configured in .replit")
+@dataclass(frozen=True)
+class ClientHandle:
+  """ClientHandle is a picklable reference to a bucket, for use in other processes.
+
+  A handle holds no connections or credentials, so it is cheap to pass to the
+  workers of a process pool, which each call `client` to get a Client of their
+  own. Handles are created by `Client.handle`.
+
+  Attributes:
+      bucket_id: The ID of the bucket.
+      transport: The transport options of the Client which created the handle.
+      backend: The backend of the Client which created the handle, if any. A
+          `MemoryBackend` is copied into each process the handle is passed to.
+  """
+  bucket_id: str
+  transport: Optional[TransportOptions] = None
+  backend: Optional[Backend] = None
+
+  def client(self) -> Client:
+    """Returns a Client for the bucket in the current process.
+
+    The Client is created on first use and reused by later calls in the same
+    process, including calls on other handles to the same bucket. It has no
+    cache, retry policy, rate limiter or instrumentation, as these are not
+    shared between processes.
+    """
+    transport = None if self.transport is None else astuple(self.transport)
+    key = (self.bucket_id, transport, self.backend)
+    client = _handle_clients.get(key)
+    if client is None:
+      client = _handle_clients.setdefault(
+          key,
+          Client(self.bucket_id, transport=self.transport,
+                 backend=self.backend))
+    return client
+
+
+# The Clients of handles, by bucket ID, transport options and backend.
+_handle_clients: Dict[Tuple[str, Optional[Tuple[Any, ...]], Optional[Backend]],
+                      Client] = {}
+
+
+class ClientPool:
+  """ClientPool hands out Clients for many buckets which share one HTTP session.
+
+  A Client with a retry policy, rate limiter or transport options opens an HTTP
+  session and connection pool of its own. The Clients of a pool share the pool's
+  session, credentials and connections whatever their bucket, so connections
+  opened for one bucket are reused for requests to the others.
+
+  Clients are created on the first request for their bucket, and the pool keeps
+  those of the `max_buckets` most recently requested buckets. An evicted Client
+  remains usable by those still holding it, but the next request for its bucket
+  creates another. A cache given to the pool is shared by all of its Clients, as
+  its entries are keyed by bucket as well as by object name.
+
+  A ClientPool is safe to share between threads.
+
+      pool = ClientPool(transport=TransportOptions(pool_size=32))
+      pool.client(f"tenant-{tenant_id}").download_as_bytes("settings.json")
+  """
+
+  __lock: threading.Lock
+  __clients: "OrderedDict[str, Client]"
+  __max_buckets: int
+  __session: Session
+  __options: Dict[str, Any]
+
+  def __init__(
+      self,
+      max_buckets: int = DEFAULT_MAX_BUCKETS,
+      cache: Optional[ObjectCache] = None,
+      retry: Optional[RetryPolicy] = None,
+      rate_limiter: Optional[RateLimiter] = None,
+      transport: Optional[TransportOptions] = None,
+      instrumentation: Optional[Instrumentation] = None,
+      compression: Optional[str] = None,
+      checksum: Optional[str] = DEFAULT_CHECKSUM,
+      backend: Optional[Backend] = None,
+  ):
+    """Creates a new ClientPool.
+
+    Args:
+        max_buckets: The maximum number of buckets whose Clients are kept.
+        cache: See `Client`. The cache is shared by every Client of the pool.
+        retry: See `Client`.
+        rate_limiter: See `Client`. The limit applies to the requests of every
+            Client of the pool combined.
+        transport: See `Client`. The connection pool is shared by every Client
+            of the pool.
+        instrumentation: See `Client`.
+        compression: See `Client`.
+        checksum: See `Client`.
+        backend: See `Client`.
+    """
+    if max_buckets < 1:
+      raise ValueError("max_buckets must be at least 1")
+    if compression is not None:
+      _get_codec(compression)
+    check_checksum(checksum)
+    self.__lock = threading.Lock()
+    self.__clients = OrderedDict()
+    self.__max_buckets = max_buckets
+    self.__session = Session(retry, rate_limiter, transport, backend)
+    self.__options = {
+        "cache": cache,
+        "instrumentation": instrumentation,
+        "compression": compression,
+        "checksum": checksum,
+    }
+
+  def __len__(self) -> int:
+    """Returns the number of buckets whose Clients are kept."""
+    with self.__lock:
+      return len(self.__clients)
 
-    return bucket_id
+  def client(self, bucket_id: str) -> Client:
+    """Returns the Client of a bucket, creating it if it is not kept.
+
+    Args:
+        bucket_id: The ID of the bucket.
+    """
+    with self.__lock:
+      client = self.__clients.get(bucket_id)
+      if client is not None:
+        self.__clients.move_to_end(bucket_id)
+        return client
+      client = Client(bucket_id, _session=self.__session, **self.__options)
+      self.__clients[bucket_id] = client
+      if len(self.__clients) > self.__max_buckets:
+        self.__clients.popitem(last=False)
+      return client
+
+  def pool_stats(self) -> PoolStats:
+    """Returns a snapshot of the use of the pool's connections."""
+    return self.__session.connect()[1].pool_stats()
+
+
+def _object_from_blob(blob: storage.Blob) -> Object:
+  return Object(
+      name=cast(str, blob.name),
+      size=blob.size,
+      generation=blob.generation,
+      etag=blob.etag,
+      content_type=blob.content_type,
+      updated=blob.updated,
+      crc32c=blob.crc32c,
+  )
+
+
+def _has_preconditions(*preconditions: Optional[int]) -> bool:
+  return any(precondition is not None for precondition in preconditions)
+
+
+def _drop_none(params: Dict[str, Any]) -> Dict[str, Any]:
+  return {key: value for key, value in params.items() if value is not None}
+
+
+def _too_large_for_buffer(object_name: str) -> str:
+  return f"the contents of {object_name!r} do not fit in the buffer"
+
+
+def _iter_response(response: requests.Response, chunk_size: int) -> Iterator[bytes]:
+  with response:
+    yield from response.iter_content(chunk_size)
+
+
+def _iter_decoded(
+    response: requests.Response,
+    chunk_size: int,
+    checksum: Optional[str],
+    digests: Optional[Dict[str, str]] = None,
+    resume: Optional[_Resume] = None,
+) -> Generator[bytes, None, None]:
+  """Iterates over the contents of a response, decompressing them if needed.
+
+  Contents are read as stored, and decompressed with the codec named by their
+  Content-Encoding, if there is one. The checksum of the stored contents is
+  computed as they are read, and verified once they all have been, unless the
+  object has no digest for it. Its digest is then added to digests, if given.
+  If the connection drops partway through, the rest of the contents are read
+  from the response returned by resume, if given.
+  """
+  encoding = response.headers.get("Content-Encoding")
+  expected_hashes = response.headers.get("X-Goog-Hash")
+
+  def read_stored() -> Iterator[bytes]:
+    chunks = _iter_stored(response, chunk_size, resume)
+    if checksum is None:
+      yield from chunks
+      return
+    hasher = Hasher(checksum)
+    for chunk in chunks:
+      hasher.update(chunk)
+      yield chunk
+    expected = hash_from_header(expected_hashes, checksum)
+    if expected is not None and hasher.digest() != expected:
+      raise ChecksumMismatchError(
+          "The downloaded contents did not match the object's "
+          f"{checksum} checksum.")
+    if digests is not None:
+      digests[checksum] = hasher.digest()
+
+  if encoding in _CODECS:
+    yield from _decompress(_get_codec(encoding), read_stored())
+  else:
+    yield from read_stored()
+
+
+def _iter_stored(response: requests.Response, chunk_size: int,
+                 resume: Optional[_Resume]) -> Iterator[bytes]:
+  """Iterates over the stored contents of a response, resuming if it drops."""
+  offset = 0
+  while True:
+    try:
+      with response:
+        for chunk in response.raw.stream(chunk_size, decode_content=False):
+          offset += len(chunk)
+          yield chunk
+      return
+    except _DROPPED_CONNECTION_ERRORS as err:
+      if resume is None:
+        raise requests.ConnectionError(
+            "The connection was lost partway through the download.") from err
+      response = resume(offset, err)
@@ -0,0 +1,156 @@
+"""Codecs which compress the contents of objects as they are transferred.
+
+Compressed objects are stored with their codec as their Content-Encoding, and
+their original Content-Type, so other tools can still tell what they contain.
+Objects compressed with gzip can be read by any client, as GCS decompresses them
+for clients which do not accept gzip.
+
+The zstd codec requires the optional `zstandard` dependency, which can be
+installed with `pip install replit.object_storage[zstd]`.
+"""
+
+import abc
+import io
+import zlib
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+_READ_SIZE = 256 * 1024
+
+
+class _Codec(abc.ABC):
+  """A codec, which creates streaming compressors and decompressors.
+
+  Compressors have `compress` and `flush` methods, and decompressors have a
+  `decompress` method, like those of zlib.
+  """
+
+  name: str
+
+  @abc.abstractmethod
+  def compressor(self) -> Any:
+    """Returns a new compressor."""
+
+  @abc.abstractmethod
+  def decompressor(self) -> Any:
+    """Returns a new decompressor."""
+
+
+class _GzipCodec(_Codec):
+
+  name = GZIP
+
+  def compressor(self) -> Any:
+    return zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+
+  def decompressor(self) -> Any:
+    return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+
+
+class _ZstdCodec(_Codec):
+
+  name = ZSTD
+
+  def __init__(self):
+    try:
+      import zstandard
+    except ImportError as err:
+      raise ImportError("The zstd codec requires zstandard, which can be "
+                        "installed with "
+                        "`pip install replit.object_storage[zstd]`") from err
+    self.__zstandard = zstandard
+
+  def compressor(self) -> Any:
+    return self.__zstandard.ZstdCompressor().compressobj()
+
+  def decompressor(self) -> Any:
+    return self.__zstandard.ZstdDecompressor().decompressobj()
+
+
+_CODECS = {GZIP: _GzipCodec, ZSTD: _ZstdCodec}
+
+
+def _get_codec(name: str) -> _Codec:
+  """Returns the codec with the given name.
+
+  Raises:
+      ValueError: If there is no such codec.
+  """
+  codec = _CODECS.get(name)
+  if codec is None:
+    raise ValueError(f"unsupported compression {name!r}, expected one of "
+                     f"{', '.join(sorted(_CODECS))}")
+  return codec()
+
+
+def _compress(codec: _Codec, data: bytes) -> bytes:
+  compressor = codec.compressor()
+  return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(codec: _Codec, chunks: Iterable[bytes]) -> Iterator[bytes]:
+  """Decompresses a stream of chunks, without holding the whole stream."""
+  decompressor = codec.decompressor()
+  for chunk in chunks:
+    data = decompressor.decompress(chunk)
+    if data:
+      yield data
+  # zstd decompressors hold nothing back, so have no flush to call.
+  flush = getattr(decompressor, "flush", None)
+  if flush is not None:
+    data = flush()
+    if data:
+      yield data
+
+
+class _CompressingReader(io.RawIOBase):
+  """A readable stream of the compressed contents of another stream.
+
+  The other stream is read as this one is, so only about as much as is read at
+  once is held in memory.
+  """
+
+  __stream: BinaryIO
+  __compressor: Any
+  __buffer: bytearray
+  __done: bool
+
+  def __init__(self, stream: BinaryIO, codec: _Codec, head: bytes = b""):
+    """Creates a new _CompressingReader.
+
+    Args:
+        stream: The stream to compress the contents of.
+        codec: The codec to compress them with.
+        head: Contents which were already read from the stream, and precede the
+            rest of it.
+    """
+    super().__init__()
+    self.__stream = stream
+    self.__compressor = codec.compressor()
+    self.__buffer = bytearray(self.__compressor.compress(head))
+    self.__done = False
+
+  def readable(self) -> bool:
+    return True
+
+  def read(self, size: Optional[int] = -1) -> bytes:
+    while not self.__done and (size is None or size < 0 or
+                               len(self.__buffer) < size):
+      data = self.__stream.read(_READ_SIZE)
+      if data:
+        self.__buffer += self.__compressor.compress(data)
+      else:
+        self.__buffer += self.__compressor.flush()
+        self.__done = True
+    if size is None or size < 0:
+      size = len(self.__buffer)
+    data = bytes(self.__buffer[:size])
+    del self.__buffer[:size]
+    return data
+
+  def readinto(self, buffer: Any) -> int:
+    data = self.read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
@@ -1,12 +1,7 @@
 """Errors that may be returned by the storage library."""
 from functools import wraps
-
-from google.cloud.exceptions import (
-  Forbidden,
-  NotFound,
-  TooManyRequests,
-  Unauthorized,
-)
+from types import GeneratorType
+from typing import Generator, Optional
 
 
 class BucketNotFoundError(Exception):
@@ -14,6 +9,11 @@ class BucketNotFoundError(Exception):
   pass
 
 
+class ChecksumMismatchError(Exception):
+  """ChecksumMismatchError may occur if downloaded data does not match its checksum."""
+  pass
+
+
 class DefaultBucketError(Exception):
   """DefaultBucketError may occur if the default bucket could not be resolved."""
   pass
@@ -24,11 +24,21 @@ class ForbiddenError(Exception):
   pass
 
 
+class NotModifiedError(Exception):
+  """NotModifiedError may occur if a read's preconditions show it is unchanged."""
+  pass
+
+
 class ObjectNotFoundError(Exception):
   """ObjectNotFoundError may occur if the requested object could not be found."""
   pass
 
 
+class PreconditionFailedError(Exception):
+  """PreconditionFailedError may occur if a request's preconditions did not hold."""
+  pass
+
+
 class TooManyRequestsError(Exception):
     """TooManyRequestsError may occur if the rate of requests exceeds the rate limit."""
     pass
@@ -43,23 +53,86 @@ def _google_error_handler(func):
   """Wraps functions that call GCP APIs and handles common errors.
 
   Common errors are re-raised in more digestable formats, less common errors are passed
-  through.
+  through. If the function returns a generator, errors raised while iterating over it
+  are handled too.
   """
   @wraps(func)
   def wrapper(*args, **kwargs):
     try:
-      return func(*args, **kwargs)
-    except Forbidden as err:
-      raise ForbiddenError("Access to the requested resource is not allowed.") from err
-    except NotFound as err:
-      if "The specified bucket does not exist." in err.message:
-        raise BucketNotFoundError("The requested bucket could not be found.") from err
-      raise ObjectNotFoundError(
-          "The requested object could not be found.") from err
-    except TooManyRequests as err:
-      raise TooManyRequestsError("Rate limit exceeded.") from err
-    except Unauthorized as err:
-      raise UnauthorizedError("The requested operation is not allowed.") from err
-    # Other exceptions we'll bubble up for now
+      result = func(*args, **kwargs)
+    except Exception as err:
+      mapped = _map_google_error(err)
+      if mapped is None:
+        raise
+      raise mapped from err
+    if isinstance(result, GeneratorType):
+      return _handle_generator_errors(result)
+    return result
+
+  return wrapper
+
+
+def _handle_generator_errors(generator: Generator) -> Generator:
+  try:
+    return (yield from generator)
+  except Exception as err:
+    mapped = _map_google_error(err)
+    if mapped is None:
+      raise
+    raise mapped from err
+
+
+def _async_google_error_handler(func):
+  """Wraps coroutines that call GCP APIs and handles common errors.
+
+  See `_google_error_handler`.
+  """
+  @wraps(func)
+  async def wrapper(*args, **kwargs):
+    try:
+      return await func(*args, **kwargs)
+    except Exception as err:
+      mapped = _map_google_error(err)
+      if mapped is None:
+        raise
+      raise mapped from err
 
   return wrapper
+
+
+def _map_google_error(err: Exception) -> Optional[Exception]:
+  """Returns the library error equivalent to a GCP error, if there is one."""
+  # The GCS library is imported on first use, so that the errors can be imported
+  # without it. By the time an error is raised, it has been imported already.
+  from google.cloud.exceptions import (
+    Forbidden,
+    GoogleCloudError,
+    NotFound,
+    NotModified,
+    PreconditionFailed,
+    TooManyRequests,
+    Unauthorized,
+  )
+  from google.resumable_media import DataCorruption
+
+  if isinstance(err, DataCorruption):
+    return ChecksumMismatchError(
+        "The downloaded contents did not match the object's checksum.")
+  if not isinstance(err, GoogleCloudError):
+    return None
+  if isinstance(err, Forbidden):
+    return ForbiddenError("Access to the requested resource is not allowed.")
+  if isinstance(err, NotFound):
+    if "The specified bucket does not exist." in err.message:
+      return BucketNotFoundError("The requested bucket could not be found.")
+    return ObjectNotFoundError("The requested object could not be found.")
+  if isinstance(err, NotModified):
+    return NotModifiedError("The requested object has not been modified.")
+  if isinstance(err, PreconditionFailed):
+    return PreconditionFailedError("The request's preconditions did not hold.")
+  if isinstance(err, TooManyRequests):
+    return TooManyRequestsError("Rate limit exceeded.")
+  if isinstance(err, Unauthorized):
+    return UnauthorizedError("The requested operation is not allowed.")
+  # Other exceptions we'll bubble up for now
+  return None
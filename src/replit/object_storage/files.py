@@ -0,0 +1,386 @@
+"""File objects for reading and writing the contents of objects as streams.
+
+They are returned by `Client.open`, so that code built around file objects,
+such as pandas, tarfile and zipfile, can read and write objects directly, with
+bounded memory and without a copy of each object on the local disk.
+"""
+
+import io
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from replit.object_storage.instrumentation import _in_current_context
+
+# Fetches the bytes of an object from start to end, inclusive.
+FetchRange = Callable[[int, int], bytes]
+# Sends a chunk of an upload at an offset, with the total size of the upload if
+# it is the last chunk.
+SendChunk = Callable[[bytes, int, Optional[int]], Any]
+
+# The maximum number of blocks an ObjectReader fetches at once.
+_MAX_PREFETCH_WORKERS = 8
+
+
+class ObjectReader(io.RawIOBase):
+  """ObjectReader is a seekable, read-only stream of an object's contents.
+
+  The contents are fetched in blocks of block_size bytes, with ranged requests.
+  While the stream is read sequentially, the blocks within read_ahead bytes of
+  the block being read are fetched in the background, so that reading them
+  need not wait on the network. Seeking elsewhere pauses prefetching until the
+  stream is again read sequentially, so that random access, such as reading
+  the members of a zip file, fetches little more than the blocks it reads.
+  Memory usage is bounded by block_size plus read_ahead.
+
+  Every block is read from the generation of the object which was opened, so
+  if the object is replaced while it is read, reading raises
+  `PreconditionFailedError` rather than mixing the contents of both.
+
+  Attributes:
+      name: The name of the object.
+      size: The size of the object's contents, in bytes.
+      generation: The generation of the object being read.
+  """
+
+  name: str
+  size: int
+  generation: int
+
+  __fetch: FetchRange
+  __block_size: int
+  __read_ahead: int
+  __position: int
+  __last_index: int
+  __blocks: Dict[int, "Future[bytes]"]
+  __executor: Optional[ThreadPoolExecutor] = None
+
+  def __init__(
+      self,
+      name: str,
+      size: int,
+      generation: int,
+      fetch: FetchRange,
+      block_size: int,
+      read_ahead: int,
+  ):
+    """Creates a new ObjectReader.
+
+    Args:
+        name: The name of the object.
+        size: The size of the object's contents, in bytes.
+        generation: The generation of the object being read.
+        fetch: Fetches a range of the object's contents.
+        block_size: The size of each ranged request, in bytes.
+        read_ahead: The number of bytes to prefetch beyond the block being read.
+            Zero disables prefetching.
+    """
+    super().__init__()
+    if block_size <= 0:
+      raise ValueError("block_size must be positive")
+    if read_ahead < 0:
+      raise ValueError("read_ahead must not be negative")
+    self.name = name
+    self.size = size
+    self.generation = generation
+    self.__fetch = fetch
+    self.__block_size = block_size
+    self.__read_ahead = -(-read_ahead // block_size)
+    self.__position = 0
+    self.__last_index = -1
+    self.__blocks = {}
+    if self.__read_ahead > 0:
+      self.__executor = ThreadPoolExecutor(
+          max_workers=min(self.__read_ahead, _MAX_PREFETCH_WORKERS))
+
+  def readable(self) -> bool:
+    """Returns True, as the stream may be read."""
+    return True
+
+  def seekable(self) -> bool:
+    """Returns True, as the stream may be seeked."""
+    return True
+
+  def tell(self) -> int:
+    """Returns the current position in the object's contents."""
+    self.__check_open()
+    return self.__position
+
+  def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+    """Moves to a position, which may be beyond the end of the contents."""
+    self.__check_open()
+    if whence == io.SEEK_SET:
+      position = offset
+    elif whence == io.SEEK_CUR:
+      position = self.__position + offset
+    elif whence == io.SEEK_END:
+      position = self.size + offset
+    else:
+      raise ValueError(f"invalid whence ({whence})")
+    if position < 0:
+      raise ValueError(f"negative seek position {position}")
+    self.__position = position
+    return position
+
+  def readinto(self, buffer: Any) -> int:
+    """Reads into a buffer, returning the number of bytes read."""
+    self.__check_open()
+    view = memoryview(buffer).cast("B")
+    count = 0
+    while count < len(view) and self.__position < self.size:
+      index, offset = divmod(self.__position, self.__block_size)
+      block = self.__block(index)
+      length = min(len(view) - count, len(block) - offset)
+      view[count:count + length] = block[offset:offset + length]
+      count += length
+      self.__position += length
+    return count
+
+  def readall(self) -> bytes:
+    """Reads the rest of the contents, a block at a time."""
+    self.__check_open()
+    parts = []
+    while self.__position < self.size:
+      index, offset = divmod(self.__position, self.__block_size)
+      block = self.__block(index)
+      parts.append(block[offset:] if offset else block)
+      self.__position += len(block) - offset
+    return b"".join(parts)
+
+  def close(self) -> None:
+    """Closes the stream, abandoning any blocks being prefetched."""
+    if self.closed:
+      return
+    for future in self.__blocks.values():
+      future.cancel()
+    self.__blocks.clear()
+    if self.__executor is not None:
+      # Blocks already being fetched are left to finish, and discarded.
+      self.__executor.shutdown(wait=False)
+    super().close()
+
+  def __block(self, index: int) -> bytes:
+    sequential = index in (self.__last_index, self.__last_index + 1)
+    self.__last_index = index
+    last = min(index + self.__read_ahead, (self.size - 1) // self.__block_size)
+    for stale in [i for i in self.__blocks if not index <= i <= last]:
+      self.__blocks.pop(stale).cancel()
+    if sequential and self.__executor is not None:
+      for ahead in range(index + 1, last + 1):
+        if ahead not in self.__blocks:
+          self.__blocks[ahead] = self.__executor.submit(
+              _in_current_context(self.__fetch_block), ahead)
+
+    future = self.__blocks.get(index)
+    if future is None:
+      data = self.__fetch_block(index)
+      future = Future()
+      future.set_result(data)
+      self.__blocks[index] = future
+      return data
+    try:
+      return future.result()
+    except BaseException:
+      # The block is fetched again if it is read again.
+      self.__blocks.pop(index, None)
+      raise
+
+  def __fetch_block(self, index: int) -> bytes:
+    start = index * self.__block_size
+    end = min(start + self.__block_size, self.size) - 1
+    return self.__fetch(start, end)
+
+  def __check_open(self) -> None:
+    if self.closed:
+      raise ValueError("I/O operation on closed file.")
+
+
+class ObjectWriter(io.RawIOBase):
+  """ObjectWriter is a write-only stream which uploads an object's contents.
+
+  Written bytes are buffered until a chunk of chunk_size bytes is full, which is
+  then uploaded through a resumable upload session in the background while
+  writing continues. A session commits chunks in order, so one chunk is
+  uploaded at a time, and at most two are held in memory.
+
+  The object is created once the stream is closed, from all of the bytes
+  written to it. If the stream is used as a context manager and the block
+  raises, or the stream is garbage collected without being closed, the upload
+  is abandoned instead, and the object is left as it was.
+  Errors uploading a chunk are raised by the next call to `write`, and again by
+  `close`, which then abandons the upload.
+
+  Attributes:
+      name: The name of the object.
+  """
+
+  name: str
+
+  __send: SendChunk
+  __chunk_size: int
+  __compressor: Any
+  __on_close: Optional[Callable[[], None]]
+  __buffer: bytearray
+  __written: int
+  __offset: int
+  __executor: ThreadPoolExecutor
+  __pending: Optional["Future[Any]"] = None
+  __error: Optional[BaseException] = None
+
+  def __init__(
+      self,
+      name: str,
+      send: SendChunk,
+      chunk_size: int,
+      compressor: Any = None,
+      on_close: Optional[Callable[[], None]] = None,
+  ):
+    """Creates a new ObjectWriter.
+
+    Args:
+        name: The name of the object.
+        send: Sends a chunk through the upload session.
+        chunk_size: The size of each chunk but the last, in bytes.
+        compressor: A compressor to compress written bytes with, if any.
+        on_close: Called once the object has been created.
+    """
+    super().__init__()
+    self.name = name
+    self.__send = send
+    self.__chunk_size = chunk_size
+    self.__compressor = compressor
+    self.__on_close = on_close
+    self.__buffer = bytearray()
+    self.__written = 0
+    self.__offset = 0
+    self.__executor = ThreadPoolExecutor(max_workers=1)
+
+  def writable(self) -> bool:
+    """Returns True, as the stream may be written."""
+    return True
+
+  def tell(self) -> int:
+    """Returns the number of bytes written, before any compression."""
+    self.__check_open()
+    return self.__written
+
+  def write(self, data: Any) -> int:
+    """Writes the contents of a buffer, returning its size in bytes."""
+    self.__check_open()
+    if self.__error is not None:
+      raise self.__error
+    view = memoryview(data).cast("B")
+    if self.__compressor is not None:
+      self.__buffer += self.__compressor.compress(view)
+    else:
+      self.__buffer += view
+    self.__written += len(view)
+    while len(self.__buffer) >= self.__chunk_size:
+      self.__send_chunk(bytes(self.__buffer[:self.__chunk_size]), None)
+      del self.__buffer[:self.__chunk_size]
+    return len(view)
+
+  def close(self) -> None:
+    """Uploads the rest of the contents and creates the object."""
+    if self.closed:
+      return
+    try:
+      if self.__error is not None:
+        raise self.__error
+      if self.__compressor is not None:
+        self.__buffer += self.__compressor.flush()
+      # The last chunk is sent with the total size, even if it is empty.
+      while len(self.__buffer) > self.__chunk_size:
+        self.__send_chunk(bytes(self.__buffer[:self.__chunk_size]), None)
+        del self.__buffer[:self.__chunk_size]
+      self.__send_chunk(bytes(self.__buffer), self.__offset + len(self.__buffer))
+      self.__wait()
+      if self.__on_close is not None:
+        self.__on_close()
+    finally:
+      self.__release()
+
+  def abort(self) -> None:
+    """Closes the stream without creating the object."""
+    if not self.closed:
+      self.__release()
+
+  def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+    """Closes the stream, or abandons the upload if the block raised."""
+    if exc_type is None:
+      self.close()
+    else:
+      self.abort()
+
+  def __del__(self) -> None:
+    """Abandons the upload, if the stream was not closed."""
+    # Unlike a file's, the contents of a stream which was never closed may be
+    # incomplete, so they are not uploaded.
+    self.abort()
+
+  def __send_chunk(self, chunk: bytes, total: Optional[int]) -> None:
+    self.__wait()
+    self.__pending = self.__executor.submit(_in_current_context(self.__send),
+                                            chunk, self.__offset, total)
+    self.__offset += len(chunk)
+
+  def __wait(self) -> None:
+    pending, self.__pending = self.__pending, None
+    if pending is None:
+      return
+    try:
+      pending.result()
+    except BaseException as err:
+      self.__error = err
+      raise
+
+  def __release(self) -> None:
+    self.__buffer = bytearray()
+    # A chunk still being sent is left to finish. Without its last chunk, the
+    # session never creates the object, and expires.
+    self.__executor.shutdown(wait=False)
+    super().close()
+
+  def __check_open(self) -> None:
+    if self.closed:
+      raise ValueError("I/O operation on closed file.")
+
+
+class _ChunkReader(io.RawIOBase):
+  """A read-only stream of the chunks of an iterator, which cannot seek."""
+
+  name: str
+
+  __chunks: Iterator[bytes]
+  __chunk: bytes
+  __offset: int
+
+  def __init__(self, name: str, chunks: Iterator[bytes]):
+    super().__init__()
+    self.name = name
+    self.__chunks = chunks
+    self.__chunk = b""
+    self.__offset = 0
+
+  def readable(self) -> bool:
+    return True
+
+  def readinto(self, buffer: Any) -> int:
+    if self.closed:
+      raise ValueError("I/O operation on closed file.")
+    view = memoryview(buffer).cast("B")
+    while self.__offset == len(self.__chunk):
+      chunk = next(self.__chunks, None)
+      if chunk is None:
+        return 0
+      self.__chunk, self.__offset = chunk, 0
+    length = min(len(view), len(self.__chunk) - self.__offset)
+    view[:length] = self.__chunk[self.__offset:self.__offset + length]
+    self.__offset += length
+    return length
+
+  def close(self) -> None:
+    if not self.closed:
+      close = getattr(self.__chunks, "close", None)
+      if close is not None:
+        close()
+    super().close()
@@ -0,0 +1,405 @@
+"""Instrumentation of the operations performed by clients.
+
+A `Client` given an `Instrumentation` delivers an `OperationEvent` to its
+listeners after each call of one of its methods, describing how long the call
+took, how many requests it sent and bytes it transferred, and which error it
+raised, if any. Listeners may be any callable; `PrometheusListener` and
+`TracingListener` record events as Prometheus metrics and OpenTelemetry spans.
+
+Clients without an Instrumentation skip all of this, at the cost of a single
+attribute check per call.
+"""
+
+import contextvars
+import inspect
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+from types import GeneratorType
+from typing import (
+  TYPE_CHECKING,
+  Any,
+  Callable,
+  Generator,
+  List,
+  Optional,
+  Tuple,
+  TypeVar,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+  import prometheus_client
+  import requests
+  from opentelemetry import trace
+
+T = TypeVar("T")
+
+DEFAULT_NAMESPACE = "replit_object_storage"
+DEFAULT_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                            5.0, 10.0, 30.0, 60.0)
+
+_logger = logging.getLogger(__name__)
+
+# The names of the parameters holding the object a Client method operates on.
+_OBJECT_NAME_PARAMETERS = ("object_name", "dest_object_name")
+
+
+@dataclass
+class OperationEvent:
+  """OperationEvent describes a single call of a `Client` method.
+
+  Attributes:
+      operation: The name of the method, such as "download_as_bytes".
+      object_name: The name of the object operated on, or None for operations
+          on the bucket, such as `list`.
+      started_at: The time at which the call started, in seconds since the
+          epoch.
+      duration: The number of seconds the call took. Calls which return an
+          iterator, such as `download_stream`, last until it is exhausted or
+          closed.
+      time_to_first_byte: The number of seconds from the start of the call until
+          the first response arrived, or None if no request was sent.
+      attempts: The number of HTTP requests sent, including retries.
+      bytes_sent: The number of bytes in the bodies of the requests.
+      bytes_received: The number of bytes in the bodies of the responses, as
+          transferred, before any decompression.
+      error: The name of the type of the error raised, such as
+          "ObjectNotFoundError", or None if the call succeeded.
+  """
+  operation: str
+  object_name: Optional[str]
+  started_at: float
+  duration: float
+  time_to_first_byte: Optional[float] = None
+  attempts: int = 0
+  bytes_sent: int = 0
+  bytes_received: int = 0
+  error: Optional[str] = None
+
+
+Listener = Callable[[OperationEvent], Any]
+
+
+class Instrumentation:
+  """Instrumentation delivers the OperationEvents of Clients to listeners.
+
+  Listeners are called in the thread which made the call, once it has completed,
+  so they should be quick. Errors raised by a listener are logged rather than
+  raised to the caller. An Instrumentation may be shared between Clients and
+  threads, and listeners may be added and removed at any time.
+
+  When a method calls others, such as `upload_from_filename` calling
+  `upload_from_file`, a single event is delivered for the outermost call, which
+  includes the requests of the others. Each operation of a batch method, such as
+  `delete_many`, is delivered as an event of its own.
+  """
+
+  __lock: threading.Lock
+  __listeners: Tuple[Listener, ...]
+
+  def __init__(self, *listeners: Listener):
+    """Creates a new Instrumentation.
+
+    Args:
+        listeners: Callables to be called with each OperationEvent.
+    """
+    self.__lock = threading.Lock()
+    self.__listeners = listeners
+
+  def add_listener(self, listener: Listener) -> None:
+    """Adds a callable to be called with each OperationEvent."""
+    with self.__lock:
+      self.__listeners = (*self.__listeners, listener)
+
+  def remove_listener(self, listener: Listener) -> None:
+    """Removes a listener which was added previously."""
+    with self.__lock:
+      listeners = list(self.__listeners)
+      listeners.remove(listener)
+      self.__listeners = tuple(listeners)
+
+  def _emit(self, event: OperationEvent) -> None:
+    # Listeners are replaced rather than mutated, so they can be read unlocked.
+    for listener in self.__listeners:
+      try:
+        listener(event)
+      except Exception:
+        _logger.exception("Instrumentation listener %r failed", listener)
+
+
+class PrometheusListener:
+  """PrometheusListener records OperationEvents as Prometheus metrics.
+
+  It requires the optional `prometheus_client` dependency, which can be
+  installed with `pip install replit.object_storage[prometheus]`. The following
+  metrics are recorded, prefixed with the namespace:
+  - `operation_duration_seconds`: A histogram of the duration of calls, by
+      operation and error. The error label is empty for calls which succeeded.
+  - `operation_time_to_first_byte_seconds`: A histogram of the time to first
+      byte of calls which sent requests, by operation.
+  - `operation_attempts_total`: A counter of HTTP requests sent, by operation.
+  - `operation_bytes_total`: A counter of bytes transferred, by operation and
+      direction, which is either "sent" or "received".
+  """
+
+  def __init__(
+      self,
+      registry: Optional["prometheus_client.CollectorRegistry"] = None,
+      namespace: str = DEFAULT_NAMESPACE,
+      buckets: Tuple[float, ...] = DEFAULT_DURATION_BUCKETS,
+  ):
+    """Creates a new PrometheusListener, registering its metrics.
+
+    Args:
+        registry: The registry to register the metrics with. If not set, the
+            default registry of `prometheus_client` is used.
+        namespace: The prefix of the names of the metrics.
+        buckets: The upper bounds of the buckets of the histograms, in seconds.
+    """
+    # The optional dependencies are imported on use, as this module is imported
+    # by every Client.
+    try:
+      import prometheus_client
+    except ImportError as err:
+      raise ImportError("PrometheusListener requires prometheus_client, which "
+                        "can be installed with "
+                        "`pip install replit.object_storage[prometheus]`") from err
+    if registry is None:
+      registry = prometheus_client.REGISTRY
+    self.__duration = prometheus_client.Histogram(
+        "operation_duration_seconds",
+        "The duration of Object Storage operations.",
+        ["operation", "error"],
+        namespace=namespace,
+        registry=registry,
+        buckets=buckets)
+    self.__time_to_first_byte = prometheus_client.Histogram(
+        "operation_time_to_first_byte_seconds",
+        "The time until the first response of Object Storage operations.",
+        ["operation"],
+        namespace=namespace,
+        registry=registry,
+        buckets=buckets)
+    self.__attempts = prometheus_client.Counter(
+        "operation_attempts",
+        "The HTTP requests sent by Object Storage operations.",
+        ["operation"],
+        namespace=namespace,
+        registry=registry)
+    self.__bytes = prometheus_client.Counter(
+        "operation_bytes",
+        "The bytes transferred by Object Storage operations.",
+        ["operation", "direction"],
+        namespace=namespace,
+        registry=registry)
+
+  def __call__(self, event: OperationEvent) -> None:
+    """Records an OperationEvent."""
+    self.__duration.labels(event.operation, event.error or "").observe(
+        event.duration)
+    if event.time_to_first_byte is not None:
+      self.__time_to_first_byte.labels(event.operation).observe(
+          event.time_to_first_byte)
+    self.__attempts.labels(event.operation).inc(event.attempts)
+    self.__bytes.labels(event.operation, "sent").inc(event.bytes_sent)
+    self.__bytes.labels(event.operation, "received").inc(event.bytes_received)
+
+
+class TracingListener:
+  """TracingListener records OperationEvents as OpenTelemetry spans.
+
+  It requires the optional `opentelemetry-api` dependency, which can be
+  installed with `pip install replit.object_storage[tracing]`. Each event is
+  recorded as a span named after its operation, such as
+  "object_storage.download_as_bytes", with its start and end times, and its
+  measurements as attributes. Spans are children of the span which was current
+  when the call was made. Spans of calls which raised have an error status.
+  """
+
+  def __init__(self, tracer: Optional["trace.Tracer"] = None):
+    """Creates a new TracingListener.
+
+    Args:
+        tracer: The tracer to create spans with. If not set, a tracer is taken
+            from the global tracer provider.
+    """
+    try:
+      from opentelemetry import trace
+    except ImportError as err:
+      raise ImportError("TracingListener requires opentelemetry-api, which can "
+                        "be installed with "
+                        "`pip install replit.object_storage[tracing]`") from err
+    self.__trace = trace
+    self.__tracer = tracer or trace.get_tracer(__name__)
+
+  def __call__(self, event: OperationEvent) -> None:
+    """Records an OperationEvent."""
+    started_at = int(event.started_at * 1e9)
+    attributes = {
+        "object_storage.operation": event.operation,
+        "object_storage.attempts": event.attempts,
+        "object_storage.bytes_sent": event.bytes_sent,
+        "object_storage.bytes_received": event.bytes_received,
+    }
+    if event.object_name is not None:
+      attributes["object_storage.object_name"] = event.object_name
+    if event.time_to_first_byte is not None:
+      attributes["object_storage.time_to_first_byte"] = event.time_to_first_byte
+    trace = self.__trace
+    span = self.__tracer.start_span(f"object_storage.{event.operation}",
+                                    kind=trace.SpanKind.CLIENT,
+                                    start_time=started_at,
+                                    attributes=attributes)
+    if event.error is not None:
+      span.set_status(trace.Status(trace.StatusCode.ERROR, event.error))
+    span.end(end_time=started_at + int(event.duration * 1e9))
+
+
+class _Recording:
+  """The measurements of a call in progress, shared by the threads it uses."""
+
+  __lock: threading.Lock
+  __started: float
+  __first_response: Optional[float]
+  __attempts: int
+  __bytes_sent: int
+  __responses: List["requests.Response"]
+
+  def __init__(self, operation: str, object_name: Optional[str]):
+    self.operation = operation
+    self.object_name = object_name
+    self.started_at = time.time()
+    self.__lock = threading.Lock()
+    self.__started = time.perf_counter()
+    self.__first_response = None
+    self.__attempts = 0
+    self.__bytes_sent = 0
+    self.__responses = []
+
+  def sent(self, request: "requests.PreparedRequest") -> None:
+    # Bodies without a Content-Length, such as generators, are not counted.
+    length = int(request.headers.get("Content-Length") or 0)
+    with self.__lock:
+      self.__attempts += 1
+      self.__bytes_sent += length
+
+  def received(self, response: "requests.Response") -> None:
+    now = time.perf_counter()
+    with self.__lock:
+      if self.__first_response is None:
+        self.__first_response = now
+      self.__responses.append(response)
+
+  def event(self, error: Optional[BaseException]) -> OperationEvent:
+    duration = time.perf_counter() - self.__started
+    with self.__lock:
+      # Bodies are read after the responses are received, so they are counted
+      # once the call has completed.
+      bytes_received = sum(response.raw.tell() for response in self.__responses)
+      time_to_first_byte = (None if self.__first_response is None else
+                            self.__first_response - self.__started)
+      return OperationEvent(
+          operation=self.operation,
+          object_name=self.object_name,
+          started_at=self.started_at,
+          duration=duration,
+          time_to_first_byte=time_to_first_byte,
+          attempts=self.__attempts,
+          bytes_sent=self.__bytes_sent,
+          bytes_received=bytes_received,
+          error=None if error is None else type(error).__name__,
+      )
+
+
+# The recording of the call being made by the current thread or task, if any.
+_current_recording: contextvars.ContextVar[Optional[_Recording]] = (
+    contextvars.ContextVar("replit_object_storage_recording", default=None))
+
+
+def _instrumented(func: Callable[..., T]) -> Callable[..., T]:
+  """Wraps a Client method to deliver an OperationEvent for each call.
+
+  Events are only recorded for Clients with an Instrumentation, and only for the
+  outermost call, as calls made while recording are part of the recorded call.
+  """
+  operation = func.__name__
+  object_name_index, object_name_parameter = _object_name_parameter(func)
+
+  @wraps(func)
+  def wrapper(client: Any, *args: Any, **kwargs: Any) -> T:
+    instrumentation = client._instrumentation
+    if instrumentation is None or _current_recording.get() is not None:
+      return func(client, *args, **kwargs)
+
+    object_name = None
+    if object_name_parameter is not None:
+      object_name = (args[object_name_index] if len(args) > object_name_index
+                     else kwargs.get(object_name_parameter))
+    recording = _Recording(operation, object_name)
+    token = _current_recording.set(recording)
+    try:
+      result = func(client, *args, **kwargs)
+    except BaseException as err:
+      instrumentation._emit(recording.event(err))
+      raise
+    finally:
+      _current_recording.reset(token)
+    if isinstance(result, GeneratorType):
+      return _record_generator(instrumentation, recording, result)
+    instrumentation._emit(recording.event(None))
+    return result
+
+  return wrapper
+
+
+def _record_generator(
+    instrumentation: Instrumentation,
+    recording: _Recording,
+    generator: Generator,
+) -> Generator:
+  """Iterates over a generator while recording, delivering its event at the end."""
+  context = contextvars.copy_context()
+  context.run(_current_recording.set, recording)
+  error = None
+  try:
+    while True:
+      try:
+        item = context.run(next, generator)
+      except StopIteration as stop:
+        return stop.value
+      yield item
+  except GeneratorExit:
+    context.run(generator.close)
+    raise
+  except BaseException as err:
+    error = err
+    raise
+  finally:
+    instrumentation._emit(recording.event(error))
+
+
+def _in_current_context(func: Callable[..., T]) -> Callable[..., T]:
+  """Returns func, wrapped to run in a copy of the calling thread's context.
+
+  Worker threads do not inherit the context of the thread which submits work to
+  them, so without this, their requests would not be recorded.
+  """
+  context = contextvars.copy_context()
+
+  def run(*args: Any, **kwargs: Any) -> T:
+    # A context may only be entered by one thread at a time, so each call gets
+    # a copy of its own.
+    return context.copy().run(func, *args, **kwargs)
+
+  return run
+
+
+def _object_name_parameter(func: Callable) -> Tuple[int, Optional[str]]:
+  """Returns the position and name of a method's object name parameter."""
+  parameters = list(inspect.signature(func).parameters)[1:]
+  for index, parameter in enumerate(parameters):
+    if parameter in _OBJECT_NAME_PARAMETERS:
+      return index, parameter
+  return 0, None
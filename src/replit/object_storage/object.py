@@ -1,13 +1,98 @@
 """Pythonic representation of an object in Object Storage."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional
 
 
-@dataclass
 class Object:
   """Object contains metadata about an object.
-  
+
+  Objects are compact records, as listings may produce a great many of them.
+  Metadata which was not returned by the request producing an Object is None.
+
   Attributes:
       name: The name of the object.
+      size: The size of the object's contents, in bytes.
+      generation: The generation of the object's contents, which changes each
+          time the object is written.
+      etag: The HTTP entity tag of the object.
+      content_type: The content type of the object's contents.
+      updated: The time at which the object was last updated.
+      crc32c: The base64-encoded, big-endian CRC32C checksum of the object's
+          contents.
   """
+  __slots__ = ("name", "size", "generation", "etag", "content_type", "updated",
+               "crc32c")
+
   name: str
+  size: Optional[int]
+  generation: Optional[int]
+  etag: Optional[str]
+  content_type: Optional[str]
+  updated: Optional[datetime]
+  crc32c: Optional[str]
+
+  def __init__(
+      self,
+      name: str,
+      size: Optional[int] = None,
+      generation: Optional[int] = None,
+      etag: Optional[str] = None,
+      content_type: Optional[str] = None,
+      updated: Optional[datetime] = None,
+      crc32c: Optional[str] = None,
+  ):
+    """Creates a new Object."""
+    self.name = name
+    self.size = size
+    self.generation = generation
+    self.etag = etag
+    self.content_type = content_type
+    self.updated = updated
+    self.crc32c = crc32c
+
+  def __repr__(self) -> str:
+    """Returns a representation of the Object's metadata."""
+    fields = ", ".join(f"{field}={getattr(self, field)!r}"
+                       for field in self.__slots__)
+    return f"Object({fields})"
+
+  def __eq__(self, other: Any) -> bool:
+    """Returns whether another Object has the same metadata."""
+    if other.__class__ is not self.__class__:
+      return NotImplemented
+    return all(getattr(self, field) == getattr(other, field)
+               for field in self.__slots__)
+
+  __hash__ = None  # type: ignore[assignment]
+
+
+@dataclass
+class ObjectPage:
+  """ObjectPage contains a single page of the results of listing objects.
+
+  Attributes:
+      objects: The objects within the page.
+      next_page_token: A token which resumes listing from the following page, or
+          None if this is the last page.
+      prefixes: The prefixes within the page which name objects beyond the
+          delimiter, if one was given. A prefix may appear in several pages.
+  """
+  objects: List[Object]
+  next_page_token: Optional[str] = None
+  prefixes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ObjectListing:
+  """ObjectListing contains the results of listing objects with a delimiter.
+
+  Attributes:
+      objects: The objects whose names contain no delimiter after the prefix.
+      prefixes: The distinct prefixes, ending with the delimiter, of the names of
+          the other objects, sorted. These are the "subdirectories" of the
+          prefix.
+  """
+  objects: List[Object]
+  prefixes: List[str]
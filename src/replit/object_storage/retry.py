@@ -0,0 +1,292 @@
+"""Retrying of failed requests, and limiting of the rate of requests."""
+
+import random
+import threading
+import time
+from typing import Any, Container, Dict, Mapping, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_INITIAL_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 32.0
+DEFAULT_RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+_IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RetryPolicy:
+  """RetryPolicy decides whether and when failed requests are retried.
+
+  Requests which fail with a connection error or a transient status code are
+  retried after an exponentially increasing delay, with full jitter so that
+  clients which failed together do not retry together. If the response asks
+  for a longer delay with a Retry-After header, the longer delay is used.
+
+  Only idempotent requests are retried. Reads always are, while writes and
+  deletes are only if a precondition or generation makes repeating them safe,
+  such as `if_generation_match` on an upload.
+
+  Each retry spends a token from a budget, and each request which does not need
+  to be retried earns back a fraction of a token. Once the budget is exhausted,
+  failures are raised rather than retried, so that retries cannot multiply the
+  load on a service which is already failing most requests. A RetryPolicy is
+  safe to share between threads and between clients, which then share a budget.
+
+  The behaviour of a RetryPolicy may be customized further by overriding
+  `is_idempotent`, `is_retryable` or `backoff` in a subclass.
+  """
+
+  __max_attempts: int
+  __initial_backoff: float
+  __max_backoff: float
+  __multiplier: float
+  __retryable_status_codes: Container[int]
+
+  __lock: threading.Lock
+  __budget: float
+  __max_budget: float
+  __budget_refill: float
+
+  def __init__(
+      self,
+      max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+      initial_backoff: float = DEFAULT_INITIAL_BACKOFF,
+      max_backoff: float = DEFAULT_MAX_BACKOFF,
+      multiplier: float = 2.0,
+      budget: float = 10.0,
+      budget_refill: float = 0.1,
+      retryable_status_codes: Container[int] = DEFAULT_RETRYABLE_STATUS_CODES,
+  ):
+    """Creates a new RetryPolicy.
+
+    Args:
+        max_attempts: The maximum number of times a request is attempted,
+            including the first attempt.
+        initial_backoff: The upper bound of the delay before the first retry, in
+            seconds.
+        max_backoff: The upper bound of the delay before any retry, in seconds.
+        multiplier: The factor by which the upper bound of the delay grows with
+            each retry.
+        budget: The maximum number of retry tokens which may be saved up.
+        budget_refill: The number of tokens earned by each request which does
+            not need to be retried. The default of 0.1 allows roughly one retry
+            for every ten successful requests.
+        retryable_status_codes: The HTTP status codes which indicate a transient
+            failure.
+    """
+    if max_attempts < 1:
+      raise ValueError("max_attempts must be at least 1")
+    self.__max_attempts = max_attempts
+    self.__initial_backoff = initial_backoff
+    self.__max_backoff = max_backoff
+    self.__multiplier = multiplier
+    self.__retryable_status_codes = retryable_status_codes
+    self.__lock = threading.Lock()
+    self.__budget = budget
+    self.__max_budget = budget
+    self.__budget_refill = budget_refill
+
+  def is_idempotent(self, method: str, query: Mapping[str, Any]) -> bool:
+    """Returns whether a request may safely be sent more than once.
+
+    Args:
+        method: The HTTP method of the request.
+        query: The query parameters of the request.
+    """
+    method = method.upper()
+    if method in _IDEMPOTENT_METHODS:
+      return True
+    if method == "PATCH" and "ifMetagenerationMatch" in query:
+      return True
+    # Repeating a delete of the live object could delete a generation written
+    # in between, so only deletes of a specific generation are retried.
+    if method == "DELETE" and "generation" in query:
+      return True
+    return "ifGenerationMatch" in query
+
+  def is_retryable(self, status_code: Optional[int]) -> bool:
+    """Returns whether a failure is transient.
+
+    Args:
+        status_code: The HTTP status code of the response, or None if the
+            request failed with a connection error.
+    """
+    return status_code is None or status_code in self.__retryable_status_codes
+
+  def backoff(self, attempt: int) -> float:
+    """Returns the delay in seconds before retrying a failed attempt.
+
+    Args:
+        attempt: The number of the attempt which failed, starting at 1.
+    """
+    ceiling = min(self.__max_backoff,
+                  self.__initial_backoff * self.__multiplier**(attempt - 1))
+    return random.uniform(0, ceiling)
+
+  def _retry_delay(
+      self,
+      method: str,
+      query: Mapping[str, Any],
+      status_code: Optional[int],
+      attempt: int,
+      retry_after: Optional[float] = None,
+      replayable: bool = True,
+  ) -> Optional[float]:
+    """Returns the delay before retrying an attempt, or None to give up.
+
+    Attempts which do not need to be retried are recorded as successes.
+    Requests which are not replayable, such as those with streamed bodies, are
+    never retried.
+    """
+    if not self.is_retryable(status_code):
+      with self.__lock:
+        self.__budget = min(self.__max_budget,
+                            self.__budget + self.__budget_refill)
+      return None
+    if (attempt >= self.__max_attempts or not replayable or
+        not self.is_idempotent(method, query)):
+      return None
+    with self.__lock:
+      if self.__budget < 1:
+        return None
+      self.__budget -= 1
+    return max(self.backoff(attempt), retry_after or 0.0)
+
+
+class RateLimiter:
+  """RateLimiter limits the rate at which requests are sent.
+
+  RateLimiter is a token bucket: tokens are added at a steady rate up to a
+  maximum burst, and each request takes one, waiting for it if none are left.
+  A RateLimiter is safe to share between threads and between clients, so that
+  all the requests of an application can be kept below the rate limit of a
+  bucket together.
+  """
+
+  __lock: threading.Lock
+  __rate: float
+  __burst: float
+  __tokens: float
+  __updated_at: float
+
+  def __init__(self, rate: float, burst: Optional[int] = None):
+    """Creates a new RateLimiter.
+
+    Args:
+        rate: The number of requests which may be sent per second.
+        burst: The number of requests which may be sent at once after a period
+            of inactivity. If not set, this is one second's worth of requests.
+    """
+    if rate <= 0:
+      raise ValueError("rate must be positive")
+    self.__lock = threading.Lock()
+    self.__rate = rate
+    self.__burst = max(1.0, float(rate if burst is None else burst))
+    self.__tokens = self.__burst
+    self.__updated_at = time.monotonic()
+
+  def acquire(self) -> None:
+    """Waits until a request may be sent."""
+    delay = self._reserve()
+    if delay > 0:
+      time.sleep(delay)
+
+  def _reserve(self) -> float:
+    """Takes a token, returning the number of seconds until it is available.
+
+    Tokens may be taken before they are available, so that callers waiting on
+    the same limiter are scheduled in turn rather than competing for each token.
+    """
+    with self.__lock:
+      now = time.monotonic()
+      self.__tokens = min(self.__burst,
+                          self.__tokens + (now - self.__updated_at) * self.__rate)
+      self.__updated_at = now
+      self.__tokens -= 1
+      if self.__tokens >= 0:
+        return 0.0
+      return -self.__tokens / self.__rate
+
+
+class _RetryingAdapter(HTTPAdapter):
+  """An HTTP adapter which applies a RetryPolicy and a RateLimiter to requests."""
+
+  __retry: Optional[RetryPolicy]
+  __rate_limiter: Optional[RateLimiter]
+
+  def __init__(
+      self,
+      retry: Optional[RetryPolicy] = None,
+      rate_limiter: Optional[RateLimiter] = None,
+      **kwargs: Any,
+  ):
+    super().__init__(**kwargs)
+    self.__retry = retry
+    self.__rate_limiter = rate_limiter
+
+  def send(
+      self,
+      request: requests.PreparedRequest,
+      stream: bool = False,
+      timeout: Any = None,
+      verify: Any = True,
+      cert: Any = None,
+      proxies: Optional[Dict[str, str]] = None,
+  ) -> requests.Response:
+    query = parse_qs(urlsplit(request.url or "").query)
+    # Bodies which are streams cannot be sent a second time.
+    replayable = isinstance(request.body,
+                            (type(None), bytes, bytearray, memoryview, str))
+    attempt = 1
+    while True:
+      if self.__rate_limiter is not None:
+        self.__rate_limiter.acquire()
+      try:
+        response = super().send(request,
+                                stream=stream,
+                                timeout=timeout,
+                                verify=verify,
+                                cert=cert,
+                                proxies=proxies)
+      except (requests.ConnectionError, requests.Timeout):
+        delay = self.__retry_delay(request, query, replayable, None, attempt)
+        if delay is None:
+          raise
+      else:
+        delay = self.__retry_delay(request, query, replayable,
+                                   response.status_code, attempt,
+                                   _retry_after(response.headers))
+        if delay is None:
+          return response
+        response.close()
+      time.sleep(delay)
+      attempt += 1
+
+  def __retry_delay(
+      self,
+      request: requests.PreparedRequest,
+      query: Mapping[str, Any],
+      replayable: bool,
+      status_code: Optional[int],
+      attempt: int,
+      retry_after: Optional[float] = None,
+  ) -> Optional[float]:
+    if self.__retry is None:
+      return None
+    return self.__retry._retry_delay(request.method or "GET", query,
+                                     status_code, attempt, retry_after,
+                                     replayable)
+
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+  """Returns the delay requested by a Retry-After header, if it has one.
+
+  Only delays in seconds are supported, as GCS does not send HTTP dates.
+  """
+  value = headers.get("Retry-After")
+  if value is None or not value.strip().isdigit():
+    return None
+  return float(value)
@@ -0,0 +1,139 @@
+"""Pythonic representation of the outcome of synchronizing a directory."""
+
+import base64
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+
+import google_crc32c
+from replit.object_storage.batch import BatchResult
+
+# The name of the file, within a synchronized directory, which caches the
+# checksums of its files. It is never synchronized itself.
+MANIFEST_FILENAME = ".replit-object-storage-manifest.json"
+
+_MANIFEST_VERSION = 1
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class SyncResult:
+  """SyncResult contains the outcome of synchronizing a directory with a prefix.
+
+  Attributes:
+      transferred: A result per file uploaded or downloaded, named after its
+          object.
+      deleted: A result per extra object or file deleted, named after the object
+          or the file's path relative to the directory.
+      unchanged: The names of the objects which were already in sync.
+  """
+  transferred: List[BatchResult] = field(default_factory=list)
+  deleted: List[BatchResult] = field(default_factory=list)
+  unchanged: List[str] = field(default_factory=list)
+
+  @property
+  def ok(self) -> bool:
+    """Whether every transfer and deletion succeeded."""
+    return all(result.ok for result in (*self.transferred, *self.deleted))
+
+
+class _Manifest:
+  """A cache of the CRC32C checksums of the files in a directory.
+
+  Checksums are keyed by the path of each file relative to the directory, and
+  are reused for as long as the file's size and modification time are unchanged.
+  An unreadable manifest is treated as empty, so that it is rebuilt.
+  """
+
+  __entries: Dict[str, List]
+
+  def __init__(self, path: str):
+    self.path = path
+    try:
+      with open(path) as file:
+        manifest = json.load(file)
+      if manifest.get("version") != _MANIFEST_VERSION:
+        raise ValueError("unsupported manifest version")
+      self.__entries = manifest["files"]
+    except (OSError, ValueError, KeyError, AttributeError):
+      self.__entries = {}
+
+  def crc32c(self, relative_path: str, path: str) -> str:
+    """Returns the base64-encoded CRC32C checksum of a file."""
+    stat = os.stat(path)
+    entry = self.__entries.get(relative_path)
+    if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+      return entry[2]
+    crc32c = _file_crc32c(path)
+    self.__entries[relative_path] = [stat.st_size, stat.st_mtime_ns, crc32c]
+    return crc32c
+
+  def record(self, relative_path: str, path: str, crc32c: str) -> None:
+    """Records the checksum of a file which was just written."""
+    stat = os.stat(path)
+    self.__entries[relative_path] = [stat.st_size, stat.st_mtime_ns, crc32c]
+
+  def save(self, relative_paths: Iterable[str]) -> None:
+    """Saves the checksums of the given files, forgetting any others."""
+    keep = set(relative_paths)
+    entries = {
+        relative_path: entry
+        for relative_path, entry in self.__entries.items()
+        if relative_path in keep
+    }
+    # The manifest is replaced whole, so that it is never left half-written.
+    temp_path = f"{self.path}.tmp"
+    with open(temp_path, "w") as file:
+      json.dump({"version": _MANIFEST_VERSION, "files": entries}, file)
+    os.replace(temp_path, self.path)
+
+
+def _directory_prefix(prefix: str) -> str:
+  """Returns a prefix which names a directory, ending with a slash."""
+  if prefix and not prefix.endswith("/"):
+    return f"{prefix}/"
+  return prefix
+
+
+def _local_files(local_dir: str, manifest_path: str) -> Dict[str, str]:
+  """Returns the paths of the files in a directory, by their relative paths.
+
+  Relative paths are separated by slashes, as are object names.
+  """
+  files = {}
+  manifest_path = os.path.abspath(manifest_path)
+  for directory, _, filenames in os.walk(local_dir):
+    for filename in filenames:
+      path = os.path.join(directory, filename)
+      absolute_path = os.path.abspath(path)
+      # The manifest's temporary file is skipped too.
+      if (absolute_path == manifest_path or
+          absolute_path.startswith(f"{manifest_path}.")):
+        continue
+      relative_path = os.path.relpath(path, local_dir).replace(os.sep, "/")
+      files[relative_path] = path
+  return files
+
+
+def _local_path(local_dir: str, relative_path: str) -> str:
+  """Returns the path of a file within a directory, given its relative path.
+
+  Raises:
+      ValueError: If the path would be outside of the directory, as object names
+          may contain components such as "..".
+  """
+  root = os.path.abspath(local_dir)
+  path = os.path.normpath(os.path.join(root, *relative_path.split("/")))
+  if os.path.commonpath([root, path]) != root or path == root:
+    raise ValueError(f"{relative_path!r} is not a path within {local_dir!r}")
+  return path
+
+
+def _file_crc32c(path: str) -> str:
+  """Returns the CRC32C checksum of a file, encoded as in object metadata."""
+  checksum = google_crc32c.Checksum()
+  with open(path, "rb") as file:
+    for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b""):
+      checksum.update(chunk)
+  return base64.b64encode(checksum.digest()).decode("ascii")
@@ -0,0 +1,245 @@
+"""Tuning and instrumentation of the HTTP connections used by clients."""
+
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union, cast
+
+import requests
+from replit.object_storage.instrumentation import _current_recording
+from replit.object_storage.retry import RateLimiter, RetryPolicy, _RetryingAdapter
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+from urllib3.connection import HTTPConnection
+
+DEFAULT_POOL_SIZE = DEFAULT_POOLSIZE
+
+_Timeout = Union[None, float, Tuple[Optional[float], Optional[float]]]
+
+
+@dataclass
+class TransportOptions:
+  """TransportOptions configures the HTTP connections of a `Client`.
+
+  Attributes:
+      pool_size: The maximum number of connections kept open to each host. A
+          Client shared by many threads should have a pool at least as large as
+          the number of threads, so that they do not contend for connections.
+      pool_block: Whether requests made while every pooled connection is in use
+          wait for one to be released. Otherwise, they open a temporary
+          connection which is closed afterwards.
+      keep_alive: Whether connections are kept open to be reused between
+          requests. Open connections send TCP keep-alive probes, so that
+          connections dropped by the network are detected rather than hanging.
+      connect_timeout: The number of seconds to wait for a connection to be
+          established. If not set, the GCS library's default is used.
+      read_timeout: The number of seconds to wait for the server to send data.
+          If not set, the GCS library's default is used.
+  """
+  pool_size: int = DEFAULT_POOL_SIZE
+  pool_block: bool = False
+  keep_alive: bool = True
+  connect_timeout: Optional[float] = None
+  read_timeout: Optional[float] = None
+
+
+@dataclass
+class PoolStats:
+  """PoolStats describes the use of a client's connection pool.
+
+  Attributes:
+      pool_size: The maximum number of connections kept open to each host.
+      in_use: The number of connections currently in use by requests.
+      acquisitions: The number of times a request has taken a connection.
+      wait_seconds: The total time requests have spent waiting for a connection.
+      max_wait_seconds: The longest time a request has waited for a connection.
+  """
+  pool_size: int
+  in_use: int = 0
+  acquisitions: int = 0
+  wait_seconds: float = 0.0
+  max_wait_seconds: float = 0.0
+
+
+class _PoolCounters:
+  """Thread-safe counters from which PoolStats are produced."""
+
+  __lock: threading.Lock
+  __stats: PoolStats
+
+  def __init__(self, pool_size: int):
+    self.__lock = threading.Lock()
+    self.__stats = PoolStats(pool_size=pool_size)
+
+  def snapshot(self) -> PoolStats:
+    with self.__lock:
+      return PoolStats(**vars(self.__stats))
+
+  def acquired(self, waited: float) -> None:
+    with self.__lock:
+      self.__stats.in_use += 1
+      self.__stats.acquisitions += 1
+      self.__stats.wait_seconds += waited
+      self.__stats.max_wait_seconds = max(self.__stats.max_wait_seconds, waited)
+
+  def released(self) -> None:
+    with self.__lock:
+      self.__stats.in_use -= 1
+
+
+if TYPE_CHECKING:  # pragma: no cover
+  _PoolBase = HTTPConnectionPool
+else:
+  _PoolBase = object
+
+
+class _InstrumentedPoolMixin(_PoolBase):
+  """Counts the connections taken from and returned to a urllib3 pool."""
+
+  counters: _PoolCounters
+
+  def _get_conn(self, timeout: Optional[float] = None) -> Any:
+    started = time.monotonic()
+    conn = super()._get_conn(timeout)
+    self.counters.acquired(time.monotonic() - started)
+    return conn
+
+  def _put_conn(self, conn: Any) -> None:
+    try:
+      super()._put_conn(conn)
+    finally:
+      self.counters.released()
+
+
+class _InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin,
+                                      HTTPConnectionPool):
+  pass
+
+
+class _InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin,
+                                       HTTPSConnectionPool):
+  pass
+
+
+class _InstrumentedPoolManager(PoolManager):
+
+  __counters: _PoolCounters
+
+  def __init__(self, counters: _PoolCounters, **kwargs: Any):
+    super().__init__(**kwargs)
+    self.__counters = counters
+    self.pool_classes_by_scheme = {
+        "http": _InstrumentedHTTPConnectionPool,
+        "https": _InstrumentedHTTPSConnectionPool,
+    }
+
+  def _new_pool(self, *args: Any, **kwargs: Any) -> HTTPConnectionPool:
+    pool = cast(_InstrumentedPoolMixin, super()._new_pool(*args, **kwargs))
+    pool.counters = self.__counters
+    return pool
+
+
+class _RecordingAdapter(HTTPAdapter):
+  """An HTTP adapter which records each request in the current recording."""
+
+  def send(
+      self,
+      request: requests.PreparedRequest,
+      stream: bool = False,
+      timeout: _Timeout = None,
+      verify: Any = True,
+      cert: Any = None,
+      proxies: Optional[Dict[str, str]] = None,
+  ) -> requests.Response:
+    recording = _current_recording.get()
+    if recording is not None:
+      recording.sent(request)
+    response = super().send(request,
+                            stream=stream,
+                            timeout=timeout,
+                            verify=verify,
+                            cert=cert,
+                            proxies=proxies)
+    if recording is not None:
+      recording.received(response)
+    return response
+
+
+class _TransportAdapter(_RetryingAdapter, _RecordingAdapter):
+  """An HTTP adapter which applies TransportOptions and records PoolStats.
+
+  Each attempt of a request is also recorded by any instrumented operation in
+  progress, after the retrying adapter has decided to make it.
+  """
+
+  __options: TransportOptions
+  __counters: _PoolCounters
+
+  def __init__(
+      self,
+      options: Optional[TransportOptions] = None,
+      retry: Optional[RetryPolicy] = None,
+      rate_limiter: Optional[RateLimiter] = None,
+  ):
+    self.__options = options or TransportOptions()
+    self.__counters = _PoolCounters(self.__options.pool_size)
+    super().__init__(retry=retry,
+                     rate_limiter=rate_limiter,
+                     pool_maxsize=self.__options.pool_size,
+                     pool_block=self.__options.pool_block)
+
+  def pool_stats(self) -> PoolStats:
+    return self.__counters.snapshot()
+
+  def init_poolmanager(
+      self,
+      connections: int,
+      maxsize: int,
+      block: bool = False,
+      **pool_kwargs: Any,
+  ) -> None:
+    self._pool_connections = connections
+    self._pool_maxsize = maxsize
+    self._pool_block = block
+    # urllib3 annotates the defaults as Final, which pyright cannot iterate.
+    socket_options = list(
+        cast(List[Any], HTTPConnection.default_socket_options))
+    if self.__options.keep_alive:
+      socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    self.poolmanager = _InstrumentedPoolManager(self.__counters,
+                                                num_pools=connections,
+                                                maxsize=maxsize,
+                                                block=block,
+                                                socket_options=socket_options,
+                                                **pool_kwargs)
+
+  def send(
+      self,
+      request: requests.PreparedRequest,
+      stream: bool = False,
+      timeout: _Timeout = None,
+      verify: Any = True,
+      cert: Any = None,
+      proxies: Optional[Dict[str, str]] = None,
+  ) -> requests.Response:
+    if not self.__options.keep_alive:
+      request.headers["Connection"] = "close"
+    return super().send(request,
+                        stream=stream,
+                        timeout=self.__timeout(timeout),
+                        verify=verify,
+                        cert=cert,
+                        proxies=proxies)
+
+  def __timeout(self, timeout: _Timeout) -> _Timeout:
+    connect_timeout = self.__options.connect_timeout
+    read_timeout = self.__options.read_timeout
+    if connect_timeout is None and read_timeout is None:
+      return timeout
+    if isinstance(timeout, tuple):
+      default_connect, default_read = timeout
+    else:
+      default_connect = default_read = timeout
+    return (default_connect if connect_timeout is None else connect_timeout,
+            default_read if read_timeout is None else read_timeout)
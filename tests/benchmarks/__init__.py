@@ -0,0 +1 @@
+"""Benchmarks of Client operations, run with `python -m tests.benchmarks`."""
@@ -0,0 +1,153 @@
+"""Benchmarks every Client operation against a local fake of GCS.
+
+Each operation is run across object sizes and levels of concurrency, reporting
+throughput, median and 99th percentile latency, and peak memory. Results may be
+saved as a baseline, and later runs compared against it:
+
+    python -m tests.benchmarks --save main
+    python -m tests.benchmarks --compare main
+
+Latency, bandwidth caps and faults may be injected into the fake, to measure
+behaviour against slow or failing storage:
+
+    python -m tests.benchmarks --latency 0.02 --bandwidth 50MiB --fault-rate 0.01
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional
+
+from replit.object_storage import RetryPolicy
+
+from tests.benchmarks.operations import OPERATIONS
+from tests.benchmarks.runner import (
+  Case,
+  Result,
+  fake_storage,
+  load_baseline,
+  regressions,
+  run_case,
+  save_baseline,
+)
+
+BASELINE_DIRECTORY = os.path.join(os.path.dirname(__file__), "baselines")
+
+_UNITS = {"KiB": 1024, "MiB": 1024**2, "GiB": 1024**3, "B": 1}
+
+
+def parse_size(value: str) -> int:
+  for unit, multiplier in _UNITS.items():
+    if value.endswith(unit):
+      return int(float(value[:-len(unit)]) * multiplier)
+  return int(value)
+
+
+def format_size(size: float) -> str:
+  for unit in ("GiB", "MiB", "KiB"):
+    if size >= _UNITS[unit]:
+      return f"{size / _UNITS[unit]:.4g}{unit}"
+  return f"{size:.0f}B"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(prog="python -m tests.benchmarks",
+                                   description=(__doc__ or "").partition("\n")[0])
+  parser.add_argument("--operations",
+                      default=",".join(op.name for op in OPERATIONS),
+                      help="Comma-separated Client methods to benchmark.")
+  parser.add_argument("--sizes",
+                      default="1KiB,1MiB",
+                      help="Comma-separated object sizes, such as 64KiB.")
+  parser.add_argument("--concurrency",
+                      default="1,8",
+                      help="Comma-separated numbers of threads calling at once.")
+  parser.add_argument("--iterations",
+                      type=int,
+                      default=50,
+                      help="The number of calls timed for each case.")
+  parser.add_argument("--latency",
+                      type=float,
+                      default=0.0,
+                      help="Seconds the fake waits before each response.")
+  parser.add_argument("--bandwidth",
+                      type=parse_size,
+                      default=None,
+                      help="The fake's bandwidth per request, per second.")
+  parser.add_argument("--fault-rate",
+                      type=float,
+                      default=0.0,
+                      help="The probability that the fake fails a request.")
+  parser.add_argument("--retry",
+                      action="store_true",
+                      help="Use a RetryPolicy rather than the library's retries.")
+  parser.add_argument("--save",
+                      metavar="NAME",
+                      help="Save the results as a baseline with this name.")
+  parser.add_argument("--compare",
+                      metavar="NAME",
+                      help="Compare the results with a saved baseline.")
+  parser.add_argument("--threshold",
+                      type=float,
+                      default=0.2,
+                      help="The fractional change treated as a regression.")
+  return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  args = parse_args(argv)
+  operations = {op.name: op for op in OPERATIONS}
+  names = args.operations.split(",")
+  unknown = [name for name in names if name not in operations]
+  if unknown:
+    print(f"unknown operations: {', '.join(unknown)}", file=sys.stderr)
+    return 2
+  cases = [
+      Case(operations[name], parse_size(size), int(concurrency))
+      for name in names
+      for size in args.sizes.split(",")
+      for concurrency in args.concurrency.split(",")
+  ]
+  retry = RetryPolicy() if args.retry else None
+  baseline = (load_baseline(os.path.join(BASELINE_DIRECTORY,
+                                         f"{args.compare}.json"))
+              if args.compare else {})
+
+  print(f"{'operation':<22}{'size':>8}{'threads':>8}{'ops/s':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'peak mem':>10}{'errors':>8}")
+  results: Dict[str, Result] = {}
+  with fake_storage(latency=args.latency,
+                    bandwidth=args.bandwidth,
+                    fault_rate=args.fault_rate) as fake:
+    for case in cases:
+      result = run_case(fake, case, args.iterations, retry)
+      results[case.key] = result
+      change = ""
+      if case.key in baseline:
+        before = baseline[case.key].ops_per_sec
+        change = f"  {(result.ops_per_sec - before) / before:+.0%} ops/s"
+      print(f"{case.operation.name:<22}{format_size(case.size):>8}"
+            f"{case.concurrency:>8}{result.ops_per_sec:>10.1f}"
+            f"{result.p50_ms:>10.2f}{result.p99_ms:>10.2f}"
+            f"{format_size(result.peak_memory_bytes):>10}{result.errors:>8}"
+            f"{change}")
+
+  if args.save:
+    options = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("save", "compare", "threshold")
+    }
+    save_baseline(os.path.join(BASELINE_DIRECTORY, f"{args.save}.json"),
+                  options, results)
+  if args.compare:
+    regressed = regressions(baseline, results, args.threshold)
+    for key, metrics in sorted(regressed.items()):
+      print(f"regressed: {key}: {', '.join(metrics)}", file=sys.stderr)
+    if regressed:
+      return 1
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
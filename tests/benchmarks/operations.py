@@ -0,0 +1,133 @@
+"""The Client operations measured by the benchmarks.
+
+Each operation performs one call of a Client method. Operations which read
+objects are given objects of the benchmarked size, created before timing starts.
+"""
+
+import io
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from replit.object_storage import Client
+
+# The number of objects given to each call of a batch method.
+BATCH_SIZE = 16
+
+# The number of objects listed by list operations.
+LIST_SIZE = 100
+
+
+@dataclass
+class Fixture:
+  """The inputs available to operations.
+
+  Attributes:
+      size: The benchmarked object size, in bytes.
+      payload: size bytes, to be uploaded.
+      names: The names of objects of size bytes which exist before timing starts.
+      generations: The generation of each object in names.
+      directory: A directory in which files may be written.
+      buffer: A writable buffer of size bytes, which is reused between calls.
+  """
+  size: int
+  payload: bytes
+  names: List[str]
+  generations: Dict[str, int]
+  directory: str
+  buffer: bytearray = field(init=False)
+
+  def __post_init__(self):
+    self.buffer = bytearray(self.size)
+
+  def name(self, i: int) -> str:
+    return self.names[i % len(self.names)]
+
+  def batch(self, i: int) -> List[str]:
+    return [self.name(i * BATCH_SIZE + j) for j in range(BATCH_SIZE)]
+
+
+@dataclass
+class Operation:
+  """A benchmarked operation.
+
+  Attributes:
+      name: The name of the Client method it calls.
+      run: Performs the i-th call.
+      objects: The number of objects it needs, per call, to exist beforehand.
+          Operations which delete objects need one for every call.
+  """
+  name: str
+  run: Callable[[Client, Fixture, int], object]
+  objects: int = 0
+
+
+def _download_stream(client: Client, fixture: Fixture, i: int) -> None:
+  for _ in client.download_stream(fixture.name(i)):
+    pass
+
+
+def _download_to_filename(client: Client, fixture: Fixture, i: int) -> None:
+  path = os.path.join(fixture.directory, f"download-{i}")
+  client.download_to_filename(fixture.name(i), path)
+  os.remove(path)
+
+
+def _open_read(client: Client, fixture: Fixture, i: int) -> None:
+  with client.open(fixture.name(i)) as file:
+    file.read()
+
+
+def _open_write(client: Client, fixture: Fixture, i: int) -> None:
+  with client.open(f"upload/{i}", "wb") as file:
+    file.write(fixture.payload)
+
+
+def _upload_from_filename(client: Client, fixture: Fixture, i: int) -> None:
+  path = os.path.join(fixture.directory, "payload")
+  if not os.path.exists(path):
+    with open(path, "wb") as file:
+      file.write(fixture.payload)
+  client.upload_from_filename(f"upload/{i}", path)
+
+
+OPERATIONS: List[Operation] = [
+    Operation("compose", lambda c, f, i: c.compose(f.batch(i), f"compose/{i}")),
+    Operation("copy", lambda c, f, i: c.copy(f.name(i), f"copy/{i}")),
+    Operation("copy_many",
+              lambda c, f, i: c.copy_many([(n, f"copy/{n}") for n in f.batch(i)])),
+    Operation("delete", lambda c, f, i: c.delete(f.names[i]), objects=1),
+    Operation("delete_many",
+              lambda c, f, i: c.delete_many(
+                  f.names[i * BATCH_SIZE:(i + 1) * BATCH_SIZE]),
+              objects=BATCH_SIZE),
+    Operation("download_as_bytes",
+              lambda c, f, i: c.download_as_bytes(f.name(i))),
+    Operation("download_as_text", lambda c, f, i: c.download_as_text(f.name(i))),
+    Operation("download_if_changed",
+              lambda c, f, i: c.download_if_changed(
+                  f.name(i), f.generations[f.name(i)])),
+    Operation("download_into",
+              lambda c, f, i: c.download_into(f.name(i), f.buffer)),
+    Operation("download_many", lambda c, f, i: c.download_many(f.batch(i))),
+    Operation("download_range",
+              lambda c, f, i: c.download_range(f.name(i), 0, f.size // 2)),
+    Operation("download_stream", _download_stream),
+    Operation("download_to_filename", _download_to_filename),
+    Operation("exists", lambda c, f, i: c.exists(f.name(i))),
+    Operation("exists_many", lambda c, f, i: c.exists_many(f.batch(i))),
+    Operation("list", lambda c, _f, _i: c.list(prefix="read/")),
+    Operation("open_read", _open_read),
+    Operation("open_write", _open_write),
+    Operation("stat", lambda c, f, i: c.stat(f.name(i))),
+    Operation("stat_many", lambda c, f, i: c.stat_many(f.batch(i))),
+    Operation("upload_from_bytes",
+              lambda c, f, i: c.upload_from_bytes(f"upload/{i}", f.payload)),
+    Operation("upload_from_file",
+              lambda c, f, i: c.upload_from_file(f"upload/{i}",
+                                                 io.BytesIO(f.payload))),
+    Operation("upload_from_filename", _upload_from_filename),
+    Operation("upload_from_text",
+              lambda c, f, i: c.upload_from_text(f"upload/{i}",
+                                                 f.payload.decode("latin-1"))),
+]
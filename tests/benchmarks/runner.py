@@ -0,0 +1,239 @@
+"""Runs benchmark cases against a FakeGCS in a separate process.
+
+The fake is served from a child process so that its CPU time and memory are not
+counted against the Client, and the two do not contend for the GIL.
+"""
+
+import base64
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from replit.object_storage import Client, RetryPolicy
+
+from tests.benchmarks.operations import LIST_SIZE, Fixture, Operation
+from tests.fake_gcs import FakeGCS, use_endpoint
+
+# The number of calls made while measuring peak memory, which is measured
+# separately because tracing allocations slows every call down.
+MEMORY_ITERATIONS = 10
+
+
+@dataclass
+class Case:
+  """A combination of operation, object size and concurrency to benchmark."""
+  operation: Operation
+  size: int
+  concurrency: int
+
+  @property
+  def key(self) -> str:
+    return f"{self.operation.name}/{self.size}/{self.concurrency}"
+
+
+@dataclass
+class Result:
+  """The measurements of a Case.
+
+  Attributes:
+      ops_per_sec: Calls completed per second, across all threads.
+      p50_ms: The median latency of a call, in milliseconds.
+      p99_ms: The 99th percentile latency of a call, in milliseconds.
+      peak_memory_bytes: The peak memory allocated by the Client during the
+          calls, above what was allocated beforehand.
+      errors: The number of calls which raised.
+  """
+  ops_per_sec: float
+  p50_ms: float
+  p99_ms: float
+  peak_memory_bytes: int
+  errors: int = 0
+
+
+class RemoteFakeGCS:
+  """A FakeGCS served by a child process, controlled over a pipe."""
+
+  def __init__(self, **options: Any):
+    self.__options = options
+    self.__conn: Any = None
+    self.__process: Any = None
+    self.url = ""
+
+  def __enter__(self) -> "RemoteFakeGCS":
+    self.__conn, child_conn = multiprocessing.Pipe()
+    self.__process = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(child_conn, self.__options), daemon=True)
+    self.__process.start()
+    self.url = self.__conn.recv()
+    return self
+
+  def __exit__(self, *_exc_info: Any) -> None:
+    self.__call("stop")
+    self.__process.join()
+
+  def reset(self, names: List[str], data: bytes) -> Dict[str, int]:
+    """Replaces the objects in the default bucket, returning their generations."""
+    return self.__call("reset", names, data)
+
+  def __call(self, command: str, *args: Any) -> Any:
+    self.__conn.send((command, args))
+    return self.__conn.recv()
+
+
+def _serve(conn: Any, options: Dict[str, Any]) -> None:
+  fake = FakeGCS(**options)
+  fake.start()
+  conn.send(fake.url)
+  while True:
+    command, args = conn.recv()
+    if command == "stop":
+      fake.stop()
+      conn.send(None)
+      return
+    names, data = args
+    bucket = fake.buckets[next(iter(fake.buckets))]
+    bucket.clear()
+    conn.send({name: fake.put_object(name, data).generation for name in names})
+
+
+@contextmanager
+def fake_storage(**options: Any) -> Iterator[RemoteFakeGCS]:
+  """Serves a FakeGCS from a child process, and configures the library to use it."""
+  with RemoteFakeGCS(**options) as fake, use_endpoint(fake.url):
+    yield fake
+
+
+def payload(size: int) -> bytes:
+  """Returns size bytes of random ASCII, so that they can be decoded as text."""
+  return base64.b64encode(os.urandom(size))[:size]
+
+
+def run_case(
+    fake: RemoteFakeGCS,
+    case: Case,
+    iterations: int,
+    retry: Optional[RetryPolicy] = None,
+) -> Result:
+  """Benchmarks a case, returning its measurements."""
+  data = payload(case.size)
+  with tempfile.TemporaryDirectory() as directory:
+
+    def prepare(count: int) -> Tuple[Client, Fixture]:
+      objects = max(case.operation.objects * count, LIST_SIZE)
+      names = [f"read/{i:06d}" for i in range(objects)]
+      generations = fake.reset(names, data)
+      client = Client(retry=retry)
+      fixture = Fixture(case.size, data, names, generations, directory)
+      # A first call connects and resolves the default bucket outside of timing.
+      client.exists(names[-1])
+      return client, fixture
+
+    client, fixture = prepare(iterations)
+    latencies, errors, elapsed = _run(client, fixture, case, iterations)
+
+    client, fixture = prepare(MEMORY_ITERATIONS)
+    tracemalloc.start()
+    try:
+      baseline = tracemalloc.get_traced_memory()[0]
+      _run(client, fixture, case, min(iterations, MEMORY_ITERATIONS))
+      peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+      tracemalloc.stop()
+
+  latencies.sort()
+  return Result(
+      ops_per_sec=iterations / elapsed,
+      p50_ms=_percentile(latencies, 50) * 1000,
+      p99_ms=_percentile(latencies, 99) * 1000,
+      peak_memory_bytes=peak,
+      errors=errors,
+  )
+
+
+def _run(client: Client, fixture: Fixture, case: Case,
+         iterations: int) -> Tuple[List[float], int, float]:
+
+  def call(i: int) -> Tuple[float, bool]:
+    started = time.perf_counter()
+    try:
+      case.operation.run(client, fixture, i)
+    except Exception:
+      return time.perf_counter() - started, False
+    return time.perf_counter() - started, True
+
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=case.concurrency) as executor:
+    outcomes = list(executor.map(call, range(iterations)))
+  elapsed = time.perf_counter() - started
+  latencies = [latency for latency, _ in outcomes]
+  errors = sum(1 for _, ok in outcomes if not ok)
+  return latencies, errors, elapsed
+
+
+def _percentile(values: List[float], percentile: int) -> float:
+  if len(values) == 1:
+    return values[0]
+  return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+def save_baseline(path: str, options: Dict[str, Any],
+                  results: Dict[str, Result]) -> None:
+  """Saves results, and the options and platform that produced them."""
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, "w") as file:
+    json.dump(
+        {
+            "platform": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "system": platform.system(),
+                "cpus": os.cpu_count(),
+            },
+            "options": options,
+            "results": {key: asdict(result) for key, result in results.items()},
+        },
+        file,
+        indent=2,
+        sort_keys=True)
+    file.write("\n")
+
+
+def load_baseline(path: str) -> Dict[str, Result]:
+  with open(path) as file:
+    results = json.load(file)["results"]
+  return {key: Result(**result) for key, result in results.items()}
+
+
+def regressions(
+    baseline: Dict[str, Result],
+    results: Dict[str, Result],
+    threshold: float,
+) -> Dict[str, List[str]]:
+  """Returns, for each case, the measurements which regressed beyond threshold.
+
+  Throughput regresses when it falls, and latency and memory when they rise, by
+  more than threshold as a fraction of the baseline.
+  """
+  regressed = {}
+  for key, result in results.items():
+    before = baseline.get(key)
+    if before is None:
+      continue
+    metrics = []
+    if result.ops_per_sec < before.ops_per_sec * (1 - threshold):
+      metrics.append("ops_per_sec")
+    for metric in ("p50_ms", "p99_ms", "peak_memory_bytes"):
+      if getattr(result, metric) > getattr(before, metric) * (1 + threshold):
+        metrics.append(metric)
+    if metrics:
+      regressed[key] = metrics
+  return regressed
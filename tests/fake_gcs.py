@@ -0,0 +1,451 @@
+"""An in-process stand-in for GCS and the Replit sidecar, for tests and benchmarks.
+
+FakeGCS serves the GCS JSON API from the library's emulator over a local HTTP
+server, along with the sidecar's credential, token and default bucket
+endpoints. Objects are held in memory.
+
+Latency, bandwidth caps and transient faults may be injected, so that the
+clients' behaviour under slow or failing storage can be measured offline.
+
+    with FakeGCS(latency=0.005) as fake:
+      Client().upload_from_bytes("object-name", b"test-bytes")
+      assert fake.object("object-name").data == b"test-bytes"
+
+While a FakeGCS is entered, the library is configured to use it in place of GCS
+and the sidecar, and its shared state is reset on entry and exit.
+"""
+
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+  Any,
+  Dict,
+  Iterable,
+  Iterator,
+  List,
+  Mapping,
+  Optional,
+  Tuple,
+  cast,
+)
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+from replit.object_storage._emulator import (
+  Emulator,
+  EmulatorError,
+  Response,
+  _crc32c,
+  _md5,
+  error_response,
+)
+from replit.object_storage.backends import Backend, StoredObject
+
+DEFAULT_BUCKET_ID = "bucket-id"
+DEFAULT_FAULT_STATUS_CODES = (429, 503)
+
+_WRITE_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class FakeObject:
+  """An object held by FakeGCS."""
+  data: bytes
+  generation: int
+  metageneration: int = 1
+  content_type: str = "application/octet-stream"
+  content_encoding: Optional[str] = None
+  metadata: Dict[str, str] = field(default_factory=dict)
+  updated: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+  crc32c: str = ""
+  md5: str = ""
+
+  def __post_init__(self) -> None:
+    # Objects are immutable, so their hashes are computed once, not per request.
+    if not self.crc32c:
+      self.crc32c = _crc32c(self.data)
+    if not self.md5:
+      self.md5 = _md5(self.data)
+
+
+class _FakeBackend(Backend):
+  """A backend holding the objects of a FakeGCS as FakeObjects.
+
+  FakeObjects may be modified directly by tests, such as to corrupt their
+  hashes, and the changes are served by the emulator.
+  """
+
+  def __init__(self, buckets: Dict[str, Dict[str, FakeObject]],
+               default_bucket_id: str):
+    super().__init__(default_bucket_id)
+    self.__buckets = buckets
+    self.__generations = itertools.count(1)
+
+  def create_bucket(self, bucket_id: str) -> None:
+    self.__buckets.setdefault(bucket_id, {})
+
+  def has_bucket(self, bucket_id: str) -> bool:
+    return bucket_id in self.__buckets
+
+  def names(self, bucket_id: str) -> List[str]:
+    return list(self.__buckets[bucket_id])
+
+  def get(self, bucket_id: str, name: str) -> Optional[StoredObject]:
+    obj = self.__buckets[bucket_id].get(name)
+    if obj is None:
+      return None
+    return StoredObject(size=len(obj.data),
+                        generation=obj.generation,
+                        crc32c=obj.crc32c,
+                        md5=obj.md5,
+                        metageneration=obj.metageneration,
+                        content_type=obj.content_type,
+                        content_encoding=obj.content_encoding,
+                        metadata=dict(obj.metadata),
+                        updated=obj.updated)
+
+  def read(self, bucket_id: str, name: str) -> bytes:
+    return self.__buckets[bucket_id][name].data
+
+  def write(self, bucket_id: str, name: str, obj: StoredObject,
+            data: Optional[bytes]) -> None:
+    bucket = self.__buckets[bucket_id]
+    if data is None:
+      data = bucket[name].data
+    bucket[name] = FakeObject(data=data,
+                              generation=obj.generation,
+                              metageneration=obj.metageneration,
+                              content_type=obj.content_type,
+                              content_encoding=obj.content_encoding,
+                              metadata=obj.metadata,
+                              updated=obj.updated,
+                              crc32c=obj.crc32c,
+                              md5=obj.md5)
+
+  def delete(self, bucket_id: str, name: str) -> None:
+    del self.__buckets[bucket_id][name]
+
+  def next_generation(self) -> int:
+    return next(self.__generations)
+
+
+class FakeGCS:
+  """FakeGCS serves GCS and sidecar endpoints from a local HTTP server.
+
+  Attributes:
+      buckets: The objects of each bucket, by bucket ID and object name.
+      requests: The number of requests served, by endpoint, such as
+          "download_object" or "upload_object".
+      latency: Seconds to wait before responding to each request.
+      bandwidth: The maximum rate, in bytes per second, at which each request's
+          body is read and each response's body is written. Unlimited if None.
+      fault_rate: The probability that a storage request fails with one of
+          `fault_status_codes`, before it is processed.
+      fault_status_codes: The status codes of injected faults.
+  """
+
+  buckets: Dict[str, Dict[str, FakeObject]]
+  requests: Counter
+  latency: float
+  bandwidth: Optional[float]
+  fault_rate: float
+  fault_status_codes: Tuple[int, ...]
+
+  def __init__(
+      self,
+      latency: float = 0.0,
+      bandwidth: Optional[float] = None,
+      fault_rate: float = 0.0,
+      fault_status_codes: Iterable[int] = DEFAULT_FAULT_STATUS_CODES,
+      default_bucket_id: str = DEFAULT_BUCKET_ID,
+      seed: Optional[int] = None,
+  ):
+    self.buckets = {default_bucket_id: {}}
+    self.requests = Counter()
+    self.latency = latency
+    self.bandwidth = bandwidth
+    self.fault_rate = fault_rate
+    self.fault_status_codes = tuple(fault_status_codes)
+    self.__default_bucket_id = default_bucket_id
+    self.__emulator = Emulator(_FakeBackend(self.buckets, default_bucket_id))
+    self.__lock = threading.Lock()
+    self.__random = random.Random(seed)
+    self.__next_faults: List[int] = []
+    self.__next_drops: List[int] = []
+    self.__server: Optional[ThreadingHTTPServer] = None
+    self.__exit_stack = ExitStack()
+
+  @property
+  def rewrite_chunk_size(self) -> Optional[int]:
+    """The maximum number of bytes copied by each rewrite request.
+
+    If None, objects are copied in a single request. Larger objects take several
+    requests, as they would when GCS copies them between locations or storage
+    classes.
+    """
+    return self.__emulator.rewrite_chunk_size
+
+  @rewrite_chunk_size.setter
+  def rewrite_chunk_size(self, value: Optional[int]) -> None:
+    self.__emulator.rewrite_chunk_size = value
+
+  @property
+  def url(self) -> str:
+    """The base URL of the server."""
+    host, port = self.__running_server().server_address[:2]
+    return f"http://{host}:{port}"
+
+  def start(self) -> None:
+    """Starts serving in a background thread."""
+    handler = type("Handler", (_Handler,), {"fake": self})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    self.__server = server
+    threading.Thread(target=server.serve_forever,
+                     kwargs={"poll_interval": 0.01},
+                     name="fake-gcs",
+                     daemon=True).start()
+
+  def stop(self) -> None:
+    """Stops serving."""
+    server = self.__running_server()
+    server.shutdown()
+    server.server_close()
+
+  def __running_server(self) -> ThreadingHTTPServer:
+    if self.__server is None:
+      raise RuntimeError("FakeGCS has not been started")
+    return self.__server
+
+  def __enter__(self) -> "FakeGCS":
+    self.start()
+    self.__exit_stack = ExitStack()
+    self.__exit_stack.enter_context(use_endpoint(self.url))
+    return self
+
+  def __exit__(self, *_exc_info: Any) -> None:
+    self.__exit_stack.close()
+    self.stop()
+
+  def fail_next(self, status_code: int, times: int = 1) -> None:
+    """Fails the next storage requests with a status code."""
+    with self.__lock:
+      self.__next_faults.extend([status_code] * times)
+
+  def drop_next_download(self, after: int, times: int = 1) -> None:
+    """Drops the connections of the next downloads after sending some bytes.
+
+    Each response is sent with its full Content-Length, but its connection is
+    closed once after bytes of its body have been sent.
+    """
+    with self.__lock:
+      self.__next_drops.extend([after] * times)
+
+  def object(self, name: str, bucket_id: Optional[str] = None) -> FakeObject:
+    """Returns a stored object, raising KeyError if it does not exist."""
+    return self.buckets[bucket_id or self.__default_bucket_id][name]
+
+  def put_object(
+      self,
+      name: str,
+      data: bytes,
+      bucket_id: Optional[str] = None,
+      **kwargs: Any,
+  ) -> FakeObject:
+    """Stores an object directly, as a new generation."""
+    bucket_id = bucket_id or self.__default_bucket_id
+    self.__emulator.store(bucket_id, name, data, **kwargs)
+    return self.object(name, bucket_id)
+
+  # The methods below are called by the request handler.
+
+  def _fault(self) -> Optional[int]:
+    with self.__lock:
+      if self.__next_faults:
+        return self.__next_faults.pop(0)
+      if self.fault_rate and self.__random.random() < self.fault_rate:
+        return self.__random.choice(self.fault_status_codes)
+    return None
+
+  def _drop(self) -> Optional[int]:
+    with self.__lock:
+      if self.__next_drops:
+        return self.__next_drops.pop(0)
+    return None
+
+  def _default_bucket_id(self) -> str:
+    return self.__default_bucket_id
+
+  def _emulator(self) -> Emulator:
+    return self.__emulator
+
+
+class _Handler(BaseHTTPRequestHandler):
+  """Routes sidecar requests, and storage requests to a FakeGCS's emulator."""
+
+  fake: FakeGCS
+  protocol_version = "HTTP/1.1"
+  # Otherwise, responses written in several parts wait on delayed ACKs.
+  disable_nagle_algorithm = True
+
+  _SIDECAR_ROUTES = [
+      ("GET", re.compile(r"/credential"), "credential"),
+      ("POST", re.compile(r"/token"), "token"),
+      ("GET", re.compile(r"/object-storage/default-bucket"), "default_bucket"),
+  ]
+
+  def log_message(self, format: str, *args: Any) -> None:
+    pass
+
+  def do_GET(self) -> None:
+    self.__dispatch("GET")
+
+  def do_POST(self) -> None:
+    self.__dispatch("POST")
+
+  def do_PUT(self) -> None:
+    self.__dispatch("PUT")
+
+  def do_PATCH(self) -> None:
+    self.__dispatch("PATCH")
+
+  def do_DELETE(self) -> None:
+    self.__dispatch("DELETE")
+
+  def __dispatch(self, method: str) -> None:
+    path = urlsplit(self.path).path
+    body = self.__read_body()
+    if self.fake.latency:
+      time.sleep(self.fake.latency)
+    for route_method, pattern, handler_name in self._SIDECAR_ROUTES:
+      if route_method == method and pattern.fullmatch(path):
+        self.fake.requests[handler_name] += 1
+        self.__send(getattr(self, f"_{handler_name}")())
+        return
+    emulator = self.fake._emulator()
+    route = emulator.match(method, path)
+    if route is None:
+      self.__send(error_response(404, f"No route for {method} {path}"))
+      return
+    self.fake.requests[route[0]] += 1
+    status = self.fake._fault()
+    if status is not None:
+      self.__send(error_response(status, "Injected fault."))
+      return
+    try:
+      # The request's headers are looked up without regard to case, like a
+      # Mapping from requests.
+      headers = cast(Mapping[str, str], self.headers)
+      response = emulator.dispatch(route[0], route[1],
+                                   self.fake.url + self.path, headers, body)
+    except EmulatorError as err:
+      response = error_response(err.status, err.message)
+    except Exception as err:
+      response = error_response(500, f"{type(err).__name__}: {err}")
+    drop_after = None
+    if route[0] == "download_object" and response.status < 300:
+      drop_after = self.fake._drop()
+    self.__send(response, drop_after)
+
+  def _credential(self) -> Response:
+    return _json_response({"access_token": "fake-subject-token"})
+
+  def _token(self) -> Response:
+    return _json_response({
+        "access_token": "fake-access-token",
+        "issued_token_type": "urn:ietf:params:oauth:token-type:access_token",
+        "token_type": "Bearer",
+        "expires_in": 3600,
+    })
+
+  def _default_bucket(self) -> Response:
+    return _json_response({"bucketId": self.fake._default_bucket_id()})
+
+  def __read_body(self) -> bytes:
+    if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+      parts = []
+      while True:
+        size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+        if size == 0:
+          self.rfile.readline()
+          break
+        parts.append(self.__read(size))
+        self.rfile.readline()
+      return b"".join(parts)
+    return self.__read(int(self.headers.get("Content-Length") or 0))
+
+  def __read(self, size: int) -> bytes:
+    if self.fake.bandwidth is None:
+      return self.rfile.read(size)
+    parts = []
+    while size > 0:
+      part = self.rfile.read(min(size, _WRITE_CHUNK_SIZE))
+      if not part:
+        break
+      parts.append(part)
+      size -= len(part)
+      time.sleep(len(part) / self.fake.bandwidth)
+    return b"".join(parts)
+
+  def __send(self, response: Response, drop_after: Optional[int] = None) -> None:
+    body = response.body
+    self.send_response(response.status)
+    for name, value in response.headers.items():
+      self.send_header(name, value)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    if drop_after is not None:
+      self.wfile.write(body[:drop_after])
+      self.wfile.flush()
+      self.close_connection = True
+      return
+    if self.fake.bandwidth is None:
+      self.wfile.write(body)
+      return
+    view = memoryview(body)
+    for offset in range(0, len(body), _WRITE_CHUNK_SIZE):
+      part = view[offset:offset + _WRITE_CHUNK_SIZE]
+      time.sleep(len(part) / self.fake.bandwidth)
+      self.wfile.write(part)
+
+
+@contextmanager
+def use_endpoint(url: str) -> Iterator[None]:
+  """Configures the library to use a FakeGCS served at a URL.
+
+  The library's shared state is reset on entry and exit, so that clients
+  created within the context connect to the fake.
+  """
+  # Imported here so that importing this module does not import the library.
+  from replit.object_storage import _shared, async_client
+
+  adc = dict(_shared.REPLIT_ADC)
+  adc["token_url"] = f"{url}/token"
+  adc["credential_source"] = dict(adc["credential_source"],
+                                  url=f"{url}/credential")
+  with patch.dict(os.environ, {"STORAGE_EMULATOR_HOST": url}), \
+       patch.object(_shared, "REPLIT_ADC", adc), \
+       patch.object(_shared, "REPLIT_DEFAULT_BUCKET_URL",
+                    f"{url}/object-storage/default-bucket"), \
+       patch.object(async_client, "GCS_API_ENDPOINT", url):
+    _shared.reset()
+    try:
+      yield
+    finally:
+      _shared.reset()
+
+
+def _json_response(value: Dict[str, Any]) -> Response:
+  return Response(200,
+                  json.dumps(value).encode("utf-8"),
+                  {"Content-Type": "application/json; charset=UTF-8"})
@@ -1,9 +1,13 @@
+from io import BytesIO
 from tempfile import TemporaryDirectory
 from uuid import uuid4
 
 import pytest
-from replit.object_storage import Client, Object
-from replit.object_storage.errors import ObjectNotFoundError
+from replit.object_storage import Client, ObjectCache, RateLimiter, RetryPolicy
+from replit.object_storage.errors import (
+  ObjectNotFoundError,
+  PreconditionFailedError,
+)
 
 TEST_FILE_CONTENTS = "Hello World!"
 
@@ -76,6 +80,19 @@ class TestDownloadAsBytes:
     result = client.download_as_bytes(f"{testdir}/download-as-bytes-1.txt")
     assert result == bytes(TEST_FILE_CONTENTS, 'utf-8')
 
+  @staticmethod
+  def test_upload_then_download_cached(testdir):
+    cache = ObjectCache()
+    client = Client(cache=cache)
+    client.upload_from_text(f"{testdir}/download-as-bytes-3.txt",
+                              TEST_FILE_CONTENTS)
+
+    for _ in range(2):
+      result = client.download_as_bytes(f"{testdir}/download-as-bytes-3.txt")
+      assert result == bytes(TEST_FILE_CONTENTS, 'utf-8')
+    assert cache.stats().misses == 1
+    assert cache.stats().hits == 1
+
   @staticmethod
   def test_not_found(testdir):
     client = Client()
@@ -101,6 +118,65 @@ class TestDownloadAsText:
       client.download_as_bytes(f"{testdir}/download-as-string-2.txt")
 
 
+class TestDownloadIfChanged:
+
+  @staticmethod
+  def test_upload_then_download(testdir):
+    client = Client()
+    client.upload_from_text(f"{testdir}/download-if-changed-1.txt",
+                            TEST_FILE_CONTENTS)
+
+    result = client.download_if_changed(f"{testdir}/download-if-changed-1.txt",
+                                        None)
+    assert result is not None
+    data, generation = result
+    assert data == TEST_FILE_CONTENTS.encode("utf-8")
+
+    result = client.download_if_changed(f"{testdir}/download-if-changed-1.txt",
+                                        generation)
+    assert result is None
+
+
+class TestDownloadRange:
+
+  @staticmethod
+  def test_upload_then_download(testdir):
+    client = Client()
+    client.upload_from_text(f"{testdir}/download-range-1.txt",
+                              TEST_FILE_CONTENTS)
+
+    result = client.download_range(f"{testdir}/download-range-1.txt", 0, 4)
+    assert result == b"Hello"
+
+    result = client.download_range(f"{testdir}/download-range-1.txt", -6)
+    assert result == b"World!"
+
+  @staticmethod
+  def test_not_found(testdir):
+    client = Client()
+    with pytest.raises(ObjectNotFoundError):
+      client.download_range(f"{testdir}/download-range-2.txt", 0, 4)
+
+
+class TestDownloadStream:
+
+  @staticmethod
+  def test_upload_then_download(testdir):
+    client = Client()
+    client.upload_from_text(f"{testdir}/download-stream-1.txt",
+                              TEST_FILE_CONTENTS)
+
+    result = client.download_stream(f"{testdir}/download-stream-1.txt",
+                                    chunk_size=5)
+    assert b"".join(result) == bytes(TEST_FILE_CONTENTS, 'utf-8')
+
+  @staticmethod
+  def test_not_found(testdir):
+    client = Client()
+    with pytest.raises(ObjectNotFoundError):
+      client.download_stream(f"{testdir}/download-stream-2.txt")
+
+
 class TestDownloadToFilename:
 
   @staticmethod
@@ -117,6 +193,22 @@ class TestDownloadToFilename:
         contents = file.read()
         assert contents == TEST_FILE_CONTENTS
 
+  @staticmethod
+  def test_upload_then_download_sliced(testdir):
+    client = Client()
+    client.upload_from_text(f"{testdir}/download-to-filename-3.txt",
+                              TEST_FILE_CONTENTS)
+
+    tmpdir = TemporaryDirectory()
+    with tmpdir:
+      client.download_to_filename(f"{testdir}/download-to-filename-3.txt",
+                                  f"{tmpdir.name}/download-to-filename-3.txt",
+                                  slices=4,
+                                  slice_size=5)
+      with open(f"{tmpdir.name}/download-to-filename-3.txt", 'r') as file:
+        contents = file.read()
+        assert contents == TEST_FILE_CONTENTS
+
   @staticmethod
   def test_not_found(testdir):
     client = Client()
@@ -156,9 +248,33 @@ class TestList:
     client.upload_from_text(f"{testdir}/list/list-1-2.txt",
                               TEST_FILE_CONTENTS)
     objects = client.list(prefix=f"{testdir}/list")
-    assert objects == [
-        Object(name=f"{testdir}/list/list-1-1.txt"),
-        Object(name=f"{testdir}/list/list-1-2.txt")
+    assert [object.name for object in objects] == [
+        f"{testdir}/list/list-1-1.txt",
+        f"{testdir}/list/list-1-2.txt",
+    ]
+    assert objects[0].size == len(TEST_FILE_CONTENTS)
+    assert objects[0].content_type == "text/plain"
+
+
+class TestIterObjects:
+
+  @staticmethod
+  def test_upload_multiple_then_iter(testdir):
+    client = Client()
+    client.upload_from_text(f"{testdir}/iter-objects/iter-objects-1-1.txt",
+                              TEST_FILE_CONTENTS)
+    client.upload_from_text(f"{testdir}/iter-objects/iter-objects-1-2.txt",
+                              TEST_FILE_CONTENTS)
+
+    pages = list(client.iter_object_pages(
+        prefix=f"{testdir}/iter-objects", page_size=1))
+    assert len(pages) >= 2
+    assert pages[0].next_page_token is not None
+
+    objects = client.iter_objects(prefix=f"{testdir}/iter-objects",
+                                  page_token=pages[0].next_page_token)
+    assert [object.name for object in objects] == [
+        f"{testdir}/iter-objects/iter-objects-1-2.txt",
     ]
 
 
@@ -180,6 +296,46 @@ class TestUploadfromFilename:
     assert result == TEST_FILE_CONTENTS
 
 
+class TestUploadFromFile:
+
+  @staticmethod
+  def test_upload_chunked_then_download(testdir):
+    client = Client()
+    contents = bytes(TEST_FILE_CONTENTS, 'utf-8') * 30000
+    client.upload_from_file(f"{testdir}/upload-from-file-1.txt",
+                            BytesIO(contents),
+                            chunk_size=256 * 1024)
+
+    result = client.download_as_bytes(f"{testdir}/upload-from-file-1.txt")
+    assert result == contents
+
+  @staticmethod
+  def test_upload_parallel_then_download(testdir):
+    client = Client()
+    contents = bytes(TEST_FILE_CONTENTS, 'utf-8') * 40
+    client.upload_from_file(f"{testdir}/upload-from-file-2.txt",
+                            BytesIO(contents),
+                            chunk_size=12,
+                            parallelism=8)
+
+    result = client.download_as_bytes(f"{testdir}/upload-from-file-2.txt")
+    assert result == contents
+    parts = client.list(prefix=f"{testdir}/upload-from-file-2.txt.parts")
+    assert parts == []
+
+  @staticmethod
+  def test_resume_session(testdir):
+    client = Client()
+    session_url = client.create_upload_session(
+        f"{testdir}/upload-from-file-3.txt")
+    client.upload_from_file(f"{testdir}/upload-from-file-3.txt",
+                            BytesIO(bytes(TEST_FILE_CONTENTS, 'utf-8')),
+                            session_url=session_url)
+
+    result = client.download_as_text(f"{testdir}/upload-from-file-3.txt")
+    assert result == TEST_FILE_CONTENTS
+
+
 class TestUploadFromBytes:
 
   @staticmethod
@@ -193,6 +349,33 @@ class TestUploadFromBytes:
 
 
 
+class TestPreconditions:
+
+  @staticmethod
+  def test_upload_if_not_exists(testdir):
+    client = Client()
+    client.upload_from_text(f"{testdir}/preconditions-1.txt",
+                            TEST_FILE_CONTENTS,
+                            if_generation_match=0)
+
+    with pytest.raises(PreconditionFailedError):
+      client.upload_from_text(f"{testdir}/preconditions-1.txt",
+                              TEST_FILE_CONTENTS,
+                              if_generation_match=0)
+
+
+class TestRetryAndRateLimit:
+
+  @staticmethod
+  def test_upload_then_download(testdir):
+    client = Client(retry=RetryPolicy(), rate_limiter=RateLimiter(rate=5))
+    for i in range(10):
+      client.upload_from_text(f"{testdir}/retry-{i}.txt", TEST_FILE_CONTENTS)
+
+    result = client.download_as_text(f"{testdir}/retry-9.txt")
+    assert result == TEST_FILE_CONTENTS
+
+
 class TestUploadFromText:
 
   @staticmethod
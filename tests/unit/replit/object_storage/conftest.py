@@ -0,0 +1,17 @@
+import pytest
+from replit.object_storage import _shared, client
+
+from tests.fake_gcs import FakeGCS
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_state():
+  yield
+  _shared.reset()
+  client._handle_clients.clear()
+
+
+@pytest.fixture()
+def fake():
+  with FakeGCS(seed=0) as fake:
+    yield fake
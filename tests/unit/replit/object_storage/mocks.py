@@ -15,6 +15,7 @@ def build_mock_gcs_client() -> MagicMock:
     mock_blob_handle.download_to_file.return_value = None
     mock_blob_handle.download_to_filename.return_value = None
     mock_blob_handle.exists.return_value = True
+    mock_blob_handle.rewrite.return_value = (None, 10, 10)
     mock_blob_handle.upload_from_file.return_value = None
     mock_blob_handle.upload_from_filename.return_value = None
     mock_blob_handle.upload_from_text.return_value = None
@@ -22,8 +23,20 @@ def build_mock_gcs_client() -> MagicMock:
     mock_bucket_handle = MagicMock()
     mock_bucket_handle.blob.return_value = mock_blob_handle
 
+    mock_media_response = MagicMock()
+    mock_media_response.status_code = 200
+    mock_media_response.iter_content.return_value = iter(
+        [str.encode("test-"), str.encode("bytes")])
+    mock_media_response.raw.stream.side_effect = lambda *_, **__: iter(
+        [str.encode("test-"), str.encode("bytes")])
+    mock_media_response.headers = {
+        "X-Goog-Generation": "1",
+        "X-Goog-Hash": "crc32c=ZOcVfg==,md5=Sb4LC8nGWg8QWk0Uv4EuXQ==",
+    }
+
     mock_gcs_client = MagicMock()
     mock_gcs_client.bucket.return_value = mock_bucket_handle
+    mock_gcs_client._http.get.return_value = mock_media_response
 
     mock_gcs_client_constructor = MagicMock(return_value=mock_gcs_client)
     return mock_gcs_client_constructor
@@ -0,0 +1,277 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional
+from unittest.mock import MagicMock, patch
+
+import aiohttp
+import pytest
+import requests
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from google.auth import identity_pool
+from replit.object_storage import (
+    AsyncClient,
+    Object,
+    RetryPolicy,
+    async_client,
+)
+from replit.object_storage.errors import BucketNotFoundError, ObjectNotFoundError
+
+from tests.unit.replit.object_storage.mocks import (
+    build_mock_default_bucket_response,
+)
+
+
+@pytest.fixture(autouse=True)
+def credentials():
+  mock_credentials = MagicMock()
+  mock_credentials.valid = True
+  with patch.object(identity_pool,
+                    "Credentials",
+                    return_value=mock_credentials):
+    yield
+
+
+@pytest.fixture(autouse=True)
+def requests_get():
+  with patch.object(requests,
+                    "get",
+                    return_value=build_mock_default_bucket_response()):
+    yield
+
+
+def build_fake_gcs_app(objects, failures=0):
+  routes = web.RouteTableDef()
+  remaining_failures = [failures]
+
+  @web.middleware
+  async def fail_transiently(request, handler):
+    if remaining_failures[0] > 0:
+      remaining_failures[0] -= 1
+      return web.Response(status=503, headers={"Retry-After": "0"})
+    return await handler(request)
+
+  def not_found(message="No such object."):
+    return web.json_response({"error": {"code": 404, "message": message}},
+                             status=404)
+
+  @routes.get("/storage/v1/b/{bucket}/o")
+  async def list_objects(request):
+    names = sorted(name for name in objects
+                   if name.startswith(request.query.get("prefix", "")))
+    return web.json_response({
+        "items": [{
+            "name": name,
+            "size": str(len(objects[name])),
+            "generation": "1",
+            "updated": "2024-01-01T00:00:00.000Z",
+        } for name in names]
+    })
+
+  @routes.get("/storage/v1/b/{bucket}/o/{name}")
+  async def get_object(request):
+    if request.match_info["bucket"] != "bucket-id":
+      return not_found("The specified bucket does not exist.")
+    name = request.match_info["name"]
+    if name not in objects:
+      return not_found()
+    if request.query.get("alt") == "media":
+      return web.Response(body=objects[name])
+    return web.json_response({
+        "name": name,
+        "size": str(len(objects[name])),
+        "generation": "1",
+        "updated": "2024-01-01T00:00:00.000Z",
+    })
+
+  @routes.delete("/storage/v1/b/{bucket}/o/{name}")
+  async def delete_object(request):
+    if objects.pop(request.match_info["name"], None) is None:
+      return not_found()
+    return web.Response(status=204)
+
+  @routes.post("/storage/v1/b/{bucket}/o/{name}/copyTo/b/{dest_bucket}/o/{dest}")
+  async def copy_object(request):
+    name = request.match_info["name"]
+    if name not in objects:
+      return not_found()
+    objects[request.match_info["dest"]] = objects[name]
+    return web.json_response({"name": request.match_info["dest"]})
+
+  @routes.post("/upload/storage/v1/b/{bucket}/o")
+  async def upload_object(request):
+    objects[request.query["name"]] = await request.read()
+    return web.json_response({"name": request.query["name"]})
+
+  app = web.Application(middlewares=[fail_transiently])
+  app.add_routes(routes)
+  return app
+
+
+@asynccontextmanager
+async def fake_gcs(objects,
+                   bucket_id: Optional[str] = "bucket-id",
+                   failures=0,
+                   **kwargs):
+  async with TestServer(build_fake_gcs_app(objects, failures)) as server:
+    endpoint = str(server.make_url("")).rstrip("/")
+    with patch.object(async_client, "GCS_API_ENDPOINT", endpoint):
+      async with AsyncClient(bucket_id, **kwargs) as client:
+        yield client
+
+
+def run(coro):
+  return asyncio.run(coro)
+
+
+def test_default_bucket():
+  async def scenario():
+    async with fake_gcs({"object-name": b"test-bytes"}, bucket_id=None) as client:
+      return await client.exists("object-name")
+
+  assert run(scenario())
+
+
+def test_copy():
+  objects = {"object-name": b"test-bytes"}
+
+  async def scenario():
+    async with fake_gcs(objects) as client:
+      return await client.copy("object-name", "dest/object-name")
+
+  assert run(scenario()) is None
+  assert objects["dest/object-name"] == b"test-bytes"
+
+
+def test_delete_not_found():
+  async def scenario():
+    async with fake_gcs({}) as client:
+      await client.delete("object-name", ignore_not_found=True)
+      await client.delete("object-name")
+
+  with pytest.raises(ObjectNotFoundError):
+    run(scenario())
+
+
+def test_download_as_text():
+  async def scenario():
+    async with fake_gcs({"object-name": b"test-text"}) as client:
+      return await client.download_as_text("object-name")
+
+  assert run(scenario()) == "test-text"
+
+
+def test_download_bucket_not_found():
+  async def scenario():
+    async with fake_gcs({}, bucket_id="missing-bucket") as client:
+      return await client.download_as_bytes("object-name")
+
+  with pytest.raises(BucketNotFoundError):
+    run(scenario())
+
+
+def test_download_to_filename(tmp_path):
+  async def scenario():
+    async with fake_gcs({"object-name": b"test-bytes"}) as client:
+      await client.download_to_filename("object-name", str(tmp_path / "dest"))
+
+  run(scenario())
+  assert (tmp_path / "dest").read_bytes() == b"test-bytes"
+
+
+def test_download_to_filename_removes_partial_file(tmp_path):
+  async def interrupted(*_args):
+    yield b"test-"
+    raise aiohttp.ClientPayloadError("connection lost")
+
+  async def scenario():
+    async with fake_gcs({"object-name": b"test-bytes"}) as client:
+      with patch.object(aiohttp.StreamReader, "iter_chunked", interrupted):
+        await client.download_to_filename("object-name", str(tmp_path / "dest"))
+
+  with pytest.raises(aiohttp.ClientPayloadError):
+    run(scenario())
+  assert not (tmp_path / "dest").exists()
+
+
+def test_exists():
+  async def scenario():
+    async with fake_gcs({"object-name": b"test-bytes"}) as client:
+      return (await client.exists("object-name"),
+              await client.exists("missing-object"))
+
+  assert run(scenario()) == (True, False)
+
+
+def test_stat():
+  async def scenario():
+    async with fake_gcs({"object-name": b"test-bytes"}) as client:
+      obj = await client.stat("object-name")
+      with pytest.raises(ObjectNotFoundError):
+        await client.stat("missing-object")
+      return obj
+
+  obj = run(scenario())
+  assert (obj.name, obj.size, obj.generation) == ("object-name", 10, 1)
+
+
+def test_list():
+  async def scenario():
+    async with fake_gcs({"a/1": b"", "a/2": b"", "b/1": b""}) as client:
+      return await client.list(prefix="a/")
+
+  result = run(scenario())
+  assert [object.name for object in result] == ["a/1", "a/2"]
+  assert result[0] == Object(name="a/1",
+                             size=0,
+                             generation=1,
+                             updated=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+def test_retry():
+  policy = RetryPolicy(initial_backoff=0)
+
+  async def scenario():
+    async with fake_gcs({"object-name": b"test-text"}, failures=2,
+                        retry=policy) as client:
+      return await client.download_as_text("object-name")
+
+  assert run(scenario()) == "test-text"
+
+
+def test_upload_from_filename(tmp_path):
+  (tmp_path / "src.txt").write_bytes(b"test-bytes")
+  objects = {}
+  threads = []
+  builtin_open = open
+
+  def recording_open(*args):
+    threads.append(threading.current_thread())
+    return builtin_open(*args)
+
+  async def scenario():
+    async with fake_gcs(objects) as client:
+      with patch.object(async_client, "open", recording_open, create=True):
+        await client.upload_from_filename("object-name",
+                                          str(tmp_path / "src.txt"))
+
+  run(scenario())
+  assert objects["object-name"] == b"test-bytes"
+  # The file is opened off the event loop's thread.
+  assert threads
+  assert threading.main_thread() not in threads
+
+
+def test_upload_concurrently():
+  objects = {}
+
+  async def scenario():
+    async with fake_gcs(objects) as client:
+      await asyncio.gather(*(client.upload_from_text(f"object-{i}", f"text-{i}")
+                             for i in range(20)))
+
+  run(scenario())
+  assert objects["object-7"] == b"text-7"
+  assert len(objects) == 20
@@ -0,0 +1,168 @@
+import io
+import os
+import pickle
+
+import pytest
+from replit.object_storage import (
+  Client,
+  ClientPool,
+  FilesystemBackend,
+  MemoryBackend,
+)
+from replit.object_storage.errors import (
+  BucketNotFoundError,
+  NotModifiedError,
+  ObjectNotFoundError,
+  PreconditionFailedError,
+)
+
+
+@pytest.fixture(params=["memory", "filesystem"])
+def backend(request, tmp_path):
+  if request.param == "memory":
+    return MemoryBackend()
+  return FilesystemBackend(str(tmp_path / "storage"))
+
+
+def test_round_trip(backend):
+  client = Client(backend=backend)
+  client.upload_from_text("dir/object-name", "test-text")
+  client.upload_from_bytes("empty", b"")
+
+  assert client.download_as_text("dir/object-name") == "test-text"
+  assert client.download_as_bytes("empty") == b""
+  assert client.download_range("dir/object-name", 5, 8) == b"text"
+  assert client.exists("dir/object-name")
+  client.delete("dir/object-name")
+  assert not client.exists("dir/object-name")
+  with pytest.raises(ObjectNotFoundError):
+    client.download_as_bytes("dir/object-name")
+  with pytest.raises(ObjectNotFoundError):
+    client.delete("dir/object-name")
+
+
+def test_large_objects(backend, tmp_path):
+  client = Client(backend=backend)
+  data = os.urandom(3 * 1024 * 1024)
+  source = tmp_path / "source"
+  source.write_bytes(data)
+
+  client.upload_from_file("streamed", io.BytesIO(data), chunk_size=1024 * 1024)
+  client.upload_from_filename("parallel",
+                              str(source),
+                              chunk_size=1024 * 1024,
+                              parallelism=2)
+  client.download_to_filename("parallel",
+                              str(tmp_path / "dest"),
+                              slices=3,
+                              slice_size=1024 * 1024)
+
+  assert client.download_as_bytes("streamed") == data
+  assert (tmp_path / "dest").read_bytes() == data
+
+
+def test_listing(backend):
+  client = Client(backend=backend)
+  names = ["b/2.txt", "a.txt", "b/1.txt", "b/1.csv", "c/3.txt"]
+  for name in names:
+    client.upload_from_bytes(name, b"data")
+
+  assert [obj.name for obj in client.list()] == sorted(names)
+  assert [obj.name for obj in client.list(prefix="b/")
+         ] == ["b/1.csv", "b/1.txt", "b/2.txt"]
+  assert [
+      obj.name for obj in client.list(start_offset="b/1.txt", end_offset="c")
+  ] == ["b/1.txt", "b/2.txt"]
+  assert [obj.name for obj in client.list(match_glob="**/*.txt")
+         ] == ["b/1.txt", "b/2.txt", "c/3.txt"]
+  assert [len(page.objects) for page in client.iter_object_pages(page_size=2)
+         ] == [2, 2, 1]
+  assert client.list_directory().prefixes == ["b/", "c/"]
+
+
+def test_generations_and_preconditions(backend):
+  client = Client(backend=backend)
+  client.upload_from_bytes("object-name", b"first")
+  generation = client.list()[0].generation
+
+  with pytest.raises(PreconditionFailedError):
+    client.upload_from_bytes("object-name", b"second", if_generation_match=0)
+  client.upload_from_bytes("object-name",
+                           b"second",
+                           if_generation_match=generation)
+  new_generation = client.list()[0].generation
+
+  assert generation is not None and new_generation is not None
+  assert new_generation > generation
+  assert client.download_if_changed("object-name", generation) == (
+      b"second", new_generation)
+  with pytest.raises(NotModifiedError):
+    client.download_as_bytes("object-name",
+                             if_generation_not_match=new_generation)
+
+
+def test_copy_and_compose(backend):
+  client = Client(backend=backend)
+  client.upload_from_bytes("first", b"first,")
+  client.upload_from_bytes("second", b"second")
+
+  client.copy("first", "copy")
+  client.compose(["first", "second", "copy"], "composed")
+
+  assert client.download_as_bytes("copy") == b"first,"
+  assert client.download_as_bytes("composed") == b"first,secondfirst,"
+
+
+def test_buckets(backend):
+  backend.create_bucket("other")
+  Client("other", backend=backend).upload_from_bytes("object-name", b"other")
+  pool = ClientPool(backend=backend)
+
+  assert pool.client("other").download_as_bytes("object-name") == b"other"
+  assert not Client(backend=backend).exists("object-name")
+  with pytest.raises(BucketNotFoundError):
+    Client("missing", backend=backend).upload_from_bytes("object-name", b"")
+
+
+def test_clients_share_backends():
+  backend = MemoryBackend()
+  Client(backend=backend).upload_from_bytes("object-name", b"data")
+
+  assert Client(backend=backend).download_as_bytes("object-name") == b"data"
+  assert not Client(backend=MemoryBackend()).exists("object-name")
+
+
+def test_filesystem_backend_persists(tmp_path):
+  root = str(tmp_path / "storage")
+  long_name = "dir/" + "x" * 300
+  client = Client(backend=FilesystemBackend(root))
+  client.upload_from_bytes("dir/object-name", b"data")
+  client.upload_from_bytes(long_name, b"long")
+  generation = client.list()[0].generation
+
+  client = Client(backend=FilesystemBackend(root))
+  objects = client.list()
+
+  assert [obj.name for obj in objects] == ["dir/object-name", long_name]
+  assert objects[0].generation == generation
+  assert objects[0].size == 4
+  assert client.download_as_bytes(long_name) == b"long"
+  assert (tmp_path / "storage" / "default" / "objects" /
+          "dir%2Fobject-name").read_bytes() == b"data"
+
+
+def test_filesystem_backend_rejects_unsafe_bucket_ids(tmp_path):
+  backend = FilesystemBackend(str(tmp_path))
+
+  with pytest.raises(ValueError, match="invalid bucket ID"):
+    backend.create_bucket("../escape")
+  assert not backend.has_bucket("..")
+
+
+def test_handles_keep_their_backend(tmp_path):
+  backend = FilesystemBackend(str(tmp_path))
+  Client(backend=backend).upload_from_bytes("object-name", b"data")
+
+  handle = pickle.loads(pickle.dumps(Client(backend=backend).handle()))
+
+  assert handle.client().download_as_bytes("object-name") == b"data"
@@ -0,0 +1,98 @@
+import array
+import mmap
+import os
+
+import pytest
+from replit.object_storage import Client, ObjectCache
+from replit.object_storage.client import DEFAULT_UPLOAD_CHUNK_SIZE
+from replit.object_storage.errors import ObjectNotFoundError
+
+
+@pytest.fixture()
+def client(request):
+  request.getfixturevalue("fake")
+  return Client()
+
+
+def test_upload_from_buffers(client, fake):
+  data = os.urandom(1024)
+
+  client.upload_from_bytes("bytearray", bytearray(data))
+  client.upload_from_bytes("memoryview", memoryview(data)[512:])
+  client.upload_from_bytes("array", array.array("I", data))
+
+  assert fake.object("bytearray").data == data
+  assert fake.object("memoryview").data == data[512:]
+  assert fake.object("array").data == data
+  assert fake.requests["upload_chunk"] == 0
+
+
+def test_upload_from_large_buffer_in_chunks(client, fake, tmp_path):
+  data = os.urandom(1024) * (DEFAULT_UPLOAD_CHUNK_SIZE // 1024 + 1)
+  path = tmp_path / "data"
+  path.write_bytes(data)
+
+  with open(path, "rb") as file, mmap.mmap(file.fileno(), 0,
+                                            access=mmap.ACCESS_READ) as mapped:
+    client.upload_from_bytes("object-name", mapped)
+
+  assert fake.object("object-name").data == data
+  # The session's committed offset is queried, then two chunks are sent.
+  assert fake.requests["upload_chunk"] == 3
+
+
+def test_download_into(client):
+  client.upload_from_bytes("object-name", b"0123456789")
+  buffer = bytearray(b"-" * 16)
+
+  assert client.download_into("object-name", buffer) == 10
+  assert client.download_into("object-name", memoryview(buffer)[4:], offset=2) == 10
+  assert buffer == b"0123450123456789"
+
+
+def test_download_into_mmap(client, tmp_path):
+  client.upload_from_bytes("object-name", b"0123456789")
+  path = tmp_path / "data"
+  path.write_bytes(bytes(12))
+
+  with open(path, "r+b") as file, mmap.mmap(file.fileno(), 0) as mapped:
+    assert client.download_into("object-name", mapped, offset=2) == 10
+
+  assert path.read_bytes() == b"\0\x000123456789"
+
+
+def test_download_into_compressed(fake):
+  Client(compression="gzip").upload_from_bytes("object-name", b"data" * 100)
+  buffer = bytearray(400)
+
+  assert Client().download_into("object-name", buffer) == 400
+  assert buffer == b"data" * 100
+  with pytest.raises(ValueError, match="do not fit"):
+    Client().download_into("object-name", bytearray(399))
+  assert fake.object("object-name").content_encoding == "gzip"
+
+
+@pytest.mark.usefixtures("fake")
+def test_download_into_cached():
+  client = Client(cache=ObjectCache())
+  client.upload_from_bytes("object-name", b"data")
+  buffer = bytearray(4)
+
+  assert client.download_into("object-name", buffer) == 4
+  assert client.download_into("object-name", buffer) == 4
+  assert buffer == b"data"
+  with pytest.raises(ValueError, match="do not fit"):
+    client.download_into("object-name", buffer, offset=1)
+
+
+def test_download_into_errors(client):
+  client.upload_from_bytes("object-name", b"0123456789")
+
+  with pytest.raises(ValueError, match="do not fit"):
+    client.download_into("object-name", bytearray(9))
+  with pytest.raises(ValueError, match="offset"):
+    client.download_into("object-name", bytearray(10), offset=11)
+  with pytest.raises(TypeError, match="writable"):
+    client.download_into("object-name", bytes(10))
+  with pytest.raises(ObjectNotFoundError):
+    client.download_into("missing", bytearray(10))
@@ -0,0 +1,124 @@
+import builtins
+import os
+import threading
+from unittest.mock import patch
+
+from replit.object_storage import CacheStats, ObjectCache, cache
+
+
+def test_store_then_lookup():
+  cache = ObjectCache()
+  assert cache._lookup("bucket-id/object-name") is None
+
+  cache._store("bucket-id/object-name", 1, b"test-bytes")
+  assert cache._lookup("bucket-id/object-name") == (1, b"test-bytes", False)
+  assert cache.stats() == CacheStats(misses=1, memory_bytes=10)
+
+
+def test_revalidate_after():
+  cache = ObjectCache(revalidate_after=60)
+  cache._store("bucket-id/object-name", 1, b"test-bytes")
+
+  assert cache._lookup("bucket-id/object-name") == (1, b"test-bytes", True)
+
+
+def test_memory_eviction():
+  cache = ObjectCache(max_memory_bytes=20)
+  cache._store("bucket-id/object-1", 1, b"x" * 10)
+  cache._store("bucket-id/object-2", 1, b"x" * 10)
+  cache._lookup("bucket-id/object-1")
+  cache._store("bucket-id/object-3", 1, b"x" * 10)
+
+  assert cache._lookup("bucket-id/object-2") is None
+  assert cache._lookup("bucket-id/object-1") is not None
+  assert cache.stats().evictions == 1
+  assert cache.stats().memory_bytes == 20
+
+
+def test_oversized_entries_are_not_held():
+  cache = ObjectCache(max_memory_bytes=5)
+  cache._store("bucket-id/object-name", 1, b"test-bytes")
+
+  assert cache._lookup("bucket-id/object-name") is None
+  assert cache.stats().evictions == 0
+
+
+def test_disk_tier(tmp_path):
+  cache = ObjectCache(max_memory_bytes=0, directory=str(tmp_path))
+  cache._store("bucket-id/object-name", 1, b"test-bytes")
+  cache._store("bucket-id/object-name", 2, b"new-bytes")
+  assert len(list(tmp_path.iterdir())) == 1
+
+  reopened = ObjectCache(directory=str(tmp_path))
+  assert reopened._lookup("bucket-id/object-name") == (2, b"new-bytes", False)
+  assert reopened.stats().disk_bytes == 9
+
+
+def test_disk_eviction(tmp_path):
+  cache = ObjectCache(directory=str(tmp_path), max_disk_bytes=20)
+  cache._store("bucket-id/object-1", 1, b"x" * 10)
+  cache._store("bucket-id/object-2", 1, b"x" * 10)
+  cache._store("bucket-id/object-3", 1, b"x" * 10)
+
+  assert cache.stats().disk_bytes == 20
+  assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_disk_eviction_on_load(tmp_path):
+  object_cache = ObjectCache(directory=str(tmp_path), max_disk_bytes=40)
+  for i in range(3):
+    object_cache._store(f"bucket-id/object-{i}", 1, b"x" * 10)
+  for i, path in enumerate(sorted(tmp_path.iterdir(), key=os.path.getmtime)):
+    os.utime(path, (i, i))
+
+  reopened = ObjectCache(directory=str(tmp_path), max_disk_bytes=20)
+  assert reopened.stats() == CacheStats(evictions=1, disk_bytes=20)
+  assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_disk_writes_do_not_hold_lock(tmp_path):
+  object_cache = ObjectCache(directory=str(tmp_path))
+  object_cache._store("bucket-id/object-1", 1, b"test-bytes")
+  writing = threading.Event()
+  resume = threading.Event()
+
+  def slow_open(path, *args, **kwargs):
+    if path.endswith(".tmp"):
+      writing.set()
+      resume.wait(5)
+    return builtins.open(path, *args, **kwargs)
+
+  with patch.object(cache, "open", slow_open, create=True):
+    store = threading.Thread(target=object_cache._store,
+                             args=("bucket-id/object-2", 1, b"test-bytes"))
+    store.start()
+    assert writing.wait(5)
+    # Neither lookups nor invalidations wait for the write to finish.
+    assert object_cache._lookup("bucket-id/object-1") is not None
+    object_cache._invalidate("bucket-id/object-2")
+    resume.set()
+    store.join()
+
+  # The invalidated write is discarded rather than indexed.
+  assert object_cache._lookup("bucket-id/object-2") is None
+  assert object_cache.stats().disk_bytes == 10
+  assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_invalidate(tmp_path):
+  cache = ObjectCache(directory=str(tmp_path))
+  cache._store("bucket-id/object-name", 1, b"test-bytes")
+  cache._invalidate("bucket-id/object-name")
+
+  assert cache._lookup("bucket-id/object-name") is None
+  assert list(tmp_path.iterdir()) == []
+
+
+def test_clear(tmp_path):
+  cache = ObjectCache(directory=str(tmp_path))
+  cache._store("bucket-id/object-1", 1, b"test-bytes")
+  cache._store("bucket-id/object-2", 1, b"test-bytes")
+  cache.clear()
+
+  assert cache.stats() == CacheStats(misses=2)
+  assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,174 @@
+import os
+
+import google_crc32c
+import pytest
+import requests
+from replit.object_storage import Client, ObjectCache
+from replit.object_storage._checksum import (
+  Hasher,
+  crc32c_combine,
+  crc32c_from_base64,
+  hash_from_header,
+)
+from replit.object_storage.errors import ChecksumMismatchError
+
+DATA = os.urandom(64 * 1024)
+
+
+@pytest.mark.parametrize("first,second", [
+    (b"", b""),
+    (b"test-", b""),
+    (b"", b"bytes"),
+    (b"test-", b"bytes"),
+    (os.urandom(1000), os.urandom(12345)),
+])
+def test_crc32c_combine(first, second):
+  result = crc32c_combine(google_crc32c.value(first),
+                          google_crc32c.value(second),
+                          len(second))
+  assert result == google_crc32c.value(first + second)
+
+
+def test_crc32c_from_base64():
+  assert crc32c_from_base64("ZOcVfg==") == google_crc32c.value(b"test-bytes")
+
+
+def test_hash_from_header():
+  header = "crc32c=ZOcVfg==, md5=Sb4LC8nGWg8QWk0Uv4EuXQ=="
+  assert hash_from_header(header, "crc32c") == "ZOcVfg=="
+  assert hash_from_header(header, "md5") == "Sb4LC8nGWg8QWk0Uv4EuXQ=="
+  assert hash_from_header("crc32c=ZOcVfg==", "md5") is None
+  assert hash_from_header(None, "crc32c") is None
+
+
+def test_hasher():
+  crc32c = Hasher("crc32c")
+  md5 = Hasher("md5")
+  for hasher in (crc32c, md5):
+    hasher.update(b"test-")
+    hasher.update(b"bytes")
+
+  assert crc32c.digest() == "ZOcVfg=="
+  assert md5.digest() == "Sb4LC8nGWg8QWk0Uv4EuXQ=="
+  with pytest.raises(ValueError):
+    Hasher("sha1")
+
+
+@pytest.mark.parametrize("checksum", ["crc32c", "md5", None])
+def test_downloads_are_verified(fake, tmp_path, checksum):
+  client = Client(checksum=checksum)
+  client.upload_from_bytes("object-name", DATA)
+  stored = fake.object("object-name")
+  expected = {"crc32c": stored.crc32c, "md5": stored.md5}
+
+  assert client.download_as_bytes("object-name") == DATA
+  assert b"".join(client.download_stream("object-name")) == DATA
+  assert client.download_into("object-name", bytearray(len(DATA))) == len(DATA)
+  digests = client.download_to_filename("object-name", str(tmp_path / "dest"))
+  assert digests == ({checksum: expected[checksum]} if checksum else {})
+  assert (tmp_path / "dest").read_bytes() == DATA
+
+
+@pytest.mark.parametrize("checksum", ["crc32c", "md5"])
+def test_corrupt_downloads_raise(fake, tmp_path, checksum):
+  client = Client()
+  client.upload_from_bytes("object-name", DATA)
+  setattr(fake.object("object-name"), checksum, "AAAAAA==")
+
+  with pytest.raises(ChecksumMismatchError):
+    client.download_as_bytes("object-name", checksum=checksum)
+  with pytest.raises(ChecksumMismatchError):
+    b"".join(client.download_stream("object-name", checksum=checksum))
+  with pytest.raises(ChecksumMismatchError):
+    client.download_into("object-name",
+                         bytearray(len(DATA)),
+                         checksum=checksum)
+  with pytest.raises(ChecksumMismatchError):
+    client.download_to_filename("object-name",
+                                str(tmp_path / "dest"),
+                                checksum=checksum)
+  assert not (tmp_path / "dest").exists()
+  # Verification can be skipped for a single call.
+  assert client.download_as_bytes("object-name", checksum=None) == DATA
+
+
+def test_cached_downloads_use_checksum_per_call(fake):
+  client = Client(cache=ObjectCache())
+  client.upload_from_bytes("object-name", DATA)
+  fake.object("object-name").md5 = "AAAAAA=="
+
+  with pytest.raises(ChecksumMismatchError):
+    client.download_as_bytes("object-name", checksum="md5")
+  with pytest.raises(ChecksumMismatchError):
+    client.download_as_text("object-name", checksum="md5")
+  with pytest.raises(ChecksumMismatchError):
+    client.download_into("object-name", bytearray(len(DATA)), checksum="md5")
+  assert client.download_as_bytes("object-name") == DATA
+
+  # A changed object is fetched again, and verified as the call asks.
+  fake.put_object("object-name", DATA[::-1])
+  fake.object("object-name").crc32c = "AAAAAA=="
+  with pytest.raises(ChecksumMismatchError):
+    client.download_as_bytes("object-name")
+  assert client.download_as_bytes("object-name", checksum=None) == DATA[::-1]
+
+
+def test_sliced_downloads_use_crc32c(fake, tmp_path):
+  client = Client(checksum="md5")
+  client.upload_from_bytes("object-name", DATA)
+
+  digests = client.download_to_filename("object-name",
+                                        str(tmp_path / "dest"),
+                                        slices=4,
+                                        slice_size=16 * 1024)
+
+  assert digests == {"crc32c": fake.object("object-name").crc32c}
+  assert (tmp_path / "dest").read_bytes() == DATA
+
+
+def test_unknown_checksum():
+  with pytest.raises(ValueError, match="unsupported checksum"):
+    Client(checksum="sha1")
+
+
+@pytest.fixture()
+def no_sleep(monkeypatch):
+  monkeypatch.setattr("replit.object_storage.client.time.sleep",
+                      lambda _seconds: None)
+
+
+@pytest.mark.usefixtures("no_sleep")
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_dropped_downloads_resume(fake, tmp_path, compression):
+  client = Client(compression=compression)
+  data = os.urandom(3 * 1024 * 1024)
+  client.upload_from_bytes("object-name", data)
+  path = tmp_path / "object-name"
+
+  fake.drop_next_download(after=1024 * 1024)
+  digests = client.download_to_filename("object-name", str(path))
+  fake.drop_next_download(after=1024 * 1024)
+  buffer = bytearray(len(data))
+  size = client.download_into("object-name", buffer)
+  fake.drop_next_download(after=100, times=2)
+  streamed = b"".join(client.download_stream("object-name"))
+
+  assert path.read_bytes() == data
+  assert digests == {"crc32c": fake.object("object-name").crc32c}
+  assert bytes(buffer[:size]) == data
+  assert streamed == data
+  assert fake.requests["download_object"] == 7
+
+
+@pytest.mark.usefixtures("no_sleep")
+def test_dropped_downloads_give_up(fake, tmp_path):
+  client = Client(compression="gzip")
+  client.upload_from_bytes("object-name", DATA)
+  path = tmp_path / "object-name"
+
+  fake.drop_next_download(after=0, times=10)
+  with pytest.raises(requests.ConnectionError):
+    client.download_to_filename("object-name", str(path))
+  with pytest.raises(requests.ConnectionError):
+    client.download_as_bytes("object-name")
+  assert not path.exists()
@@ -1,13 +1,39 @@
+import io
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from typing import cast
 from unittest.mock import MagicMock, patch
 
 import pytest
 import requests
 from google.cloud import storage
-from replit.object_storage import Client, DefaultBucketError
+from google.cloud.exceptions import NotFound, PreconditionFailed
+from replit.object_storage import (
+  Client,
+  ClientHandle,
+  DefaultBucketError,
+  Object,
+  ObjectCache,
+  PoolStats,
+  RetryPolicy,
+  TransportOptions,
+  _resumable,
+  _shared,
+)
+from replit.object_storage.errors import (
+  BucketNotFoundError,
+  ChecksumMismatchError,
+  NotModifiedError,
+  ObjectNotFoundError,
+  PreconditionFailedError,
+)
 
 from tests.unit.replit.object_storage.mocks import (
-    build_mock_default_bucket_response,
-    build_mock_gcs_client,
+  build_mock_default_bucket_response,
+  build_mock_gcs_client,
 )
 
 
@@ -25,6 +51,22 @@ def requests_get():
     yield
 
 
+def gcs_client_mock() -> MagicMock:
+  # The client which the patched storage.Client returns, typed as a mock.
+  return cast(MagicMock, storage.Client).return_value
+
+
+def error_response(status_code: int, message: str) -> MagicMock:
+  response = MagicMock(status_code=status_code)
+  response.json.return_value = {
+      "error": {
+          "code": status_code,
+          "message": message
+      }
+  }
+  return response
+
+
 def test_get_default_bucket_success():
   result = Client().exists("object-name")
   assert result
@@ -67,13 +109,235 @@ def test_download_as_bytes():
 
 def test_download_as_text():
   result = Client("bucket-id").download_as_text("object-name")
-  assert result == "test-text"
+  # Text is decoded from the bytes downloaded, which are verified as they are.
+  assert result == "test-bytes"
 
 
-def test_download_to_filename():
-  result = Client("bucket-id").download_to_filename("object-name",
-                                                    "dest-filename")
-  assert result is None
+def test_download_as_bytes_cached():
+  http = gcs_client_mock()._http
+  cache = ObjectCache()
+  client = Client("bucket-id", cache=cache)
+
+  assert client.download_as_bytes("object-name") == str.encode("test-bytes")
+  assert cache.stats().misses == 1
+
+  http.get.return_value = error_response(304, "Not modified")
+  assert client.download_as_text("object-name") == "test-bytes"
+  assert cache.stats().hits == 1
+  assert http.get.call_args.kwargs["params"] == {
+      "alt": "media",
+      "ifGenerationNotMatch": 1,
+  }
+
+
+def test_download_as_bytes_cached_invalidated_by_writes():
+  cache = ObjectCache(revalidate_after=60)
+  client = Client("bucket-id", cache=cache)
+
+  client.download_as_bytes("object-name")
+  client.download_as_bytes("object-name")
+  assert cache.stats().hits == 1
+
+  client.upload_from_text("object-name", "src-text")
+  client.download_as_bytes("object-name")
+  assert cache.stats().misses == 2
+
+  client.delete("object-name")
+  assert cache.stats().memory_bytes == 0
+
+
+def test_download_as_bytes_preconditions():
+  http = gcs_client_mock()._http
+  cache = ObjectCache()
+  client = Client("bucket-id", cache=cache)
+
+  client.download_as_bytes("object-name", if_generation_match=2)
+  assert http.get.call_args.kwargs["params"]["ifGenerationMatch"] == 2
+  assert cache.stats().misses == 0
+
+  http.get.return_value = error_response(412, "Precondition failed")
+  with pytest.raises(PreconditionFailedError):
+    client.download_as_bytes("object-name", if_generation_match=3)
+
+  http.get.return_value = error_response(304, "Not modified")
+  with pytest.raises(NotModifiedError):
+    client.download_as_bytes("object-name", if_generation_not_match=1)
+
+
+def test_download_if_changed():
+  http = gcs_client_mock()._http
+  http.get.return_value.headers["X-Goog-Generation"] = "2"
+  client = Client("bucket-id")
+
+  assert client.download_if_changed("object-name", 1) == (b"test-bytes", 2)
+  assert http.get.call_args.kwargs["params"] == {
+      "alt": "media",
+      "ifGenerationNotMatch": 1,
+  }
+
+  http.get.return_value = error_response(304, "Not modified")
+  assert client.download_if_changed("object-name", 2) is None
+
+
+def test_download_range():
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  result = Client("bucket-id").download_range("object-name", 0, 4)
+  assert result == str.encode("test-bytes")
+  assert blob.download_as_bytes.call_args.kwargs["start"] == 0
+  assert blob.download_as_bytes.call_args.kwargs["end"] == 4
+
+
+def test_download_range_negative_start():
+  with pytest.raises(ValueError):
+    Client("bucket-id").download_range("object-name", -4, 10)
+
+
+def test_download_stream():
+  client = Client("bucket-id")
+  result = client.download_stream("object-name", chunk_size=5, start=-10)
+  assert list(result) == [str.encode("test-"), str.encode("bytes")]
+
+  http = gcs_client_mock()._http
+  assert http.get.call_args.kwargs["headers"] == {"Range": "bytes=-10"}
+  assert http.get.call_args.kwargs["stream"]
+
+
+@patch("time.sleep")
+def test_download_stream_retries_transient_errors(_):
+  http = gcs_client_mock()._http
+  unavailable = MagicMock(status_code=503)
+  unavailable.json.return_value = {"error": {"message": "Try again."}}
+  http.get.side_effect = [unavailable, http.get.return_value]
+
+  result = Client("bucket-id").download_stream("object-name")
+  assert list(result) == [str.encode("test-"), str.encode("bytes")]
+  assert http.get.call_count == 2
+
+
+def test_download_stream_preconditions():
+  client = Client("bucket-id")
+  list(client.download_stream("object-name", if_metageneration_match=3))
+
+  http = gcs_client_mock()._http
+  assert http.get.call_args.kwargs["params"] == {
+      "alt": "media",
+      "ifMetagenerationMatch": 3,
+  }
+
+
+def test_download_stream_not_found():
+  http = gcs_client_mock()._http
+  http.get.return_value.status_code = 404
+  http.get.return_value.json.return_value = {
+      "error": {"code": 404, "message": "No such object"}
+  }
+
+  with pytest.raises(ObjectNotFoundError):
+    Client("bucket-id").download_stream("object-name")
+
+
+def test_download_to_filename(tmp_path):
+  path = tmp_path / "dest-filename"
+
+  assert Client("bucket-id").download_to_filename(
+      "object-name", str(path), checksum="md5") == {
+          "md5": "Sb4LC8nGWg8QWk0Uv4EuXQ=="
+      }
+  assert Client("bucket-id", checksum=None).download_to_filename(
+      "object-name", str(path)) == {}
+  assert path.read_bytes() == b"test-bytes"
+
+
+def test_download_to_filename_checksum_mismatch(tmp_path):
+  http = gcs_client_mock()._http
+  http.get.return_value.headers["X-Goog-Hash"] = "crc32c=AAAAAA=="
+  path = tmp_path / "dest-filename"
+
+  with pytest.raises(ChecksumMismatchError):
+    Client("bucket-id").download_to_filename("object-name",
+                                             str(path),
+                                             checksum="crc32c")
+  assert not path.exists()
+
+
+def build_mock_resumable_response(committed_end, status_code=308):
+  response = MagicMock()
+  response.status_code = status_code
+  response.headers = {}
+  if committed_end is not None:
+    response.headers["Range"] = f"bytes=0-{committed_end}"
+  return response
+
+
+def build_mock_sliced_download(contents: bytes, crc32c: str) -> None:
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  blob.size = len(contents)
+  blob.generation = 1
+  blob.crc32c = crc32c
+  blob.content_encoding = None
+
+  def get(*_, headers, **_kwargs):
+    response = MagicMock()
+    response.status_code = 200
+    if "Range" not in headers:
+      response.headers = {"X-Goog-Hash": f"crc32c={crc32c}"}
+      response.raw.stream.return_value = [contents]
+      return response
+    start, end = headers["Range"][len("bytes="):].split("-")
+    response.iter_content.return_value = [contents[int(start):int(end) + 1]]
+    return response
+
+  gcs_client_mock()._http.get.side_effect = get
+
+
+def test_download_to_filename_sliced(tmp_path):
+  contents = str.encode("test-bytes")
+  build_mock_sliced_download(contents, "ZOcVfg==")
+
+  assert Client("bucket-id").download_to_filename(
+      "object-name",
+      str(tmp_path / "dest-filename"),
+      slices=4,
+      slice_size=3,
+      checksum="md5",
+  ) == {"crc32c": "ZOcVfg=="}
+  assert (tmp_path / "dest-filename").read_bytes() == contents
+
+  ranges = [call.kwargs["headers"]["Range"]
+            for call in gcs_client_mock()._http.get.call_args_list]
+  assert sorted(ranges) == ["bytes=0-2", "bytes=3-5", "bytes=6-8", "bytes=9-9"]
+
+
+def test_download_to_filename_sliced_checksum_mismatch(tmp_path):
+  build_mock_sliced_download(str.encode("test-bytes"), "AAAAAA==")
+
+  with pytest.raises(ChecksumMismatchError):
+    Client("bucket-id").download_to_filename("object-name",
+                                             str(tmp_path / "dest-filename"),
+                                             slices=4,
+                                             slice_size=3)
+  assert not (tmp_path / "dest-filename").exists()
+
+
+def test_download_to_filename_sliced_encoded_object(tmp_path):
+  build_mock_sliced_download(str.encode("test-bytes"), "ZOcVfg==")
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  blob.content_encoding = "gzip"
+
+  Client("bucket-id").download_to_filename("object-name",
+                                           str(tmp_path / "dest-filename"),
+                                           slices=4,
+                                           slice_size=3)
+  gcs_client_mock()._http.get.assert_called_once()
+  assert gcs_client_mock()._http.get.call_args.kwargs["headers"] == {}
+
+
+def test_download_to_filename_invalid_slice_size(tmp_path):
+  with pytest.raises(ValueError):
+    Client("bucket-id").download_to_filename("object-name",
+                                             str(tmp_path / "dest-filename"),
+                                             slices=4,
+                                             slice_size=0)
 
 
 def test_exists():
@@ -82,6 +346,79 @@ def test_exists():
   assert result
 
 
+class FakePage(list):
+  prefixes = ()
+
+
+class FakeBlobIterator:
+
+  def __init__(self, pages):
+    self.next_page_token = None
+    self.__pages = pages
+
+  @property
+  def pages(self):
+    for i, page in enumerate(self.__pages):
+      self.next_page_token = f"token-{i + 1}" if i + 1 < len(self.__pages) else None
+      yield FakePage(page)
+
+
+def build_mock_blob(name):
+  blob = MagicMock()
+  blob.name = name
+  blob.size = 10
+  blob.generation = 1
+  blob.etag = "etag"
+  blob.content_type = "text/plain"
+  blob.updated = None
+  blob.crc32c = "AAAAAA=="
+  return blob
+
+
+def test_iter_object_pages():
+  bucket = gcs_client_mock().bucket("bucket-id")
+  bucket.list_blobs.return_value = FakeBlobIterator([
+      [build_mock_blob("object-1"), build_mock_blob("object-2")],
+      [build_mock_blob("object-3")],
+  ])
+
+  result = Client("bucket-id").iter_object_pages(page_size=2,
+                                                 page_token="token-0")
+  pages = list(result)
+  assert [page.next_page_token for page in pages] == ["token-1", None]
+  assert pages[1].objects == [
+      Object(name="object-3",
+             size=10,
+             generation=1,
+             etag="etag",
+             content_type="text/plain",
+             crc32c="AAAAAA==")
+  ]
+  assert bucket.list_blobs.call_args.kwargs["page_token"] == "token-0"
+
+
+def test_iter_objects():
+  bucket = gcs_client_mock().bucket("bucket-id")
+  bucket.list_blobs.return_value = FakeBlobIterator([
+      [build_mock_blob("object-1"), build_mock_blob("object-2")],
+      [build_mock_blob("object-3")],
+  ])
+
+  result = Client("bucket-id").iter_objects(prefix="object-")
+  assert [object.name for object in result] == [
+      "object-1", "object-2", "object-3"
+  ]
+
+
+def test_iter_objects_bucket_not_found():
+  bucket = gcs_client_mock().bucket("bucket-id")
+  bucket.list_blobs.side_effect = NotFound("The specified bucket does not exist.")
+
+  result = Client("bucket-id").iter_objects()
+  with pytest.raises(BucketNotFoundError):
+    next(result)
+
+
 def test_list():
   result = Client("bucket-id").list("object-name")
   assert isinstance(result, list)
@@ -93,12 +430,235 @@ def test_upload_from_filename():
   assert result is None
 
 
+def test_upload_from_filename_parallel(tmp_path):
+  (tmp_path / "src-filename").write_bytes(str.encode("test-bytes"))
+  Client("bucket-id").upload_from_filename("object-name",
+                                           str(tmp_path / "src-filename"),
+                                           chunk_size=4,
+                                           parallelism=2)
+
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  uploaded = sorted(call.args[0]
+                    for call in blob.upload_from_string.call_args_list)
+  assert uploaded == [str.encode("-byt"), str.encode("es"), str.encode("test")]
+  assert len(blob.compose.call_args.args[0]) == 3
+  assert blob.delete.call_count == 3
+
+
+def test_upload_from_file():
+  result = Client("bucket-id").upload_from_file("object-name",
+                                                io.BytesIO(b"src-bytes"))
+  assert result is None
+
+
+def test_upload_from_file_parallel_compose_tree():
+  Client("bucket-id").upload_from_file("object-name",
+                                       io.BytesIO(b"x" * 40),
+                                       chunk_size=1,
+                                       parallelism=8)
+
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  assert [len(call.args[0]) for call in blob.compose.call_args_list] == [32, 8, 2]
+  assert blob.delete.call_count == 42
+
+
+def test_upload_from_file_parallel_compose_failure_cleans_up():
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  blob.compose.side_effect = [None, None, PreconditionFailed("changed")]
+
+  with pytest.raises(PreconditionFailedError):
+    Client("bucket-id").upload_from_file("object-name",
+                                         io.BytesIO(b"x" * 40),
+                                         chunk_size=1,
+                                         parallelism=8,
+                                         if_generation_match=0)
+
+  # The 40 parts and both intermediate objects are deleted.
+  assert blob.delete.call_count == 42
+
+
+@patch.object(_resumable.time, "sleep")
+def test_upload_from_file_resumable(_):
+  chunk_size = _resumable.CHUNK_ALIGNMENT
+  responses = iter([
+      build_mock_resumable_response(None),
+      requests.ConnectionError(),
+      build_mock_resumable_response(99),
+      build_mock_resumable_response(chunk_size - 1),
+      build_mock_resumable_response(None, status_code=200),
+  ])
+
+  def put(*_, **_kwargs):
+    response = next(responses)
+    if isinstance(response, Exception):
+      raise response
+    return response
+
+  http = gcs_client_mock()._http
+  http.put.side_effect = put
+  Client("bucket-id").upload_from_file("object-name",
+                                       io.BytesIO(b"x" * (chunk_size + 10)),
+                                       chunk_size=chunk_size)
+
+  content_ranges = [call.kwargs["headers"]["Content-Range"]
+                    for call in http.put.call_args_list]
+  assert content_ranges == [
+      "bytes */*",
+      f"bytes 0-{chunk_size - 1}/*",
+      "bytes */*",
+      f"bytes 100-{chunk_size - 1}/*",
+      f"bytes {chunk_size}-{chunk_size + 9}/{chunk_size + 10}",
+  ]
+
+
+def test_upload_from_file_resume_session():
+  http = gcs_client_mock()._http
+  http.put.side_effect = [
+      build_mock_resumable_response(3),
+      build_mock_resumable_response(None, status_code=200),
+  ]
+  Client("bucket-id").upload_from_file("object-name",
+                                       io.BytesIO(b"src-bytes"),
+                                       session_url="session-url")
+
+  assert http.put.call_args.kwargs["data"] == b"bytes"
+
+
+def test_create_upload_session():
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  blob.create_resumable_upload_session.return_value = "session-url"
+
+  result = Client("bucket-id").create_upload_session("object-name")
+  assert result == "session-url"
+
+
 def test_upload_from_bytes():
   result = Client("bucket-id").upload_from_bytes("object-name",
                                                  bytes("src-text", "utf-8"))
   assert result is None
 
 
+def test_upload_from_bytes_if_not_exists():
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  Client("bucket-id").upload_from_bytes("object-name",
+                                        b"src-bytes",
+                                        if_generation_match=0)
+  assert blob.upload_from_string.call_args.kwargs["if_generation_match"] == 0
+
+
+def test_retry_policy_replaces_library_retries():
+  http = gcs_client_mock()._http
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  Client("bucket-id", retry=RetryPolicy()).exists("object-name")
+
+  assert http.mount.call_count == 2
+  assert blob.exists.call_args.kwargs["retry"] is None
+
+
+def test_transport_options_use_own_pool():
+  client = Client("bucket-id", transport=TransportOptions(pool_size=32))
+  assert client.pool_stats() == PoolStats(pool_size=32)
+  assert Client("bucket-id").pool_stats() == PoolStats(pool_size=10)
+
+
+def test_bucket_resolved_once_across_threads():
+  gcs_client = gcs_client_mock()
+  bucket_handle = gcs_client.bucket.return_value
+
+  def slow_bucket(_bucket_id):
+    time.sleep(0.01)
+    return bucket_handle
+
+  gcs_client.bucket.reset_mock()
+  gcs_client.bucket.side_effect = slow_bucket
+  client = Client()
+  barrier = threading.Barrier(8)
+
+  def exists():
+    barrier.wait()
+    client.exists("object-name")
+
+  threads = [threading.Thread(target=exists) for _ in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  gcs_client.bucket.assert_called_once_with("bucket-id")
+
+
+def test_reconnects_after_fork():
+  client = Client()
+  client.exists("object-name")
+
+  with patch.object(os, "getpid", return_value=-1):
+    _shared._after_fork_in_child()
+    client.exists("object-name")
+
+  assert cast(MagicMock, storage.Client).call_count == 2
+  # The default bucket ID is kept rather than resolved again.
+  assert cast(MagicMock, requests.get).call_count == 1
+  gcs_client_mock().bucket.assert_called_with("bucket-id")
+
+
+def test_handle():
+  handle = Client(transport=TransportOptions(pool_size=4)).handle()
+  assert handle == ClientHandle("bucket-id", TransportOptions(pool_size=4))
+
+  unpickled = pickle.loads(pickle.dumps(handle))
+  assert unpickled == handle
+  assert unpickled.client() is handle.client()
+  assert handle.client().pool_stats().pool_size == 4
+
+
+def download_with_handle(handle):
+  return handle.client().download_as_bytes("object-name")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_handle_in_process_pool():
+  handle = Client().handle()
+  with multiprocessing.get_context("fork").Pool(2) as pool:
+    results = pool.map(download_with_handle, [handle] * 4)
+  assert results == [str.encode("test-bytes")] * 4
+
+
 def test_upload_from_text():
   result = Client("bucket-id").upload_from_text("object-name", "src-text")
   assert result is None
+
+
+def test_copy_many():
+  result = Client("bucket-id").copy_many([("object-1", "dest-object-1"),
+                                          ("object-2", "dest-object-2")])
+  assert [r.name for r in result] == ["object-1", "object-2"]
+  assert all(r.ok for r in result)
+
+
+def test_delete_many():
+  result = Client("bucket-id").delete_many(["object-1", "object-2"])
+  assert [r.name for r in result] == ["object-1", "object-2"]
+  assert all(r.ok and r.result is None for r in result)
+
+
+def test_delete_many_not_found():
+  client = Client("bucket-id")
+  blob = gcs_client_mock().bucket("bucket-id").blob("object-name")
+  blob.delete.side_effect = NotFound("No such object")
+
+  result = client.delete_many(["object-1", "object-2"])
+  assert all(isinstance(r.error, ObjectNotFoundError) for r in result)
+
+  result = client.delete_many(["object-1", "object-2"], ignore_not_found=True)
+  assert all(r.ok for r in result)
+
+
+def test_download_many():
+  result = Client("bucket-id").download_many(["object-1", "object-2"])
+  assert [r.result for r in result] == [str.encode("test-bytes")] * 2
+
+
+def test_exists_many():
+  result = Client("bucket-id").exists_many(["object-1", "object-2"],
+                                           concurrency=1)
+  assert [r.result for r in result] == [True, True]
@@ -0,0 +1,75 @@
+import pytest
+from replit.object_storage import Client
+from replit.object_storage.client import MAX_COMPOSE_SOURCES
+from replit.object_storage.errors import (
+  ObjectNotFoundError,
+  PreconditionFailedError,
+)
+
+
+@pytest.fixture()
+def client(request):
+  request.getfixturevalue("fake")
+  return Client()
+
+
+def test_compose(client, fake):
+  fake.put_object("shard-0", b"first\n")
+  fake.put_object("shard-1", b"second\n")
+
+  client.compose(["shard-0", "shard-1", "shard-0"],
+                 "merged",
+                 content_type="text/plain")
+
+  assert fake.object("merged").data == b"first\nsecond\nfirst\n"
+  assert fake.object("merged").content_type == "text/plain"
+  assert fake.requests["compose_object"] == 1
+
+
+def test_compose_many_sources_in_a_tree(client, fake):
+  count = MAX_COMPOSE_SOURCES * 2 + 1
+  for i in range(count):
+    fake.put_object(f"shard-{i:03}", f"{i},".encode())
+
+  client.compose([f"shard-{i:03}" for i in range(count)], "merged")
+
+  assert fake.object("merged").data == b"".join(
+      f"{i},".encode() for i in range(count))
+  # Three intermediate objects, then the destination.
+  assert fake.requests["compose_object"] == 4
+  assert sorted(fake.buckets["bucket-id"]) == sorted(
+      [f"shard-{i:03}" for i in range(count)] + ["merged"])
+
+
+def test_compose_errors(client, fake):
+  fake.put_object("shard-0", b"data")
+
+  with pytest.raises(ValueError):
+    client.compose([], "merged")
+  with pytest.raises(ObjectNotFoundError):
+    client.compose(["shard-0", "missing"] * MAX_COMPOSE_SOURCES, "merged")
+  assert sorted(fake.buckets["bucket-id"]) == ["shard-0"]
+
+
+def test_copy_in_rewrite_steps(client, fake):
+  fake.put_object("object-name", b"0123456789", content_type="text/plain")
+  fake.rewrite_chunk_size = 4
+  progress = []
+
+  client.copy("object-name",
+              "dest-object-name",
+              progress=lambda copied, size: progress.append((copied, size)))
+
+  assert progress == [(4, 10), (8, 10), (10, 10)]
+  assert fake.requests["rewrite_object"] == 3
+  assert fake.object("dest-object-name").data == b"0123456789"
+  assert fake.object("dest-object-name").content_type == "text/plain"
+
+
+def test_copy_preconditions(client, fake):
+  fake.put_object("object-name", b"data")
+  fake.put_object("dest-object-name", b"old")
+
+  with pytest.raises(PreconditionFailedError):
+    client.copy("object-name", "dest-object-name", if_generation_match=0)
+  assert fake.object("dest-object-name").data == b"old"
@@ -0,0 +1,109 @@
+import gzip
+import io
+import os
+
+import pytest
+import zstandard
+from replit.object_storage import Client
+from replit.object_storage.compression import _CompressingReader, _get_codec
+from replit.object_storage.errors import ChecksumMismatchError
+
+DATA = b"compressible contents " * 4096
+
+
+@pytest.fixture(params=["gzip", "zstd"])
+def client(request):
+  request.getfixturevalue("fake")
+  return Client(compression=request.param)
+
+
+def decompress(encoding, data):
+  if encoding == "gzip":
+    return gzip.decompress(data)
+  return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def test_bytes_and_text(client, fake):
+  client.upload_from_bytes("bytes", DATA)
+  client.upload_from_text("text", "compressible text " * 100)
+
+  stored = fake.object("bytes")
+  assert stored.content_encoding in ("gzip", "zstd")
+  assert len(stored.data) < len(DATA) // 10
+  assert decompress(stored.content_encoding, stored.data) == DATA
+  assert client.download_as_bytes("bytes") == DATA
+  assert client.download_as_text("text") == "compressible text " * 100
+  assert client.download_if_changed("bytes", 0) == (DATA, stored.generation)
+  assert client.download_if_changed("bytes", stored.generation) is None
+
+
+def test_streams(client, fake, tmp_path):
+  data = os.urandom(16 * 1024) * 1024
+  client.upload_from_file("small", io.BytesIO(DATA))
+  client.upload_from_file("large", io.BytesIO(data))
+
+  assert fake.requests["upload_chunk"] > 0
+  assert b"".join(client.download_stream("small", chunk_size=1024)) == DATA
+  assert b"".join(client.download_stream("large")) == data
+
+  client.download_to_filename("large", str(tmp_path / "large"))
+  assert (tmp_path / "large").read_bytes() == data
+
+
+def test_parallel_upload_and_sliced_download(client, fake, tmp_path):
+  path = tmp_path / "source"
+  path.write_bytes(os.urandom(256 * 1024) + DATA)
+
+  client.upload_from_filename("object-name",
+                              str(path),
+                              chunk_size=256 * 1024,
+                              parallelism=2)
+  client.download_to_filename("object-name",
+                              str(tmp_path / "dest"),
+                              slices=4,
+                              slice_size=256 * 1024)
+
+  assert fake.object("object-name").content_encoding is not None
+  assert (tmp_path / "dest").read_bytes() == path.read_bytes()
+
+
+@pytest.mark.usefixtures("fake")
+def test_uncompressed_objects_are_read_as_is():
+  Client().upload_from_bytes("object-name", DATA)
+  assert Client(compression="zstd").download_as_bytes("object-name") == DATA
+
+
+@pytest.mark.usefixtures("fake")
+@pytest.mark.parametrize("name", ["gzip", "zstd"])
+def test_compressed_objects_are_read_without_compression(name, tmp_path):
+  Client(compression=name).upload_from_bytes("object-name", DATA)
+  Client(compression=name).upload_from_text("text", "compressible text " * 100)
+  client = Client()
+
+  assert client.download_as_bytes("object-name") == DATA
+  assert client.download_as_text("text") == "compressible text " * 100
+  assert b"".join(client.download_stream("object-name")) == DATA
+  client.download_to_filename("object-name", str(tmp_path / "dest"))
+  assert (tmp_path / "dest").read_bytes() == DATA
+
+
+def test_checksum_mismatch(client, fake):
+  client.upload_from_bytes("object-name", DATA)
+  fake.object("object-name").crc32c = "AAAAAA=="
+
+  with pytest.raises(ChecksumMismatchError):
+    client.download_as_bytes("object-name")
+
+
+def test_unknown_codec():
+  with pytest.raises(ValueError, match="unsupported compression"):
+    Client(compression="lz4")
+
+
+@pytest.mark.parametrize("name", ["gzip", "zstd"])
+def test_compressing_reader(name):
+  codec = _get_codec(name)
+  reader = _CompressingReader(io.BytesIO(DATA[100:]), codec, head=DATA[:100])
+
+  chunks = iter(lambda: reader.read(1000), b"")
+  assert decompress(name, b"".join(chunks)) == DATA
@@ -0,0 +1,110 @@
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from replit.object_storage import AsyncClient, Client, RetryPolicy
+from replit.object_storage.errors import (
+  NotModifiedError,
+  ObjectNotFoundError,
+  PreconditionFailedError,
+  TooManyRequestsError,
+)
+
+
+def test_round_trip(fake):
+  client = Client()
+  client.upload_from_text("dir/object-name", "test-text")
+
+  assert client.download_as_text("dir/object-name") == "test-text"
+  assert client.download_range("dir/object-name", 5, 8) == b"text"
+  assert list(client.download_stream("dir/object-name", start=-4)) == [b"text"]
+  assert client.exists("dir/object-name")
+  assert fake.object("dir/object-name").content_type == "text/plain"
+
+  client.copy("dir/object-name", "dest-object-name")
+  assert [obj.name for obj in client.list()] == [
+      "dest-object-name", "dir/object-name"
+  ]
+  client.delete("dir/object-name")
+  with pytest.raises(ObjectNotFoundError):
+    client.download_as_bytes("dir/object-name")
+
+
+def test_chunked_uploads_and_sliced_downloads(fake, tmp_path):
+  client = Client()
+  data = os.urandom(3 * 256 * 1024 + 1)
+  client.upload_from_file("resumable", io.BytesIO(data), chunk_size=256 * 1024)
+  client.upload_from_file("composite",
+                          io.BytesIO(data),
+                          chunk_size=16 * 1024,
+                          parallelism=8)
+  assert fake.object("resumable").data == data
+  assert fake.object("composite").data == data
+  assert sorted(fake.buckets["bucket-id"]) == ["composite", "resumable"]
+
+  client.download_to_filename("composite",
+                              str(tmp_path / "dest"),
+                              slices=4,
+                              slice_size=256 * 1024)
+  assert (tmp_path / "dest").read_bytes() == data
+
+
+def test_preconditions(fake):
+  client = Client()
+  client.upload_from_bytes("object-name", b"test-bytes", if_generation_match=0)
+  generation = fake.object("object-name").generation
+
+  with pytest.raises(PreconditionFailedError):
+    client.upload_from_bytes("object-name", b"new-bytes", if_generation_match=0)
+  with pytest.raises(NotModifiedError):
+    client.download_as_bytes("object-name", if_generation_not_match=generation)
+
+
+def test_listing_pages(fake):
+  for i in range(5):
+    fake.put_object(f"prefix/object-{i}", b"test-bytes")
+  fake.put_object("other", b"test-bytes")
+
+  pages = list(Client().iter_object_pages(prefix="prefix/", page_size=2))
+  assert [len(page.objects) for page in pages] == [2, 2, 1]
+
+
+def test_injected_faults_are_retried(fake):
+  fake.put_object("object-name", b"test-bytes")
+  fake.fail_next(503, times=2)
+
+  client = Client(retry=RetryPolicy(initial_backoff=0.001))
+  assert client.download_as_bytes("object-name") == b"test-bytes"
+  assert fake.requests["download_object"] == 3
+
+
+def test_injected_faults_are_raised(fake):
+  fake.fault_rate = 1.0
+  fake.fault_status_codes = (429,)
+
+  with pytest.raises(TooManyRequestsError):
+    Client("bucket-id", retry=RetryPolicy(max_attempts=1)).exists("object-name")
+
+
+def test_latency_and_bandwidth(fake):
+  fake.put_object("object-name", b"x" * 100_000)
+  client = Client("bucket-id")
+  client.exists("object-name")
+
+  fake.latency = 0.05
+  fake.bandwidth = 1_000_000
+  started = time.monotonic()
+  client.download_as_bytes("object-name")
+  assert time.monotonic() - started >= 0.15
+
+
+@pytest.mark.usefixtures("fake")
+def test_async_client():
+  async def scenario():
+    async with AsyncClient() as client:
+      await client.upload_from_text("object-name", "test-text")
+      return await client.download_as_text("object-name")
+
+  assert asyncio.run(scenario()) == "test-text"
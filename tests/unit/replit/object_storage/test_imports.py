@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import replit.object_storage
+
+# Dependencies which are only imported once a client is used.
+HEAVY_MODULES = ("aiohttp", "google", "requests", "urllib3")
+
+# An upper bound on the time taken to import the package itself, which is
+# roughly a millisecond, where importing its dependencies takes hundreds.
+MAX_IMPORT_MICROSECONDS = 50_000
+
+
+def run_python(*args):
+  env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+  return subprocess.run([sys.executable, *args],
+                        env=env,
+                        capture_output=True,
+                        text=True,
+                        check=True)
+
+
+def test_import_defers_dependencies():
+  result = run_python("-c", f"""
+import json, sys
+import replit.object_storage
+from replit.object_storage import BatchResult, DefaultBucketError, ObjectCache
+from replit.object_storage.errors import ObjectNotFoundError
+print(json.dumps(sorted(
+    name for name in sys.modules if name.split(".")[0] in {HEAVY_MODULES!r})))
+""")
+  assert json.loads(result.stdout) == []
+
+
+def test_import_time():
+  result = run_python("-X", "importtime", "-c", "import replit.object_storage")
+  # Each line of the report is "import time: self | cumulative | name".
+  times = {
+      fields[2].strip(): int(fields[1])
+      for fields in (line.split("|") for line in result.stderr.splitlines())
+      if len(fields) == 3 and fields[1].strip().isdigit()
+  }
+  assert times["replit.object_storage"] < MAX_IMPORT_MICROSECONDS
+
+
+def test_public_names():
+  assert replit.object_storage.__all__ == list(replit.object_storage._EXPORTS)
+  for name in replit.object_storage.__all__:
+    assert getattr(replit.object_storage, name).__name__ == name
+  assert set(replit.object_storage.__all__) <= set(dir(replit.object_storage))
@@ -0,0 +1,241 @@
+import io
+import logging
+import os
+from typing import Any, cast
+
+import pytest
+from prometheus_client import CollectorRegistry
+from replit.object_storage import (
+  Client,
+  Instrumentation,
+  OperationEvent,
+  PrometheusListener,
+  RetryPolicy,
+  TracingListener,
+)
+from replit.object_storage.errors import ObjectNotFoundError
+
+
+@pytest.fixture()
+def events():
+  return []
+
+
+@pytest.fixture()
+def client(request, events):
+  request.getfixturevalue("fake")
+  return Client(instrumentation=Instrumentation(events.append))
+
+
+def test_events(client, events):
+  client.upload_from_bytes("object-name", b"0123456789")
+  assert client.download_as_bytes("object-name") == b"0123456789"
+  with pytest.raises(ObjectNotFoundError):
+    client.download_as_bytes(object_name="missing")
+
+  upload, download, missing = events
+  assert upload.operation == "upload_from_bytes"
+  assert upload.object_name == "object-name"
+  assert upload.attempts == 1
+  assert upload.bytes_sent > 10
+  assert upload.error is None
+
+  assert download.operation == "download_as_bytes"
+  assert download.attempts == 1
+  assert download.bytes_received == 10
+  assert 0 < download.time_to_first_byte <= download.duration
+
+  assert missing.object_name == "missing"
+  assert missing.error == "ObjectNotFoundError"
+
+
+def test_nested_and_parallel_calls_are_one_event(client, events, tmp_path):
+  data = os.urandom(64 * 1024 + 1)
+  path = tmp_path / "source"
+  path.write_bytes(data)
+
+  client.upload_from_filename("object-name",
+                              str(path),
+                              chunk_size=16 * 1024,
+                              parallelism=4)
+  client.download_to_filename("object-name",
+                              str(tmp_path / "dest"),
+                              slices=4,
+                              slice_size=16 * 1024)
+
+  upload, download = events
+  assert upload.operation == "upload_from_filename"
+  # Five parts, a compose, and five deletions of the parts.
+  assert upload.attempts == 11
+  assert upload.bytes_sent > len(data)
+  assert download.operation == "download_to_filename"
+  # The object's metadata, then five slices.
+  assert download.attempts == 6
+  assert download.bytes_received > len(data)
+
+
+def test_batches_are_an_event_per_operation(client, events):
+  client.upload_from_bytes("a", b"a")
+  client.upload_from_bytes("b", b"b")
+  events.clear()
+
+  client.exists_many(["a", "b", "c"])
+
+  assert sorted((event.operation, event.object_name) for event in events) == [
+      ("exists", "a"), ("exists", "b"), ("exists", "c")
+  ]
+
+
+def test_iterators_are_recorded_until_exhausted(client, events):
+  for i in range(5):
+    client.upload_from_bytes(f"object-{i}", b"data")
+  events.clear()
+
+  pages = client.iter_object_pages(page_size=2)
+  assert events == []
+  assert sum(len(page.objects) for page in pages) == 5
+
+  (event,) = events
+  assert event.operation == "iter_object_pages"
+  assert event.attempts == 3
+
+  stream = client.download_stream("object-0", chunk_size=1)
+  next(stream)
+  stream.close()
+  assert events[-1].operation == "download_stream"
+  assert events[-1].error is None
+
+
+def test_retries_are_counted(fake):
+  events = []
+  client = Client(retry=RetryPolicy(initial_backoff=0),
+                  instrumentation=Instrumentation(events.append))
+  client.upload_from_bytes("object-name", b"data")
+  fake.fail_next(503, times=2)
+
+  client.download_as_bytes("object-name")
+
+  assert events[-1].attempts == 3
+  assert events[-1].error is None
+
+
+@pytest.mark.usefixtures("fake")
+def test_listeners(events, caplog):
+  instrumentation = Instrumentation()
+  client = Client(instrumentation=instrumentation)
+
+  def fail(_event):
+    raise RuntimeError("listener failed")
+
+  instrumentation.add_listener(fail)
+  instrumentation.add_listener(events.append)
+  with caplog.at_level(logging.ERROR):
+    client.upload_from_bytes("object-name", b"data")
+  assert len(events) == 1
+  assert "listener failed" in caplog.text
+
+  instrumentation.remove_listener(events.append)
+  client.exists("object-name")
+  assert len(events) == 1
+
+
+@pytest.mark.usefixtures("fake")
+def test_uninstrumented_client():
+  client = Client()
+  client.upload_from_file("object-name", io.BytesIO(b"data"))
+  assert client.download_as_bytes("object-name") == b"data"
+
+
+def test_prometheus_listener():
+  registry = CollectorRegistry()
+  listener = PrometheusListener(registry=registry, namespace="test")
+
+  listener(
+      OperationEvent("download_as_bytes",
+                     "object-name",
+                     started_at=0,
+                     duration=0.2,
+                     time_to_first_byte=0.1,
+                     attempts=2,
+                     bytes_sent=0,
+                     bytes_received=10))
+  listener(
+      OperationEvent("exists",
+                     "object-name",
+                     started_at=0,
+                     duration=0.3,
+                     error="ForbiddenError"))
+
+  def sample(name, **labels):
+    return registry.get_sample_value(name, labels)
+
+  assert sample("test_operation_duration_seconds_count",
+                operation="download_as_bytes",
+                error="") == 1
+  assert sample("test_operation_duration_seconds_sum",
+                operation="exists",
+                error="ForbiddenError") == 0.3
+  assert sample("test_operation_time_to_first_byte_seconds_count",
+                operation="download_as_bytes") == 1
+  assert sample("test_operation_time_to_first_byte_seconds_count",
+                operation="exists") is None
+  assert sample("test_operation_attempts_total",
+                operation="download_as_bytes") == 2
+  assert sample("test_operation_bytes_total",
+                operation="download_as_bytes",
+                direction="received") == 10
+
+
+class FakeSpan:
+
+  def __init__(self, name, **kwargs):
+    self.name = name
+    self.kwargs = kwargs
+    self.status = None
+    self.end_time = None
+
+  def set_status(self, status):
+    self.status = status
+
+  def end(self, end_time):
+    self.end_time = end_time
+
+
+class FakeTracer:
+
+  def __init__(self):
+    self.spans = []
+
+  def start_span(self, name, **kwargs):
+    self.spans.append(FakeSpan(name, **kwargs))
+    return self.spans[-1]
+
+
+def test_tracing_listener():
+  from opentelemetry.trace import SpanKind, StatusCode
+
+  tracer = FakeTracer()
+  listener = TracingListener(cast(Any, tracer))
+
+  listener(
+      OperationEvent("download_as_bytes",
+                     "object-name",
+                     started_at=1.5,
+                     duration=0.25,
+                     attempts=1,
+                     bytes_received=10))
+  listener(OperationEvent("list", None, started_at=2, duration=1,
+                          error="ForbiddenError"))
+
+  download, listing = tracer.spans
+  assert download.name == "object_storage.download_as_bytes"
+  assert download.kwargs["kind"] == SpanKind.CLIENT
+  assert download.kwargs["start_time"] == 1_500_000_000
+  assert download.end_time == 1_750_000_000
+  assert download.kwargs["attributes"]["object_storage.object_name"] == (
+      "object-name")
+  assert download.kwargs["attributes"]["object_storage.bytes_received"] == 10
+  assert download.status is None
+  assert "object_storage.object_name" not in listing.kwargs["attributes"]
+  assert listing.status.status_code == StatusCode.ERROR
+  assert listing.status.description == "ForbiddenError"
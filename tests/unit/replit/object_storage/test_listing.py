@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+import pytest
+from replit.object_storage import Client, ObjectListing
+from replit.object_storage._listing import split_point
+from replit.object_storage.errors import ForbiddenError
+
+
+@pytest.fixture()
+def client(request):
+  request.getfixturevalue("fake")
+  return Client()
+
+
+def test_list_directory(client, fake):
+  for name in ["a.txt", "photos/1.jpg", "photos/2019/2.jpg", "videos/3.mp4"]:
+    fake.put_object(name, b"data")
+
+  root = client.list_directory()
+  photos = client.list_directory("photos/")
+
+  assert isinstance(root, ObjectListing)
+  assert [obj.name for obj in root.objects] == ["a.txt"]
+  assert root.prefixes == ["photos/", "videos/"]
+  assert [obj.name for obj in photos.objects] == ["photos/1.jpg"]
+  assert photos.prefixes == ["photos/2019/"]
+  assert [obj.name for obj in client.list(prefix="photos/", delimiter="/")
+         ] == ["photos/1.jpg"]
+
+
+def test_object_pages_with_delimiter(client, fake):
+  for name in ["a", "b/1", "b/2", "c", "d/1"]:
+    fake.put_object(name, b"data")
+
+  pages = list(client.iter_object_pages(delimiter="/", page_size=2))
+
+  assert [[obj.name for obj in page.objects] for page in pages] == [["a"],
+                                                                    ["c"]]
+  assert [page.prefixes for page in pages] == [["b/"], ["d/"]]
+
+
+@pytest.mark.parametrize("parallelism", [2, 8])
+def test_parallel_list(client, fake, parallelism):
+  names = [f"logs/{day:02}/{i:03}" for day in range(1, 8) for i in range(400)]
+  for name in names:
+    fake.put_object(name, b"data")
+  fake.put_object("other", b"data")
+
+  with patch("replit.object_storage._listing.split_point",
+             wraps=split_point) as split:
+    objects = client.list(prefix="logs/", parallelism=parallelism)
+
+  assert [obj.name for obj in objects] == names
+  assert split.call_count > 0
+
+
+def test_parallel_list_with_offsets(client, fake):
+  for i in range(3000):
+    fake.put_object(f"{i:04}", b"data")
+
+  objects = client.list(start_offset="0500",
+                        end_offset="2500",
+                        match_glob="*0",
+                        parallelism=4)
+
+  assert [obj.name for obj in objects] == [
+      f"{i:04}" for i in range(500, 2500, 10)
+  ]
+
+
+def test_parallel_list_errors(client, fake):
+  fake.put_object("object-name", b"data")
+
+  with pytest.raises(ValueError, match="max_results"):
+    client.list(max_results=10, parallelism=2)
+  with pytest.raises(ValueError, match="parallelism"):
+    client.list(parallelism=0)
+  fake.fail_next(403)
+  with pytest.raises(ForbiddenError):
+    client.list(parallelism=2)
+
+
+@pytest.mark.parametrize("low, high", [
+    ("a", "b"),
+    ("logs/2024-01-05/file", "logs/\x7f"),
+    ("file-00099", "file-00199"),
+    ("é", "ü"),
+    ("", "\x7f"),
+])
+def test_split_point(low, high):
+  split = split_point(low, high)
+  assert low < split < high
+
+
+def test_split_point_without_names_between():
+  assert split_point("a", "a\0") is None
+  assert split_point("a", "a") is None
@@ -0,0 +1,195 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+from replit.object_storage import Client, ObjectWriter
+from replit.object_storage._resumable import CHUNK_ALIGNMENT
+from replit.object_storage.errors import (
+  ForbiddenError,
+  ObjectNotFoundError,
+  PreconditionFailedError,
+)
+
+DATA = bytes(range(256)) * 4000
+
+
+@pytest.fixture()
+def client(request):
+  request.getfixturevalue("fake")
+  return Client()
+
+
+def test_open_read_sequentially(client, fake):
+  fake.put_object("object-name", DATA)
+
+  with client.open("object-name", block_size=100_000,
+                   read_ahead=300_000) as f:
+    assert f.read(10) == DATA[:10]
+    assert f.tell() == 10
+    assert f.read() == DATA[10:]
+    assert f.read() == b""
+
+  # Each block is fetched once, whether or not it was prefetched.
+  assert fake.requests["download_object"] == 11
+  assert fake.requests["get_object"] == 1
+
+
+def test_open_seek(client, fake):
+  fake.put_object("object-name", DATA)
+
+  with client.open("object-name", block_size=100_000) as f:
+    assert f.seekable()
+    assert f.seek(-5, io.SEEK_END) == len(DATA) - 5
+    assert f.read() == DATA[-5:]
+    f.seek(500_000)
+    assert f.read(20) == DATA[500_000:500_020]
+    f.seek(-10, io.SEEK_CUR)
+    assert f.read(10) == DATA[500_010:500_020]
+
+  # Nothing is prefetched after a seek, until reads are sequential again.
+  assert fake.requests["download_object"] == 2
+
+
+def test_open_zip_and_tar(client, fake):
+  buffer = io.BytesIO()
+  with zipfile.ZipFile(buffer, "w") as archive:
+    archive.writestr("small.txt", "hello")
+    archive.writestr("large.bin", DATA)
+  fake.put_object("archive.zip", buffer.getvalue())
+  buffer = io.BytesIO()
+  with tarfile.open(fileobj=buffer, mode="w") as archive:
+    info = tarfile.TarInfo("large.bin")
+    info.size = len(DATA)
+    archive.addfile(info, io.BytesIO(DATA))
+  fake.put_object("archive.tar", buffer.getvalue())
+
+  with client.open("archive.zip", block_size=CHUNK_ALIGNMENT) as f, \
+      zipfile.ZipFile(f) as archive:
+    assert archive.namelist() == ["small.txt", "large.bin"]
+    assert archive.read("small.txt") == b"hello"
+    assert archive.read("large.bin") == DATA
+  with client.open("archive.tar", block_size=CHUNK_ALIGNMENT) as f, \
+      tarfile.open(fileobj=f) as archive:
+    member = archive.extractfile("large.bin")
+    assert member is not None
+    assert member.read() == DATA
+
+
+def test_open_read_errors(client, fake):
+  stored = fake.put_object("object-name", DATA)
+
+  with pytest.raises(ObjectNotFoundError):
+    client.open("missing")
+  with pytest.raises(PreconditionFailedError):
+    client.open("object-name", if_generation_match=stored.generation + 1)
+  with pytest.raises(ValueError):
+    client.open("object-name", "r+b")
+
+  with client.open("object-name", block_size=100_000, read_ahead=0) as f:
+    f.read(10)
+    fake.put_object("object-name", b"replaced")
+    f.seek(200_000)
+    with pytest.raises(PreconditionFailedError):
+      f.read(10)
+  assert f.closed
+  with pytest.raises(ValueError):
+    f.read()
+
+
+def test_open_write_in_chunks(client, fake):
+  with client.open("object-name", "wb", chunk_size=CHUNK_ALIGNMENT,
+                   content_type="text/plain") as f:
+    assert isinstance(f, ObjectWriter)
+    for start in range(0, len(DATA), 100_000):
+      f.write(DATA[start:start + 100_000])
+    assert f.tell() == len(DATA)
+    assert not fake.buckets["bucket-id"]
+
+  assert fake.object("object-name").data == DATA
+  assert fake.object("object-name").content_type == "text/plain"
+  # Three full chunks, then the rest.
+  assert fake.requests["upload_chunk"] == 4
+
+
+def test_open_write_zip(client, fake):
+  with client.open("archive.zip", "wb", chunk_size=CHUNK_ALIGNMENT) as f, \
+      zipfile.ZipFile(f, "w") as archive:
+    archive.writestr("large.bin", DATA)
+
+  with zipfile.ZipFile(io.BytesIO(fake.object("archive.zip").data)) as archive:
+    assert archive.read("large.bin") == DATA
+
+
+def test_open_write_empty(client, fake):
+  with client.open("object-name", "wb"):
+    pass
+
+  assert fake.object("object-name").data == b""
+
+
+def test_open_write_abandoned(client, fake):
+  fake.put_object("object-name", b"old")
+
+  with pytest.raises(RuntimeError), client.open(
+      "object-name", "wb", chunk_size=CHUNK_ALIGNMENT) as f:
+    f.write(DATA)
+    raise RuntimeError("interrupted")
+
+  assert fake.object("object-name").data == b"old"
+
+
+def test_open_write_errors(client, fake):
+  fake.put_object("object-name", b"old")
+
+  with pytest.raises(ValueError):
+    client.open("object-name", "wb", chunk_size=1000)
+  with pytest.raises(PreconditionFailedError), client.open(
+      "object-name", "wb", if_generation_match=0) as f:
+    f.write(b"new")
+  assert fake.object("object-name").data == b"old"
+
+  f = client.open("object-name", "wb")
+  fake.fail_next(403)
+  f.write(b"new")
+  with pytest.raises(ForbiddenError):
+    f.close()
+  assert f.closed
+  assert fake.object("object-name").data == b"old"
+
+
+def test_open_write_errors_are_raised_by_close(client, fake):
+  fake.put_object("object-name", b"old")
+
+  f = client.open("object-name", "wb", chunk_size=CHUNK_ALIGNMENT)
+  fake.fail_next(403)
+  # The first chunk fails in the background, and the next write raises.
+  f.write(DATA[:CHUNK_ALIGNMENT])
+  with pytest.raises(ForbiddenError):
+    f.write(DATA)
+  with pytest.raises(ForbiddenError):
+    f.close()
+  assert f.closed
+
+  with pytest.raises(ForbiddenError), client.open(
+      "object-name", "wb", chunk_size=CHUNK_ALIGNMENT) as f:
+    fake.fail_next(403)
+    f.write(DATA[:CHUNK_ALIGNMENT])
+    with pytest.raises(ForbiddenError):
+      f.write(DATA)
+  assert f.closed
+  assert fake.object("object-name").data == b"old"
+
+
+def test_open_compressed(request):
+  fake = request.getfixturevalue("fake")
+  client = Client(compression="gzip")
+
+  with client.open("object-name", "wb", chunk_size=CHUNK_ALIGNMENT) as f:
+    f.write(DATA)
+  with client.open("object-name") as f:
+    assert not f.seekable()
+    assert f.read() == DATA
+
+  assert fake.object("object-name").content_encoding == "gzip"
+  assert len(fake.object("object-name").data) < len(DATA)
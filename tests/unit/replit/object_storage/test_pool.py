@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+import pytest
+from replit.object_storage import (
+  ClientPool,
+  ObjectCache,
+  RetryPolicy,
+  TransportOptions,
+  _shared,
+)
+
+
+@pytest.fixture()
+def pool(request):
+  fake = request.getfixturevalue("fake")
+  for bucket_id in ("tenant-1", "tenant-2", "tenant-3"):
+    fake.buckets[bucket_id] = {}
+  return ClientPool(max_buckets=2, transport=TransportOptions(pool_size=4))
+
+
+def test_clients_share_one_session(pool, fake):
+  with patch.object(_shared,
+                    "new_storage_client",
+                    wraps=_shared.new_storage_client) as new_storage_client:
+    for bucket_id in ("tenant-1", "tenant-2", "tenant-3"):
+      pool.client(bucket_id).upload_from_bytes("object-name",
+                                               bucket_id.encode())
+    data = pool.client("tenant-1").download_as_bytes("object-name")
+
+  assert data == b"tenant-1"
+  assert fake.object("object-name", "tenant-3").data == b"tenant-3"
+  assert new_storage_client.call_count == 1
+  stats = pool.pool_stats()
+  assert stats.pool_size == 4
+  assert stats.acquisitions == 4
+  assert pool.client("tenant-2").pool_stats() == stats
+
+
+def test_clients_are_evicted_least_recently_used_first(pool):
+  first = pool.client("tenant-1")
+  second = pool.client("tenant-2")
+  assert pool.client("tenant-1") is first
+
+  pool.client("tenant-3")
+
+  assert len(pool) == 2
+  assert pool.client("tenant-1") is first
+  assert pool.client("tenant-2") is not second
+  # Evicted Clients remain usable.
+  second.upload_from_bytes("object-name", b"data")
+  assert pool.client("tenant-2").download_as_bytes("object-name") == b"data"
+
+
+@pytest.mark.usefixtures("fake")
+def test_clients_share_options():
+  pool = ClientPool(retry=RetryPolicy(max_attempts=2), compression="gzip")
+  client = pool.client("bucket-id")
+  client.upload_from_bytes("object-name", b"data" * 100)
+
+  assert client.download_as_bytes("object-name") == b"data" * 100
+  assert client.handle().bucket_id == "bucket-id"
+
+
+def test_clients_share_a_cache(fake):
+  fake.buckets["tenant-1"] = {}
+  fake.buckets["tenant-2"] = {}
+  cache = ObjectCache()
+  pool = ClientPool(cache=cache)
+  for bucket_id in ("tenant-1", "tenant-2"):
+    pool.client(bucket_id).upload_from_bytes("object-name", bucket_id.encode())
+
+  # Objects of the same name in different buckets are cached separately.
+  assert pool.client("tenant-1").download_as_bytes("object-name") == b"tenant-1"
+  assert pool.client("tenant-2").download_as_bytes("object-name") == b"tenant-2"
+  assert pool.client("tenant-1").download_as_bytes("object-name") == b"tenant-1"
+  assert cache.stats().misses == 2
+  assert cache.stats().hits == 1
+
+
+def test_invalid_options():
+  with pytest.raises(ValueError, match="max_buckets"):
+    ClientPool(max_buckets=0)
+  with pytest.raises(ValueError, match="unsupported checksum"):
+    ClientPool(checksum="sha1")
+  with pytest.raises(ValueError, match="unsupported compression"):
+    ClientPool(compression="lz4")
@@ -0,0 +1,108 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from replit.object_storage import RateLimiter, RetryPolicy, retry
+from requests.adapters import HTTPAdapter
+
+
+def build_response(status_code, headers=None):
+  response = MagicMock()
+  response.status_code = status_code
+  response.headers = headers or {}
+  return response
+
+
+def send(method, url, responses, policy=None, body=None, rate_limiter=None):
+  request = requests.Request(method, url, data=body).prepare()
+  adapter = retry._RetryingAdapter(retry=policy or RetryPolicy(),
+                                   rate_limiter=rate_limiter)
+  with patch.object(HTTPAdapter, "send", side_effect=responses) as mock_send, \
+       patch.object(retry.time, "sleep") as mock_sleep:
+    try:
+      return adapter.send(request), mock_send.call_count, mock_sleep
+    except requests.ConnectionError:
+      return None, mock_send.call_count, mock_sleep
+
+
+def test_retries_transient_errors():
+  response, attempts, _ = send("GET", "https://storage/o/object-name", [
+      requests.ConnectionError(),
+      build_response(503),
+      build_response(200),
+  ])
+  assert response is not None
+  assert response.status_code == 200
+  assert attempts == 3
+
+
+def test_gives_up_after_max_attempts():
+  response, attempts, _ = send("GET",
+                               "https://storage/o/object-name",
+                               [build_response(503)] * 3,
+                               policy=RetryPolicy(max_attempts=3))
+  assert response is not None
+  assert response.status_code == 503
+  assert attempts == 3
+
+
+def test_does_not_retry_permanent_errors():
+  response, attempts, _ = send("GET", "https://storage/o/object-name",
+                               [build_response(404)])
+  assert response is not None
+  assert response.status_code == 404
+  assert attempts == 1
+
+
+@pytest.mark.parametrize("url,attempts", [
+    ("https://storage/upload/o?name=object-name", 1),
+    ("https://storage/upload/o?name=object-name&ifGenerationMatch=0", 2),
+])
+def test_retries_writes_with_preconditions(url, attempts):
+  responses = [build_response(503), build_response(200)]
+  _, result, _ = send("POST", url, responses, body=b"src-bytes")
+  assert result == attempts
+
+
+@pytest.mark.parametrize("url,attempts", [
+    ("https://storage/o/object-name", 1),
+    ("https://storage/o/object-name?generation=1", 2),
+    ("https://storage/o/object-name?ifGenerationMatch=1", 2),
+])
+def test_retries_deletes_of_generations(url, attempts):
+  responses = [build_response(503), build_response(204)]
+  _, result, _ = send("DELETE", url, responses)
+  assert result == attempts
+
+
+def test_honors_retry_after():
+  _, _, mock_sleep = send(
+      "GET", "https://storage/o/object-name",
+      [build_response(429, {"Retry-After": "7"}),
+       build_response(200)])
+  mock_sleep.assert_called_once_with(7.0)
+
+
+def test_retry_budget():
+  policy = RetryPolicy(budget=1, budget_refill=0.5)
+  _, attempts, _ = send("GET", "https://storage/o/object-name",
+                        [build_response(503), build_response(200)], policy)
+  assert attempts == 2
+
+  # The budget is spent, and has only been half refilled.
+  _, attempts, _ = send("GET", "https://storage/o/object-name",
+                        [build_response(503)], policy)
+  assert attempts == 1
+
+
+def test_backoff_is_bounded():
+  policy = RetryPolicy(initial_backoff=1, max_backoff=4)
+  assert all(0 <= policy.backoff(1) <= 1 for _ in range(100))
+  assert all(0 <= policy.backoff(10) <= 4 for _ in range(100))
+
+
+def test_rate_limiter():
+  with patch.object(retry.time, "monotonic", return_value=100.0):
+    limiter = RateLimiter(rate=10, burst=2)
+    delays = [limiter._reserve() for _ in range(4)]
+  assert delays == pytest.approx([0, 0, 0.1, 0.2])
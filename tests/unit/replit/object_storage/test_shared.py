@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from google.auth import identity_pool
+from google.cloud import storage
+from replit.object_storage import Client, _shared
+from replit.object_storage.errors import DefaultBucketError
+
+from tests.unit.replit.object_storage.mocks import (
+    build_mock_default_bucket_response,
+    build_mock_gcs_client,
+)
+
+
+@pytest.fixture(autouse=True)
+def credentials():
+  with patch.object(identity_pool, "Credentials") as mock_credentials:
+    yield mock_credentials
+
+
+def build_mock_credentials(token: Optional[str] = "token",
+                           expires_in: Optional[int] = None):
+  credentials = MagicMock()
+  credentials.token = token
+  credentials.expiry = None
+  if expires_in is not None:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    credentials.expiry = now + timedelta(seconds=expires_in)
+  return credentials
+
+
+def test_clients_share_state(credentials):
+  with patch.object(storage, "Client", build_mock_gcs_client()) as gcs_client, \
+       patch.object(requests,
+                    "get",
+                    return_value=build_mock_default_bucket_response()) as get:
+    Client().exists("object-name")
+    Client().exists("object-name")
+
+  assert credentials.call_count == 1
+  assert gcs_client.call_count == 1
+  assert get.call_count == 1
+
+
+def test_default_bucket_errors_are_not_cached():
+  failure = MagicMock()
+  failure.raise_for_status.side_effect = requests.HTTPError
+  with patch.object(requests,
+                    "get",
+                    side_effect=[failure,
+                                 build_mock_default_bucket_response()]):
+    with pytest.raises(DefaultBucketError):
+      _shared.default_bucket_id()
+    assert _shared.default_bucket_id() == "bucket-id"
+
+
+@pytest.mark.parametrize("token,expires_in,refreshed", [
+    (None, None, True),
+    ("token", 60, True),
+    ("token", 3600, False),
+])
+def test_refresh_if_needed(token, expires_in, refreshed):
+  credentials = build_mock_credentials(token, expires_in)
+  delay = _shared._CredentialRefresher(credentials).refresh_if_needed()
+  assert credentials.refresh.called == refreshed
+  assert 0 < delay <= 3600
+
+
+def test_refresh_failure_is_retried():
+  credentials = build_mock_credentials(token=None)
+  credentials.refresh.side_effect = requests.ConnectionError
+  delay = _shared._CredentialRefresher(credentials).refresh_if_needed()
+  assert delay == _shared._RETRY_INTERVAL
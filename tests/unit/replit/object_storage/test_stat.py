@@ -0,0 +1,51 @@
+import pytest
+from replit.object_storage import Client, Object
+from replit.object_storage.errors import (
+  NotModifiedError,
+  ObjectNotFoundError,
+  PreconditionFailedError,
+)
+
+
+@pytest.fixture()
+def client(request):
+  request.getfixturevalue("fake")
+  return Client()
+
+
+def test_stat(client, fake):
+  stored = fake.put_object("object-name", b"test-bytes", content_type="text/csv")
+
+  obj = client.stat("object-name")
+
+  assert isinstance(obj, Object)
+  assert obj == client.list()[0]
+  assert (obj.size, obj.content_type, obj.generation,
+          obj.crc32c) == (10, "text/csv", stored.generation, stored.crc32c)
+  assert obj.updated is not None
+  assert fake.requests["get_object"] == 1
+  assert fake.requests["download_object"] == 0
+
+
+def test_stat_errors(client, fake):
+  stored = fake.put_object("object-name", b"test-bytes")
+
+  with pytest.raises(ObjectNotFoundError):
+    client.stat("missing")
+  with pytest.raises(NotModifiedError):
+    client.stat("object-name", if_generation_not_match=stored.generation)
+  with pytest.raises(PreconditionFailedError):
+    client.stat("object-name", if_generation_match=stored.generation + 1)
+
+
+def test_stat_many(client, fake):
+  names = [f"object-{i:03}" for i in range(100)]
+  for name in names:
+    fake.put_object(name, name.encode())
+
+  results = client.stat_many(names + ["missing"], concurrency=8)
+
+  assert [result.name for result in results] == names + ["missing"]
+  assert [result.result.size for result in results[:-1]] == [10] * 100
+  assert isinstance(results[-1].error, ObjectNotFoundError)
+  assert fake.requests["get_object"] == 101
@@ -0,0 +1,126 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from replit.object_storage import Client, sync
+
+
+@pytest.fixture()
+def client(request):
+  request.getfixturevalue("fake")
+  return Client()
+
+
+def write(path, data):
+  path.parent.mkdir(parents=True, exist_ok=True)
+  path.write_bytes(data)
+
+
+def test_sync_up(client, fake, tmp_path):
+  write(tmp_path / "index.html", b"index")
+  write(tmp_path / "assets" / "app.js", b"app")
+  fake.put_object("site/extra", b"extra")
+
+  result = client.sync_up(str(tmp_path), "site")
+
+  assert result.ok
+  assert sorted(transfer.name for transfer in result.transferred) == [
+      "site/assets/app.js", "site/index.html"
+  ]
+  assert fake.object("site/assets/app.js").data == b"app"
+  assert fake.object("site/extra").data == b"extra"
+  assert sorted(fake.buckets["bucket-id"]) == [
+      "site/assets/app.js", "site/extra", "site/index.html"
+  ]
+
+  write(tmp_path / "index.html", b"INDEX")
+  result = client.sync_up(str(tmp_path), "site/", delete=True)
+
+  assert [transfer.name for transfer in result.transferred] == [
+      "site/index.html"
+  ]
+  assert result.unchanged == ["site/assets/app.js"]
+  assert [deletion.name for deletion in result.deleted] == ["site/extra"]
+  assert fake.object("site/index.html").data == b"INDEX"
+  assert sorted(fake.buckets["bucket-id"]) == [
+      "site/assets/app.js", "site/index.html"
+  ]
+
+
+def test_sync_up_caches_checksums(client, fake, tmp_path):
+  for i in range(3):
+    write(tmp_path / f"file-{i}", b"data")
+  client.sync_up(str(tmp_path), "prefix")
+
+  with patch.object(sync, "_file_crc32c", wraps=sync._file_crc32c) as hashed:
+    # The objects now exist, so the files are hashed once, then remembered.
+    assert len(client.sync_up(str(tmp_path), "prefix").unchanged) == 3
+    assert hashed.call_count == 3
+    assert len(client.sync_up(str(tmp_path), "prefix").unchanged) == 3
+    assert hashed.call_count == 3
+
+    write(tmp_path / "file-0", b"DATA")
+    result = client.sync_up(str(tmp_path), "prefix")
+    assert hashed.call_count == 4
+
+  assert [transfer.name for transfer in result.transferred] == ["prefix/file-0"]
+  assert fake.requests["upload_object"] == 4
+
+
+def test_sync_up_with_a_corrupt_manifest(client, tmp_path):
+  write(tmp_path / "file", b"data")
+  manifest_path = tmp_path.parent / "manifest.json"
+  manifest_path.write_text("{")
+
+  client.sync_up(str(tmp_path), "prefix", manifest_path=str(manifest_path))
+  result = client.sync_up(str(tmp_path),
+                          "prefix",
+                          manifest_path=str(manifest_path))
+
+  assert result.unchanged == ["prefix/file"]
+  assert not (tmp_path / sync.MANIFEST_FILENAME).exists()
+
+
+def test_sync_down(client, fake, tmp_path):
+  fake.put_object("site/index.html", b"index")
+  fake.put_object("site/assets/app.js", b"app")
+  fake.put_object("site/assets/", b"")
+  fake.put_object("other", b"other")
+  write(tmp_path / "extra", b"extra")
+
+  result = client.sync_down("site", str(tmp_path))
+
+  assert result.ok
+  assert sorted(transfer.name for transfer in result.transferred) == [
+      "site/assets/app.js", "site/index.html"
+  ]
+  assert (tmp_path / "index.html").read_bytes() == b"index"
+  assert (tmp_path / "assets" / "app.js").read_bytes() == b"app"
+  assert (tmp_path / "extra").exists()
+
+  fake.put_object("site/index.html", b"INDEX")
+  with patch.object(sync, "_file_crc32c", wraps=sync._file_crc32c) as hashed:
+    result = client.sync_down("site", str(tmp_path), delete=True)
+  # Downloaded files are recorded with their objects' checksums.
+  assert hashed.call_count == 0
+
+  assert [transfer.name for transfer in result.transferred] == [
+      "site/index.html"
+  ]
+  assert result.unchanged == ["site/assets/app.js"]
+  assert [deletion.name for deletion in result.deleted] == ["extra"]
+  assert (tmp_path / "index.html").read_bytes() == b"INDEX"
+  assert sorted(os.listdir(tmp_path)) == [
+      sync.MANIFEST_FILENAME, "assets", "index.html"
+  ]
+
+
+def test_sync_down_rejects_paths_outside_the_directory(client, fake, tmp_path):
+  fake.put_object("site/../escaped", b"data")
+  local_dir = tmp_path / "local"
+
+  result = client.sync_down("site", str(local_dir))
+
+  assert not result.ok
+  assert isinstance(result.transferred[0].error, ValueError)
+  assert not (tmp_path / "escaped").exists()
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+from replit.object_storage import TransportOptions, transport
+from requests.adapters import HTTPAdapter
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+
+  def do_GET(self):
+    time.sleep(0.05)
+    self.send_response(200)
+    self.send_header("Content-Length", "2")
+    self.end_headers()
+    self.wfile.write(b"ok")
+
+  def log_message(self, format, *args):
+    pass
+
+
+@pytest.fixture()
+def server_url():
+  server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  yield f"http://127.0.0.1:{server.server_port}/"
+  server.shutdown()
+  server.server_close()
+
+
+def build_session(options):
+  adapter = transport._TransportAdapter(options)
+  session = requests.Session()
+  session.mount("http://", adapter)
+  return session, adapter
+
+
+def test_pool_stats(server_url):
+  session, adapter = build_session(TransportOptions(pool_size=2,
+                                                    pool_block=True))
+
+  with ThreadPoolExecutor(max_workers=6) as executor:
+    responses = list(executor.map(lambda _: session.get(server_url), range(6)))
+
+  assert [response.content for response in responses] == [b"ok"] * 6
+  stats = adapter.pool_stats()
+  assert stats.pool_size == 2
+  assert stats.in_use == 0
+  assert stats.acquisitions == 6
+  # Only two of the six requests could hold a connection at once.
+  assert stats.max_wait_seconds > 0.02
+  assert stats.wait_seconds >= stats.max_wait_seconds
+
+
+def test_stream_holds_connection_until_closed(server_url):
+  session, adapter = build_session(TransportOptions())
+
+  response = session.get(server_url, stream=True)
+  assert adapter.pool_stats().in_use == 1
+  response.close()
+  stats = adapter.pool_stats()
+  assert (stats.pool_size, stats.in_use, stats.acquisitions) == (10, 0, 1)
+  assert stats.wait_seconds == pytest.approx(0, abs=0.01)
+  assert stats.max_wait_seconds == pytest.approx(0, abs=0.01)
+
+
+@pytest.mark.parametrize("options,timeout,expected", [
+    (TransportOptions(), 60, 60),
+    (TransportOptions(connect_timeout=5), 60, (5, 60)),
+    (TransportOptions(read_timeout=30), (10, 60), (10, 30)),
+    (TransportOptions(connect_timeout=5, read_timeout=30), None, (5, 30)),
+])
+def test_timeouts(options, timeout, expected):
+  adapter = transport._TransportAdapter(options)
+  request = requests.Request("GET", "https://storage/o/object-name").prepare()
+  with patch.object(HTTPAdapter, "send") as send:
+    adapter.send(request, timeout=timeout)
+  assert send.call_args.kwargs["timeout"] == expected
+
+
+def test_keep_alive_disabled():
+  adapter = transport._TransportAdapter(TransportOptions(keep_alive=False))
+  request = requests.Request("GET", "https://storage/o/object-name").prepare()
+  with patch.object(HTTPAdapter, "send") as send:
+    adapter.send(request)
+  assert send.call_args.args[0].headers["Connection"] == "close"